@@ -9,6 +9,15 @@ Available commands:
 - promote-user: Grant admin privileges to a user
 - list-users: List all users in the system
 - system-stats: Display system statistics
+- rebuild-stats: Recompute materialized per-user statistics
+- rebuild-streaks: Recompute persisted reading streaks
+- rebuild-reading-days: Rebuild the daily reading rollup
+- rebuild-activity: Rebuild the community activity feed
+- rebuild-ratings: Repair book rating aggregates
+- link-catalog: Link books to shared catalog records and roll up their ratings
+- build-recommendations: Rebuild collaborative-filtering recommendations
+- index-similar: Update the content-based similar-books index
+- mirror-covers: Download remote book covers into the local cover mirror
 """
 
 import os
@@ -261,6 +270,125 @@ def system_stats(args):
         
         return True
 
+def rebuild_stats(args):
+    """Recompute materialized per-user statistics from books and reading logs"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.stats_service import StatsService
+        
+        rebuilt = StatsService(db.session).rebuild_all()
+        print(f"✅ Rebuilt statistics for {rebuilt} user(s)")
+        return True
+
+def rebuild_streaks(args):
+    """Recompute persisted reading-streak state from reading logs"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.streak_service import StreakService
+        
+        rebuilt = StreakService(db.session).rebuild_all()
+        print(f"✅ Rebuilt reading streaks for {rebuilt} user(s)")
+        return True
+
+def rebuild_reading_days(args):
+    """Rebuild the per-user daily reading rollup from reading logs"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.rollup_service import RollupService
+        
+        RollupService(db.session).rebuild_all()
+        print("✅ Rebuilt daily reading rollup")
+        return True
+
+def rebuild_activity(args):
+    """Rebuild the community activity feed from library data and sharing settings"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.activity_service import ActivityService
+        
+        written = ActivityService(db.session).rebuild()
+        print(f"✅ Rebuilt community activity feed with {written} event(s)")
+        return True
+
+def rebuild_ratings(args):
+    """Recompute book rating aggregates from individual ratings to repair drift"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.rating_service import RatingService
+        
+        rebuilt = RatingService(db.session).rebuild_all()
+        print(f"✅ Rebuilt rating aggregates for {rebuilt} book(s)")
+        return True
+
+def link_catalog(args):
+    """Link books without a shared record to the catalog and roll up existing ratings"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.catalog_service import CatalogService
+        
+        result = CatalogService(db.session).link_books(batch_size=args.batch_size)
+        print(f"✅ Linked {result['linked']} book(s), created {result['created']} shared record(s), "
+              f"rolled up ratings for {result['rated']} shared book(s)")
+        return True
+
+def build_recommendations(args):
+    """Rebuild book neighbours and per-user recommendations from library co-occurrence"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.recommendation_service import RecommendationService
+        
+        result = RecommendationService(db.session).build()
+        print(f"✅ Built {result['neighbors']} neighbour(s) for {result['books']} shared book(s) "
+              f"and recommendations for {result['users']} user(s)")
+        return True
+
+def index_similar(args):
+    """Add new and edited shared books to the similar-books index, or rebuild it with --full"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.similar_books_service import SimilarBooksService
+        
+        service = SimilarBooksService(db.session)
+        result = service.rebuild() if args.full else service.update()
+        print(f"✅ Indexed {result['indexed']} shared book(s), updated {result['lists']} similar-book list(s)")
+        return True
+
+def mirror_covers(args):
+    """Mirror every remote cover not yet stored locally, in batches"""
+    app = create_app()
+    
+    with app.app_context():
+        from app.services.cover_service import CoverService
+        
+        service = CoverService(db.session)
+        totals = {'mirrored': 0, 'failed': 0, 'books': 0}
+        while True:
+            result = service.mirror(batch_size=args.batch_size)
+            for key in totals:
+                totals[key] += result[key]
+            if not any(result.values()):
+                break
+        print(f"✅ Mirrored {totals['mirrored']} cover(s) for {totals['books']} book(s), "
+              f"{totals['failed']} download(s) failed")
+        # Covers stored before placeholders existed get one from their thumbnail
+        filled = 0
+        while True:
+            batch = service.fill_placeholders(batch_size=args.batch_size)
+            filled += batch
+            if not batch:
+                break
+        if filled:
+            print(f"✅ Added placeholders to {filled} stored cover(s)")
+        return True
+
 def main():
     parser = argparse.ArgumentParser(
         description="BookOracle Admin Tools",
@@ -273,6 +401,15 @@ Examples:
   python3 admin_tools.py promote-user --username johndoe
   python3 admin_tools.py list-users
   python3 admin_tools.py system-stats
+  python3 admin_tools.py rebuild-stats
+  python3 admin_tools.py rebuild-streaks
+  python3 admin_tools.py rebuild-reading-days
+  python3 admin_tools.py rebuild-activity
+  python3 admin_tools.py rebuild-ratings
+  python3 admin_tools.py link-catalog --batch-size 1000
+  python3 admin_tools.py build-recommendations
+  python3 admin_tools.py index-similar --full
+  python3 admin_tools.py mirror-covers --batch-size 200
         """
     )
     
@@ -299,6 +436,36 @@ Examples:
     # System stats
     stats_parser = subparsers.add_parser('system-stats', help='Display system statistics')
     
+    # Rebuild materialized statistics
+    rebuild_stats_parser = subparsers.add_parser('rebuild-stats', help='Recompute per-user statistics')
+    
+    # Rebuild reading streaks
+    rebuild_streaks_parser = subparsers.add_parser('rebuild-streaks', help='Recompute per-user reading streaks')
+    
+    # Rebuild daily reading rollup
+    rebuild_days_parser = subparsers.add_parser('rebuild-reading-days', help='Rebuild the daily reading rollup')
+    
+    # Rebuild community activity feed
+    rebuild_activity_parser = subparsers.add_parser('rebuild-activity', help='Rebuild the community activity feed')
+    
+    # Repair rating aggregates
+    rebuild_ratings_parser = subparsers.add_parser('rebuild-ratings', help='Recompute book rating aggregates')
+    
+    # Link books to the shared catalog
+    link_catalog_parser = subparsers.add_parser('link-catalog', help='Link books to shared catalog records')
+    link_catalog_parser.add_argument('--batch-size', type=int, default=500, help='Books linked per transaction')
+    
+    # Rebuild recommendations
+    build_recommendations_parser = subparsers.add_parser('build-recommendations', help='Rebuild book recommendations')
+    
+    # Update similar-books index
+    index_similar_parser = subparsers.add_parser('index-similar', help='Update the similar-books index')
+    index_similar_parser.add_argument('--full', action='store_true', help='Re-index the whole catalog')
+    
+    # Mirror remote covers
+    mirror_covers_parser = subparsers.add_parser('mirror-covers', help='Mirror remote book covers locally')
+    mirror_covers_parser.add_argument('--batch-size', type=int, default=50, help='Cover URLs fetched per batch')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -313,6 +480,15 @@ Examples:
             'promote-user': promote_user,
             'list-users': list_users,
             'system-stats': system_stats,
+            'rebuild-stats': rebuild_stats,
+            'rebuild-streaks': rebuild_streaks,
+            'rebuild-reading-days': rebuild_reading_days,
+            'rebuild-activity': rebuild_activity,
+            'rebuild-ratings': rebuild_ratings,
+            'link-catalog': link_catalog,
+            'build-recommendations': build_recommendations,
+            'index-similar': index_similar,
+            'mirror-covers': mirror_covers,
         }
         
         command_func = command_map.get(args.command)
@@ -139,6 +139,154 @@ def add_streak_offset_column(inspector, engine):
     except Exception as e:
         print(f"⚠️  Error adding reading_streak_offset column: {e}")
 
+def add_library_version_column(db_engine):
+    """Add library_version column to user_stats table"""
+    try:
+        columns = [column['name'] for column in inspect(db_engine).get_columns('user_stats')]
+        if 'library_version' not in columns:
+            print("🔄 Adding library_version column to user_stats table...")
+            with db_engine.connect() as conn:
+                conn.execute(text("ALTER TABLE user_stats ADD COLUMN library_version INTEGER NOT NULL DEFAULT 0"))
+                conn.commit()
+            print("✅ library_version column added successfully")
+    except Exception as e:
+        print(f"⚠️  Error adding library_version column: {e}")
+
+def add_cover_digest_column(db_engine):
+    """Add cover_digest column to book table (cover mirror)"""
+    try:
+        columns = [column['name'] for column in inspect(db_engine).get_columns('book')]
+        if 'cover_digest' not in columns:
+            print("🔄 Adding cover_digest column to book table...")
+            with db_engine.connect() as conn:
+                conn.execute(text("ALTER TABLE book ADD COLUMN cover_digest VARCHAR(64)"))
+                conn.commit()
+            print("✅ cover_digest column added successfully")
+    except Exception as e:
+        print(f"⚠️  Error adding cover_digest column: {e}")
+
+def add_cover_placeholder_columns(db_engine):
+    """Add placeholder and color columns to cover_image table (cover placeholders)"""
+    try:
+        columns = [column['name'] for column in inspect(db_engine).get_columns('cover_image')]
+        with db_engine.connect() as conn:
+            for name, sql_type in (('placeholder', 'TEXT'), ('color', 'VARCHAR(7)')):
+                if name not in columns:
+                    print(f"🔄 Adding {name} column to cover_image table...")
+                    conn.execute(text(f"ALTER TABLE cover_image ADD COLUMN {name} {sql_type}"))
+                    conn.commit()
+                    print(f"✅ {name} column added successfully")
+    except Exception as e:
+        print(f"⚠️  Error adding cover placeholder columns: {e}")
+
+def add_title_key_column(db_engine):
+    """Add title_key column to shared_book_data table and fill it for existing records"""
+    try:
+        from .models import normalize_title_key
+        columns = [column['name'] for column in inspect(db_engine).get_columns('shared_book_data')]
+        with db_engine.begin() as conn:
+            if 'title_key' not in columns:
+                print("🔄 Adding title_key column to shared_book_data table...")
+                conn.execute(text("ALTER TABLE shared_book_data ADD COLUMN title_key VARCHAR(1024)"))
+            # SQLite's lower() only folds ASCII, so keys are computed in Python
+            rows = conn.execute(text(
+                "SELECT id, title, author FROM shared_book_data WHERE title_key IS NULL"
+            )).all()
+            if rows:
+                conn.execute(
+                    text("UPDATE shared_book_data SET title_key = :title_key WHERE id = :id"),
+                    [{'id': row.id, 'title_key': normalize_title_key(row.title, row.author)} for row in rows]
+                )
+                print(f"✅ title_key filled for {len(rows)} shared book record(s)")
+    except Exception as e:
+        print(f"⚠️  Error adding title_key column: {e}")
+
+def create_missing_tables(db_engine):
+    """Create tables declared in the models that do not exist yet (derived/materialized data)"""
+    try:
+        existing_tables = inspect(db_engine).get_table_names()
+        missing_tables = [table.name for table in db.metadata.sorted_tables if table.name not in existing_tables]
+        if missing_tables:
+            print(f"🔄 Creating missing tables: {missing_tables}")
+            db.create_all()
+            print("✅ Missing tables created.")
+        return missing_tables
+    except Exception as e:
+        print(f"⚠️  Table creation failed: {e}")
+        return []
+
+def backfill_activity_feed_migration(db_engine):
+    """Seed a newly created activity feed from existing library data"""
+    try:
+        from .services.activity_service import backfill_activity_events
+        print("🔄 Backfilling community activity feed...")
+        with db_engine.begin() as conn:
+            written = backfill_activity_events(conn)
+        print(f"✅ Community activity feed backfilled with {written} event(s).")
+    except Exception as e:
+        print(f"⚠️  Activity feed backfill failed: {e}")
+
+def backfill_rating_stats_migration(db_engine):
+    """Seed newly created rating aggregates from existing ratings"""
+    try:
+        from .services.rating_service import backfill_rating_stats, backfill_shared_rating_stats
+        print("🔄 Backfilling book rating aggregates...")
+        with db_engine.begin() as conn:
+            rated = backfill_rating_stats(conn)
+            shared = backfill_shared_rating_stats(conn)
+        print(f"✅ Rating aggregates backfilled for {rated} book(s) and {shared} shared book(s).")
+    except Exception as e:
+        print(f"⚠️  Rating aggregate backfill failed: {e}")
+
+def backfill_reading_day_migration(db_engine):
+    """Populate the daily reading rollup from reading logs when it is still empty"""
+    try:
+        from .services.rollup_service import backfill_reading_days
+        with db_engine.begin() as conn:
+            has_days = conn.execute(text("SELECT 1 FROM reading_day LIMIT 1")).first()
+            has_logs = conn.execute(text("SELECT 1 FROM reading_log LIMIT 1")).first()
+            if has_logs and not has_days:
+                print("🔄 Backfilling daily reading rollup...")
+                backfill_reading_days(conn)
+                print("✅ Daily reading rollup backfilled.")
+    except Exception as e:
+        print(f"⚠️  Daily reading rollup backfill failed: {e}")
+
+def move_job_runs_migration(db_engine):
+    """Move background job bookkeeping out of community_snapshot into job_run"""
+    try:
+        with db_engine.begin() as conn:
+            moved = conn.execute(text(
+                "INSERT INTO job_run (name, completed_at, summary) "
+                "SELECT name, computed_at, payload FROM community_snapshot WHERE name != 'community'"
+            )).rowcount
+            conn.execute(text("DELETE FROM community_snapshot WHERE name != 'community'"))
+        if moved:
+            print(f"✅ Moved {moved} background job record(s) to job_run.")
+    except Exception as e:
+        print(f"⚠️  Moving background job records failed: {e}")
+
+def run_index_migration(db_engine):
+    """Create any declared model indexes that are missing from the database"""
+    try:
+        inspector = inspect(db_engine)
+        existing_tables = inspector.get_table_names()
+        created = []
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=db_engine, checkfirst=True)
+                    created.append(index.name)
+        if created:
+            print(f"✅ Created indexes: {created}")
+        else:
+            print("✅ All declared indexes already present.")
+    except Exception as e:
+        print(f"⚠️  Index migration failed: {e}")
+
 def assign_existing_books_to_admin():
     """Assign existing books without user_id to the admin user"""
     try:
@@ -234,6 +382,28 @@ def create_app():
 
     # Initialize extensions
     db.init_app(app)
+    
+    # Keep materialized statistics and streaks in step with every library write
+    from .services.stats_service import register_listeners as register_stats_listeners
+    register_stats_listeners()
+    from .services.streak_service import register_listeners as register_streak_listeners
+    register_streak_listeners()
+    from .services.rollup_service import register_listeners as register_rollup_listeners
+    register_rollup_listeners()
+    from .services.activity_service import register_listeners as register_activity_listeners
+    register_activity_listeners()
+    from .services.public_library_service import register_listeners as register_public_library_listeners
+    register_public_library_listeners()
+    from .services.rating_service import register_listeners as register_rating_listeners
+    register_rating_listeners()
+    from .services.recommendation_service import register_listeners as register_recommendation_listeners
+    register_recommendation_listeners()
+    from .services.similar_books_service import register_listeners as register_similar_books_listeners
+    register_similar_books_listeners()
+    from .services.cover_service import register_listeners as register_cover_listeners
+    register_cover_listeners()
+    from .services.loading import register_listeners as register_loading_listeners
+    register_loading_listeners()
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -548,6 +718,25 @@ def create_app():
                 except Exception as e:
                     print(f"⚠️  Reading log migration failed: {e}")
         
+        # Materialized tables are created empty and backfilled lazily on first read
+        created_tables = create_missing_tables(db.engine)
+        add_library_version_column(db.engine)
+        add_cover_digest_column(db.engine)
+        add_cover_placeholder_columns(db.engine)
+        add_title_key_column(db.engine)
+        if 'activity_event' in created_tables:
+            backfill_activity_feed_migration(db.engine)
+        if 'book_rating_stats' in created_tables or 'shared_book_rating_stats' in created_tables:
+            backfill_rating_stats_migration(db.engine)
+        if 'job_run' in created_tables:
+            move_job_runs_migration(db.engine)
+        
+        # The daily rollup has no per-user marker, so it is backfilled up front
+        backfill_reading_day_migration(db.engine)
+        
+        # Declared indexes are created after all column migrations have run
+        run_index_migration(db.engine)
+        
         print("🎉 Database migration completed successfully!")
 
     # Add middleware to check for setup and forced password changes
@@ -10,6 +10,7 @@ from .models import User, Book, ReadingLog, db, SystemSettings
 from .forms import UserProfileForm, AdminPasswordResetForm
 from datetime import datetime, timedelta, timezone
 from sqlalchemy import func
+from .services.loading import load_profile, lazy_load_guard
 
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -61,6 +62,7 @@ def admin_or_self_required(user_id_param='user_id'):
 @admin.route('/dashboard')
 @login_required
 @admin_required
+@lazy_load_guard
 def dashboard():
     """Admin dashboard with system overview"""
     # Get system statistics
@@ -71,7 +73,9 @@ def dashboard():
     recent_users = User.query.filter(User.created_at >= thirty_days_ago).order_by(User.created_at.desc()).limit(10).all()
     
     # Get recent book additions (last 30 days)  
-    recent_books = Book.query.filter(Book.created_at >= thirty_days_ago).order_by(Book.created_at.desc()).limit(10).all()
+    recent_books = Book.query.filter(Book.created_at >= thirty_days_ago)\
+        .options(*load_profile('book_with_owner'))\
+        .order_by(Book.created_at.desc()).limit(10).all()
     
     return render_template('admin/dashboard.html', 
                          title='Admin Dashboard',
@@ -82,6 +86,7 @@ def dashboard():
 @admin.route('/users')
 @login_required
 @admin_required
+@lazy_load_guard
 def users():
     """User management interface"""
     page = request.args.get('page', 1, type=int)
@@ -102,17 +107,27 @@ def users():
         page=page, per_page=20, error_out=False
     )
     
+    # Book counts for the page in one grouped query
+    user_ids = [user.id for user in users.items]
+    book_counts = dict(
+        db.session.query(Book.user_id, func.count(Book.id))
+        .filter(Book.user_id.in_(user_ids))
+        .group_by(Book.user_id)
+    ) if user_ids else {}
+    
     return render_template('admin/users.html',
                          title='User Management',
                          users=users,
+                         book_counts=book_counts,
                          search=search)
 
 @admin.route('/users/<int:user_id>')
 @login_required
 @admin_required
+@lazy_load_guard
 def user_detail(user_id):
     """Individual user management"""
-    user = User.query.get_or_404(user_id)
+    user = User.query.filter_by(id=user_id).options(*load_profile('user_detail')).first_or_404()
     
     # Get user statistics
     book_count = Book.query.filter_by(user_id=user.id).count()
@@ -133,7 +148,9 @@ def user_detail(user_id):
     
     # Get recent activity
     recent_books = Book.query.filter_by(user_id=user.id).order_by(Book.created_at.desc()).limit(5).all()
-    recent_logs = ReadingLog.query.filter_by(user_id=user.id).order_by(ReadingLog.created_at.desc()).limit(10).all()
+    recent_logs = ReadingLog.query.filter_by(user_id=user.id)\
+        .options(*load_profile('log_with_book'))\
+        .order_by(ReadingLog.created_at.desc()).limit(10).all()
     
     return render_template('admin/user_detail.html',
                          title=f'User: {user.username}',
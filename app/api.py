@@ -3,7 +3,7 @@ API Blueprint - RESTful API endpoints for BookOracle
 Uses service layer for business logic separation
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_login import login_required, current_user, login_user, logout_user
 from datetime import date, datetime, timezone, timedelta
 from typing import Dict, Any
@@ -12,6 +12,26 @@ import secrets
 
 from .services.book_service import BookService, BookNotFoundError
 from .services.user_service import UserService, UserNotFoundError
+from .services.rollup_service import RollupService
+from .services.analytics_service import AnalyticsService
+from .services.forecast_service import ForecastService
+from .services.public_library_service import PublicLibraryService, DEFAULT_PAGE_SIZE
+from .services.loading import load_profile, lazy_load_guard
+from .services.profile_service import ProfileService, PROFILE_PAGE_SIZE
+from .services.rating_service import RatingService, STARS
+from .services.recommendation_service import (
+    RecommendationService, schedule_build_if_stale, DEFAULT_PAGE_SIZE as RECOMMENDATION_PAGE_SIZE
+)
+from .services.similar_books_service import (
+    SimilarBooksService, schedule_index, DEFAULT_PAGE_SIZE as SIMILAR_PAGE_SIZE
+)
+from .services.wrapup_service import WrapupService
+from .services.sprite_service import SpriteService
+from .services.image_jobs import run_job, JobTimeout
+from .services.cover_service import CoverService
+from .services.image_service import (
+    AVATAR_PROFILE, InvalidImage, avatar_digest, avatar_store_dir, avatar_url_for, remove_image, store_image
+)
 from .models import db, User, Book, ReadingLog, InviteToken, UserRating, normalize_email
 
 from .utils import get_reading_streak
@@ -618,6 +638,36 @@ def get_book(uid: str):
         }), 500
 
 
+@api.route('/books/<uid>/similar', methods=['GET'])
+@login_required
+def get_similar_books(uid: str):
+    """
+    Get shared books with metadata similar to a book
+    
+    GET /api/books/<uid>/similar?limit=10
+    
+    Returns:
+        200: Shared books from the similar-books index, most similar first
+    """
+    try:
+        similar = SimilarBooksService(db.session).get_for_book(
+            uid, request.args.get('limit', SIMILAR_PAGE_SIZE, type=int)
+        )
+        schedule_index()
+        
+        return jsonify({
+            'success': True,
+            'data': similar
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting similar books: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
 @api.route('/books/<uid>', methods=['PUT'])
 @login_required
 def update_book(uid: str):
@@ -765,37 +815,17 @@ def upload_book_cover(uid: str):
         if file_size > 5 * 1024 * 1024:
             return jsonify({ 'success': False, 'error': 'File too large. Maximum size is 5MB' }), 400
 
-        # Save file (and post-process optimize)
-        import os, uuid
-        from werkzeug.utils import secure_filename
-
-        filename = secure_filename(file.filename)
-        ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"cover_{book.id}_{uuid.uuid4().hex[:8]}.{ext}"
-
-        upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'covers')
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, unique_filename)
-        file.save(file_path)
-
-        # Optimize: downscale and convert to webp or jpeg
+        # Resize into the cover store in the image pool, straight from the upload stream
         try:
-            from PIL import Image, ImageOps
-            with Image.open(file_path) as im:
-                im = ImageOps.exif_transpose(im)
-                im = im.convert('RGB')
-                max_side = 1200
-                w, h = im.size
-                scale = min(1.0, max_side / max(w, h))
-                if scale < 1.0:
-                    im = im.resize((int(w*scale), int(h*scale)))
-                # Re-encode
-                optimized_path = file_path
-                im.save(optimized_path, format='JPEG', quality=75, optimize=True)
-        except Exception as e:
-            current_app.logger.warning(f"Cover optimize failed: {e}")
-
-        # If previous cover was a local uploaded file, try to remove it
+            cover_url = CoverService(db.session).store_upload(file.read())
+        except InvalidImage as e:
+            current_app.logger.info(f"Rejected cover upload: {e}")
+            return jsonify({ 'success': False, 'error': 'Could not read image' }), 400
+        except JobTimeout:
+            return jsonify({ 'success': False, 'error': 'Image processing timed out, please try again' }), 503
+
+        # If previous cover was a legacy uploaded file, try to remove it (stored covers may be shared)
+        import os
         try:
             if book.cover_url and book.cover_url.startswith('/static/uploads/covers/'):
                 old_path = os.path.join(current_app.root_path, book.cover_url.lstrip('/'))
@@ -806,11 +836,10 @@ def upload_book_cover(uid: str):
             pass
 
         # Update book
-        cover_url = f"/static/uploads/covers/{unique_filename}"
         book.cover_url = cover_url
         db.session.commit()
 
-        return jsonify({ 'success': True, 'data': { 'cover_url': cover_url } }), 200
+        return jsonify({ 'success': True, 'data': { 'cover_url': cover_url, 'cover_image_url': book.secure_cover_url } }), 200
     except Exception as e:
         current_app.logger.error(f"Error uploading book cover: {e}")
         return jsonify({ 'success': False, 'error': 'Failed to upload cover' }), 500
@@ -1122,9 +1151,118 @@ def get_reading_history():
         }), 500
 
 
+@api.route('/user/reading-heatmap', methods=['GET'])
+@login_required
+def get_reading_heatmap():
+    """
+    Get current user's calendar heatmap in a compact encoding
+    
+    GET /api/user/reading-heatmap?year=2024
+    GET /api/user/reading-heatmap?start_year=2020&end_year=2024
+    
+    Returns:
+        200: Per-year presence bitmaps and packed daily page counts
+        400: Invalid year range
+    """
+    try:
+        year = request.args.get('year', date.today().year, type=int)
+        start_year = request.args.get('start_year', year, type=int)
+        end_year = request.args.get('end_year', max(year, start_year), type=int)
+        
+        heatmap = RollupService(db.session).get_heatmap(current_user.id, start_year, end_year)
+        
+        return jsonify({
+            'success': True,
+            'data': heatmap
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"Error getting reading heatmap: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
+@api.route('/user/analytics', methods=['GET'])
+@login_required
+def get_user_analytics():
+    """
+    Get current user's reading analytics for a year
+    
+    GET /api/user/analytics?year=2024
+    
+    Returns:
+        200: Page series, pace trends, books per year and breakdowns
+        400: Invalid year
+    """
+    try:
+        year = request.args.get('year', type=int)
+        if year is not None and not 1 <= year <= 9998:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid year'
+            }), 400
+        
+        analytics = AnalyticsService(db.session).get_analytics(current_user.id, year)
+        
+        return jsonify({
+            'success': True,
+            'data': analytics
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting user analytics: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
+@api.route('/user/forecasts', methods=['GET'])
+@login_required
+def get_reading_forecasts():
+    """
+    Get current user's reading pace and finish-date forecasts
+    
+    GET /api/user/forecasts?goal=24
+    
+    Returns:
+        200: Pace, per-book forecasts for currently reading books and a year projection
+        400: Invalid goal
+    """
+    try:
+        goal = request.args.get('goal', type=int)
+        if goal is not None and goal < 1:
+            return jsonify({
+                'success': False,
+                'error': 'Goal must be a positive number of books'
+            }), 400
+        
+        forecasts = ForecastService(db.session).get_forecasts(current_user.id, goal)
+        
+        return jsonify({
+            'success': True,
+            'data': forecasts
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting reading forecasts: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
 # Community endpoints
 @api.route('/community/activity', methods=['GET'])
 @login_required
+@lazy_load_guard
 def get_community_activity():
     """
     Get community-wide activity statistics
@@ -1153,24 +1291,42 @@ def get_community_activity():
 
 @api.route('/community/active-readers', methods=['GET'])
 @login_required
+@lazy_load_guard
 def get_active_readers():
     """
     Get active readers with their statistics
     
-    GET /api/community/active-readers
+    GET /api/community/active-readers?window=month&page=1&per_page=50
     
     Returns:
-        200: List of active readers with stats
+        200: Ranked page of active readers with stats
+        400: Unknown ranking window
     """
     try:
         user_service = UserService(db.session)
-        active_readers = user_service.get_active_readers()
+        leaderboard = user_service.get_leaderboard(
+            request.args.get('window', 'month'),
+            request.args.get('page', 1, type=int),
+            request.args.get('per_page', 50, type=int)
+        )
         
         return jsonify({
             'success': True,
-            'data': active_readers
+            'data': [dict(entry, user=entry['user'].to_dict()) for entry in leaderboard['entries']],
+            'pagination': {
+                'window': leaderboard['window'],
+                'page': leaderboard['page'],
+                'per_page': leaderboard['per_page'],
+                'total': leaderboard['total'],
+                'pages': leaderboard['pages']
+            }
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         current_app.logger.error(f"Error getting active readers: {e}")
         return jsonify({
@@ -1181,22 +1337,29 @@ def get_active_readers():
 
 @api.route('/community/books-this-month', methods=['GET'])
 @login_required
+@lazy_load_guard
 def get_books_this_month():
     """
     Get books finished this month by community members
     
-    GET /api/community/books-this-month
+    GET /api/community/books-this-month?before=<cursor>&limit=20
     
     Returns:
-        200: List of books finished this month
+        200: List of books finished this month, newest first, with a cursor for the next page
     """
     try:
         user_service = UserService(db.session)
-        books = user_service.get_books_this_month()
+        page = user_service.get_books_this_month(
+            before=request.args.get('before', type=int),
+            limit=request.args.get('limit', 20, type=int)
+        )
         
         return jsonify({
             'success': True,
-            'data': books
+            'data': page['books'],
+            'pagination': {
+                'next_cursor': page['next_cursor']
+            }
         }), 200
         
     except Exception as e:
@@ -1209,22 +1372,29 @@ def get_books_this_month():
 
 @api.route('/community/currently-reading', methods=['GET'])
 @login_required
+@lazy_load_guard
 def get_currently_reading():
     """
     Get books currently being read by community members
     
-    GET /api/community/currently-reading
+    GET /api/community/currently-reading?before=<cursor>&limit=20
     
     Returns:
-        200: List of books currently being read
+        200: List of books currently being read, newest first, with a cursor for the next page
     """
     try:
         user_service = UserService(db.session)
-        books = user_service.get_currently_reading()
+        page = user_service.get_currently_reading(
+            before=request.args.get('before', type=int),
+            limit=request.args.get('limit', 20, type=int)
+        )
         
         return jsonify({
             'success': True,
-            'data': books
+            'data': page['books'],
+            'pagination': {
+                'next_cursor': page['next_cursor']
+            }
         }), 200
         
     except Exception as e:
@@ -1237,22 +1407,29 @@ def get_currently_reading():
 
 @api.route('/community/recent-activity', methods=['GET'])
 @login_required
+@lazy_load_guard
 def get_recent_activity():
     """
     Get recent reading activity from community members
     
-    GET /api/community/recent-activity
+    GET /api/community/recent-activity?before=<cursor>&limit=20
     
     Returns:
-        200: List of recent reading logs
+        200: List of recent reading logs, newest first, with a cursor for the next page
     """
     try:
         user_service = UserService(db.session)
-        activity = user_service.get_recent_activity()
+        page = user_service.get_recent_activity(
+            before=request.args.get('before', type=int),
+            limit=request.args.get('limit', 20, type=int)
+        )
         
         return jsonify({
             'success': True,
-            'data': activity
+            'data': page['events'],
+            'pagination': {
+                'next_cursor': page['next_cursor']
+            }
         }), 200
         
     except Exception as e:
@@ -1298,6 +1475,47 @@ def get_public_user_profile(user_id):
         }), 500
 
 
+@api.route('/user/<int:user_id>/profile/books', methods=['GET'])
+@login_required
+def get_public_user_books(user_id):
+    """
+    Get one page of books from a public profile
+    
+    GET /api/user/<user_id>/profile/books?before=<cursor>&limit=24
+    
+    Returns:
+        200: Page of books, most recently added first, with a cursor for the next page
+        404: User not found or not sharing
+    """
+    try:
+        page = ProfileService(db.session).get_books(
+            user_id,
+            before=request.args.get('before', type=int),
+            limit=request.args.get('limit', PROFILE_PAGE_SIZE, type=int)
+        )
+        
+        if page is None:
+            return jsonify({
+                'success': False,
+                'error': 'User not found or not sharing profile'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': page['books'],
+            'pagination': {
+                'next_cursor': page['next_cursor']
+            }
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting user profile books: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
 # OpenAPI Documentation
 @api.route('/openapi.json', methods=['GET'])
 def get_openapi_spec():
@@ -1343,6 +1561,9 @@ def get_openapi_spec():
                         "author": {"type": "string"},
                         "isbn": {"type": "string"},
                         "cover_url": {"type": "string"},
+                        "cover_image_url": {"type": "string", "description": "Locally mirrored cover when available, else the HTTPS cover URL"},
+                        "cover_placeholder": {"type": "string", "nullable": True, "description": "Tiny WebP data URI to show while the stored cover loads"},
+                        "cover_color": {"type": "string", "nullable": True, "description": "Dominant colour of the stored cover (#rrggbb)"},
                         "description": {"type": "string"},
                         "published_date": {"type": "string"},
                         "page_count": {"type": "integer"},
@@ -1864,6 +2085,120 @@ def get_openapi_spec():
                     }
                 }
             },
+            "/user/reading-heatmap": {
+                "get": {
+                    "summary": "Get reading heatmap",
+                    "description": "Retrieve current user's calendar heatmap as a 366-bit presence bitmap plus packed daily pages per year",
+                    "parameters": [
+                        {"name": "year", "in": "query", "schema": {"type": "integer"}},
+                        {"name": "start_year", "in": "query", "schema": {"type": "integer"}},
+                        {"name": "end_year", "in": "query", "schema": {"type": "integer"}}
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Reading heatmap",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "success": {"type": "boolean"},
+                                            "data": {
+                                                "type": "object",
+                                                "properties": {
+                                                    "encoding": {"type": "object"},
+                                                    "years": {
+                                                        "type": "array",
+                                                        "items": {
+                                                            "type": "object",
+                                                            "properties": {
+                                                                "year": {"type": "integer"},
+                                                                "active_days": {"type": "integer"},
+                                                                "total_pages": {"type": "integer"},
+                                                                "bitmap": {"type": "string", "format": "byte"},
+                                                                "pages": {"type": "string", "format": "byte"}
+                                                            }
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/user/analytics": {
+                "get": {
+                    "summary": "Get reading analytics",
+                    "description": "Retrieve pages per week and month, pace trends, books per year, days to finish and author/genre breakdowns for a year",
+                    "parameters": [
+                        {"name": "year", "in": "query", "schema": {"type": "integer"}}
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Reading analytics",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "success": {"type": "boolean"},
+                                            "data": {
+                                                "type": "object",
+                                                "properties": {
+                                                    "year": {"type": "integer"},
+                                                    "library_version": {"type": "integer"},
+                                                    "pages": {"type": "object"},
+                                                    "books_finished": {"type": "integer"},
+                                                    "books_per_year": {"type": "object"},
+                                                    "finish_time": {"type": "object"},
+                                                    "authors": {"type": "array", "items": {"type": "object"}},
+                                                    "genres": {"type": "array", "items": {"type": "object"}}
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/user/forecasts": {
+                "get": {
+                    "summary": "Get reading forecasts",
+                    "description": "Retrieve reading pace, forecast finish dates for currently reading books and a projection for the current year",
+                    "parameters": [
+                        {"name": "goal", "in": "query", "schema": {"type": "integer"}}
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Reading forecasts",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "success": {"type": "boolean"},
+                                            "data": {
+                                                "type": "object",
+                                                "properties": {
+                                                    "pace": {"type": "object"},
+                                                    "books": {"type": "array", "items": {"type": "object"}},
+                                                    "year": {"type": "object"}
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
             "/community/activity": {
                 "get": {
                     "summary": "Get community activity",
@@ -1987,11 +2322,23 @@ def get_openapi_spec():
                                 "enum": ["currently_reading", "want_to_read", "all"]
                             },
                             "description": "Filter by status (currently_reading, want_to_read, or all)"
+                        },
+                        {
+                            "name": "cursor",
+                            "in": "query",
+                            "schema": {"type": "string"},
+                            "description": "next_cursor from the previous page"
+                        },
+                        {
+                            "name": "limit",
+                            "in": "query",
+                            "schema": {"type": "integer", "default": 50, "maximum": 100},
+                            "description": "Page size"
                         }
                     ],
                     "responses": {
                         "200": {
-                            "description": "List of public books",
+                            "description": "One page of public books (list projection without descriptions)",
                             "content": {
                                 "application/json": {
                                     "schema": {
@@ -2001,6 +2348,70 @@ def get_openapi_spec():
                                             "data": {
                                                 "type": "array",
                                                 "items": {"$ref": "#/components/schemas/Book"}
+                                            },
+                                            "pagination": {
+                                                "type": "object",
+                                                "properties": {
+                                                    "next_cursor": {"type": "string", "nullable": True}
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "400": {
+                            "description": "Unknown filter or malformed cursor",
+                            "content": {
+                                "application/json": {
+                                    "schema": {"$ref": "#/components/schemas/Error"}
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/recommendations": {
+                "get": {
+                    "summary": "Get recommendations",
+                    "description": "Books read by readers with similar libraries, from the periodic recommendation build",
+                    "parameters": [
+                        {
+                            "name": "book",
+                            "in": "query",
+                            "schema": {"type": "string"},
+                            "description": "Book uid; return books most often read alongside it instead of personal recommendations"
+                        },
+                        {
+                            "name": "limit",
+                            "in": "query",
+                            "schema": {"type": "integer", "default": 20, "maximum": 50},
+                            "description": "Number of recommendations"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Shared books, best match first",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "success": {"type": "boolean"},
+                                            "data": {
+                                                "type": "array",
+                                                "items": {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "shared_book_id": {"type": "integer"},
+                                                        "custom_id": {"type": "string"},
+                                                        "title": {"type": "string"},
+                                                        "author": {"type": "string"},
+                                                        "isbn": {"type": "string", "nullable": True},
+                                                        "cover_url": {"type": "string", "nullable": True},
+                                                        "score": {"type": "number"}
+                                                    }
+                                                }
                                             }
                                         }
                                     }
@@ -2010,6 +2421,103 @@ def get_openapi_spec():
                     }
                 }
             },
+            "/books/{uid}/similar": {
+                "get": {
+                    "summary": "Get similar books",
+                    "description": "Shared books whose description, categories, author or publisher resemble this book, from the precomputed similar-books index",
+                    "parameters": [
+                        {
+                            "name": "uid",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "string"}
+                        },
+                        {
+                            "name": "limit",
+                            "in": "query",
+                            "schema": {"type": "integer", "default": 10, "maximum": 20},
+                            "description": "Number of similar books"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Shared books, most similar first (same item shape as /recommendations)"
+                        }
+                    }
+                }
+            },
+            "/reports/month-wrapup/{year}/{month}/image": {
+                "get": {
+                    "summary": "Render a month wrap-up",
+                    "description": "Starts rendering the current user's month wrap-up image in the background. Poll until the status is 'ready', then download the image from 'url'",
+                    "parameters": [
+                        {
+                            "name": "year",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "integer"}
+                        },
+                        {
+                            "name": "month",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "integer", "minimum": 1, "maximum": 12}
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Wrap-up ready: status, etag (null if some covers could not be loaded) and url"
+                        },
+                        "202": {
+                            "description": "Still rendering (status 'pending'); poll again"
+                        },
+                        "404": {
+                            "description": "No books finished that month"
+                        }
+                    }
+                }
+            },
+            "/reports/year-review/{year}": {
+                "get": {
+                    "summary": "Get year-in-review collage pages",
+                    "description": "Number of books finished in the year and the URL of each page of the year-in-review collage (covers are tiled over as many pages as needed)",
+                    "parameters": [
+                        {
+                            "name": "year",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "integer"}
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "year, books, pages and urls (one JPEG per page)"
+                        }
+                    }
+                }
+            },
+            "/books/sprites/{page}": {
+                "get": {
+                    "summary": "Get a page of cover sprite sheets",
+                    "description": "Locally stored cover thumbnails of a page of the user's books (100 per page, oldest first) packed into one image. Books without a stored cover are not in offsets and keep their own cover URL",
+                    "parameters": [
+                        {
+                            "name": "page",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "integer"}
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "page, pages, version, url (WebP or JPEG by Accept header; null if no tiles), tile {width, height}, columns and offsets {book uid: {x, y}}"
+                        },
+                        "404": {
+                            "description": "No such page"
+                        }
+                    }
+                }
+            },
             "/books/search": {
                 "get": {
                     "summary": "Search books using Google Books API",
@@ -2744,33 +3252,167 @@ def get_recent_users():
 @api.route('/books/public', methods=['GET'])
 @login_required
 def get_public_books():
-    """Get public books from all users who have enabled sharing"""
-    filter_status = request.args.get('filter', 'all')
+    """
+    Get public books from all users who have enabled sharing
     
-    # Query books from users who have enabled public library sharing
-    books_query = db.session.query(Book).join(User).filter(
-        User.share_library == True,
-        Book.library_only.isnot(True)
-    )
+    GET /api/books/public?filter=all&cursor=<cursor>&limit=50
     
-    if filter_status == 'currently_reading':
-        books_query = books_query.filter(
-            Book.finish_date.is_(None),
-            Book.want_to_read.isnot(True),
-            Book.library_only.isnot(True)
+    Returns:
+        200: One page of shared books, with a cursor for the next page
+        400: Unknown filter or malformed cursor
+    """
+    try:
+        page = PublicLibraryService(db.session).get_page(
+            request.args.get('filter', 'all'),
+            request.args.get('cursor'),
+            request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
         )
-    elif filter_status == 'want_to_read':
-        books_query = books_query.filter(Book.want_to_read.is_(True))
-    else:  # Default "Show All" case
-        books_query = books_query.order_by(Book.finish_date.desc().nullslast(), Book.id.desc())
-    
-    books = books_query.all()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'data': [book.to_dict() for book in books]
+        'data': page['books'],
+        'pagination': {
+            'next_cursor': page['next_cursor']
+        }
     })
 
+@api.route('/recommendations', methods=['GET'])
+@login_required
+def get_recommendations():
+    """
+    Get "readers like you also read" recommendations
+    
+    GET /api/recommendations?limit=20
+    GET /api/recommendations?book=<uid>&limit=20
+    
+    Returns:
+        200: Shared books from the last recommendation build, best match first
+    """
+    try:
+        service = RecommendationService(db.session)
+        limit = request.args.get('limit', RECOMMENDATION_PAGE_SIZE, type=int)
+        book_uid = request.args.get('book')
+        if book_uid:
+            recommendations = service.get_for_book(book_uid, limit)
+        else:
+            recommendations = service.get_for_user(current_user.id, limit)
+        schedule_build_if_stale()
+        
+        return jsonify({
+            'success': True,
+            'data': recommendations
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting recommendations: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get recommendations'
+        }), 500
+
+@api.route('/reports/month-wrapup/<int:year>/<int:month>/image', methods=['GET'])
+@login_required
+def render_month_wrapup_image(year: int, month: int):
+    """
+    Start rendering the current user's month wrap-up image without waiting for it
+    
+    GET /api/reports/month-wrapup/2024/5/image
+    
+    Returns:
+        200: Ready; the image is at 'url'
+        202: Still rendering; poll this endpoint again
+        404: No books finished that month
+    """
+    try:
+        if not 1 <= month <= 12:
+            return jsonify({'success': False, 'error': 'Invalid month'}), 400
+        review = WrapupService(db.session).request_month_review(current_user.id, year, month)
+        if review is None:
+            return jsonify({'success': False, 'error': 'No books finished that month'}), 404
+        if review['status'] == 'failed':
+            return jsonify({'success': False, 'error': 'Failed to render wrap-up'}), 500
+        
+        data = dict(review)
+        if review['status'] == 'ready':
+            data['url'] = url_for('main.month_review', year=year, month=month)
+        return jsonify({
+            'success': True,
+            'data': data
+        }), 200 if review['status'] == 'ready' else 202
+        
+    except Exception as e:
+        current_app.logger.error(f"Error rendering month wrap-up: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to render wrap-up'
+        }), 500
+
+@api.route('/reports/year-review/<int:year>', methods=['GET'])
+@login_required
+def get_year_review(year: int):
+    """
+    Get the pages of the current user's year-in-review collage
+    
+    GET /api/reports/year-review/2024
+    
+    Returns:
+        200: Books finished in the year and the image URL of each collage page
+    """
+    try:
+        summary = WrapupService(db.session).year_summary(current_user.id, year)
+        summary['urls'] = [
+            url_for('main.year_review', year=year, page=page) for page in range(1, summary['pages'] + 1)
+        ]
+        
+        return jsonify({
+            'success': True,
+            'data': dict(summary, year=year)
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting year review: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get year review'
+        }), 500
+
+@api.route('/books/sprites/<int:page>', methods=['GET'])
+@login_required
+def get_cover_sprite(page: int):
+    """
+    Get the layout of a page of the current user's cover sprite sheets
+    
+    GET /api/books/sprites/1
+    
+    Returns:
+        200: Sheet URL, tile size and each book's offset in the sheet
+        404: No such page
+    """
+    try:
+        sheet = SpriteService(db.session).get_sheet(current_user.id, page)
+        if sheet is None:
+            return jsonify({
+                'success': False,
+                'error': 'Page not found'
+            }), 404
+        
+        url = None
+        if sheet['offsets']:
+            url = url_for('main.cover_sprite', page=page, version=sheet['version'])
+        return jsonify({
+            'success': True,
+            'data': dict(sheet, url=url)
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting cover sprite sheet: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get cover sprite sheet'
+        }), 500
+
 @api.route('/books/search', methods=['GET'])
 @login_required
 def search_books():
@@ -2868,10 +3510,10 @@ def get_month_wrapup(year, month):
             ReadingLog.date <= end_date
         ).all()
         
-        # Calculate statistics
-        total_pages_read = sum(log.pages_read for log in reading_logs)
+        # Calculate statistics (day totals come from the daily rollup)
+        total_pages_read, total_reading_days = RollupService(db.session).get_period_totals(
+            current_user.id, start_date.date(), end_date.date())
         total_books_finished = len(finished_books)
-        total_reading_days = len(set(log.date for log in reading_logs))
         
         # Get reading streak
         reading_streak = current_user.get_reading_streak()
@@ -3045,9 +3687,18 @@ def delete_user(user_id):
             'error': 'Cannot delete your own account'
         }), 400
     
-    # Delete user's books and reading logs
-    Book.query.filter_by(user_id=user_id).delete()
-    ReadingLog.query.filter_by(user_id=user_id).delete()
+    # Delete user's library through the session (not bulk deletes) so
+    # flush-time bookkeeping such as statistics and the activity feed sees it
+    books = Book.query.filter_by(user_id=user_id).all()
+    book_ids = [book.id for book in books]
+    for reading_log in ReadingLog.query.filter_by(user_id=user_id).all():
+        db.session.delete(reading_log)
+    for rating in UserRating.query.filter(db.or_(
+        UserRating.user_id == user_id, UserRating.book_id.in_(book_ids)
+    )).all():
+        db.session.delete(rating)
+    for book in books:
+        db.session.delete(book)
     
     # Delete the user
     db.session.delete(user)
@@ -3574,6 +4225,22 @@ def grant_user_tokens(user_id):
         }), 500
 
 
+def _discard_profile_picture(url: str, user_id: int) -> None:
+    """Best-effort removal of a profile picture's files once no other user shows them"""
+    import os
+    try:
+        if url and url.startswith('/static/uploads/profiles/'):
+            path = os.path.join(current_app.root_path, url.lstrip('/'))
+            if os.path.exists(path):
+                os.remove(path)
+        elif avatar_digest(url):
+            # Identical uploads share their stored files
+            if not User.query.filter(User.profile_picture == url, User.id != user_id).first():
+                remove_image(avatar_store_dir(), avatar_digest(url))
+    except Exception as e:
+        current_app.logger.warning(f"Could not remove profile picture {url}: {e}")
+
+
 # Profile Picture Upload
 @api.route('/user/profile-picture', methods=['POST'])
 @login_required
@@ -3613,34 +4280,28 @@ def upload_profile_picture():
                 'error': 'File too large. Maximum size is 5MB'
             }), 400
         
-        # Generate unique filename
-        import os
-        import uuid
-        from werkzeug.utils import secure_filename
-        
-        filename = secure_filename(file.filename)
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"profile_{current_user.id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-        
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'profiles')
-        os.makedirs(upload_dir, exist_ok=True)
+        # Resize into the avatar store in the image pool, straight from the upload stream
+        try:
+            digest = run_job(store_image, avatar_store_dir(), file.read(), AVATAR_PROFILE).digest
+        except InvalidImage as e:
+            current_app.logger.info(f"Rejected profile picture upload: {e}")
+            return jsonify({
+                'success': False,
+                'error': 'Could not read image'
+            }), 400
+        except JobTimeout:
+            return jsonify({
+                'success': False,
+                'error': 'Image processing timed out, please try again'
+            }), 503
         
         # Remove previous uploaded profile if present
-        try:
-            if current_user.profile_picture and current_user.profile_picture.startswith('/static/uploads/profiles/'):
-                old_path = os.path.join(current_app.root_path, current_user.profile_picture.lstrip('/'))
-                if os.path.exists(old_path):
-                    os.remove(old_path)
-        except Exception:
-            pass
-
-        # Save file
-        file_path = os.path.join(upload_dir, unique_filename)
-        file.save(file_path)
+        previous = current_user.profile_picture
+        profile_url = avatar_url_for(digest)
+        if previous != profile_url:
+            _discard_profile_picture(previous, current_user.id)
         
         # Update user's profile picture
-        profile_url = f'/static/uploads/profiles/{unique_filename}'
         current_user.profile_picture = profile_url
         db.session.commit()
         
@@ -3665,11 +4326,8 @@ def delete_profile_picture():
     """Delete the current user's profile picture"""
     try:
         if current_user.profile_picture:
-            # Remove the file
-            import os
-            file_path = os.path.join(current_app.root_path, current_user.profile_picture.lstrip('/'))
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Remove the files
+            _discard_profile_picture(current_user.profile_picture, current_user.id)
             
             # Clear the database field
             current_user.profile_picture = None
@@ -3736,16 +4394,15 @@ def rate_book(book_id):
             db.session.add(new_rating)
             db.session.commit()
         
-        # Update book's average rating
-        book.update_average_rating()
-        
+        # The book's rating aggregates were moved by the commit itself
         return jsonify({
             'success': True,
             'data': {
                 'rating': rating,
                 'review': review,
                 'average_rating': book.average_rating,
-                'rating_count': book.rating_count
+                'rating_count': book.rating_count,
+                'histogram': RatingService(db.session).get_rating_summary(book_id)['histogram']
             }
         })
         
@@ -3765,13 +4422,17 @@ def get_book_rating(book_id):
     try:
         book = Book.query.get_or_404(book_id)
         user_rating = book.get_user_rating(current_user.id)
+        ratings = RatingService(db.session)
         
         return jsonify({
             'success': True,
             'data': {
                 'user_rating': user_rating.to_dict() if user_rating else None,
                 'average_rating': book.average_rating,
-                'rating_count': book.rating_count
+                'rating_count': book.rating_count,
+                'histogram': ratings.get_rating_summary(book_id)['histogram'],
+                # Across every user's copy of this title
+                'catalog': ratings.get_shared_rating_summary(book.shared_book_id) if book.shared_book_id else None
             }
         })
         
@@ -3794,16 +4455,14 @@ def delete_book_rating(book_id):
         if user_rating:
             db.session.delete(user_rating)
             db.session.commit()
-            
-            # Update book's average rating
-            book.update_average_rating()
         
         return jsonify({
             'success': True,
             'message': 'Rating deleted successfully',
             'data': {
                 'average_rating': book.average_rating,
-                'rating_count': book.rating_count
+                'rating_count': book.rating_count,
+                'histogram': RatingService(db.session).get_rating_summary(book_id)['histogram']
             }
         })
         
@@ -3817,16 +4476,19 @@ def delete_book_rating(book_id):
 
 
 @api.route('/books/<int:book_id>/ratings', methods=['GET'])
+@lazy_load_guard
 def get_book_ratings(book_id):
     """Get all ratings for a book (public endpoint)"""
     try:
         book = Book.query.get_or_404(book_id)
-        ratings = UserRating.query.filter_by(book_id=book_id).order_by(UserRating.created_at.desc()).all()
+        ratings = UserRating.query.filter_by(book_id=book_id)\
+            .options(*load_profile('rating_with_user'))\
+            .order_by(UserRating.created_at.desc()).all()
         
         # Get user info for each rating
         rating_data = []
         for rating in ratings:
-            user = User.query.get(rating.user_id)
+            user = rating.user
             rating_data.append({
                 'id': rating.id,
                 'rating': rating.rating,
@@ -3843,7 +4505,9 @@ def get_book_ratings(book_id):
             'data': {
                 'ratings': rating_data,
                 'average_rating': book.average_rating,
-                'rating_count': book.rating_count
+                'rating_count': book.rating_count,
+                # Every rating is already loaded here, so count them rather than re-read the aggregates
+                'histogram': {stars: sum(1 for rating in ratings if rating.rating == stars) for stars in STARS}
             }
         })
         
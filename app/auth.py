@@ -8,6 +8,7 @@ from flask_wtf import FlaskForm
 from .forms import (LoginForm, RegistrationForm, UserProfileForm, ChangePasswordForm,
                    PrivacySettingsForm, ForcedPasswordChangeForm, SetupForm, ReadingStreakForm)
 from .debug_utils import debug_route, debug_auth, debug_csrf, debug_session
+from .services.loading import load_profile, lazy_load_guard
 from datetime import datetime, timezone
 
 auth = Blueprint('auth', __name__)
@@ -339,6 +340,7 @@ def privacy_settings():
 
 @auth.route('/my_activity')
 @login_required
+@lazy_load_guard
 def my_activity():
     from .models import Book, ReadingLog
     from sqlalchemy import func
@@ -361,9 +363,9 @@ def my_activity():
     ).limit(10).all()
     
     # Get recent reading logs (last 10)
-    recent_logs = ReadingLog.query.filter_by(user_id=current_user.id).order_by(
-        ReadingLog.date.desc()
-    ).limit(10).all()
+    recent_logs = ReadingLog.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile('log_with_book'))\
+        .order_by(ReadingLog.date.desc()).limit(10).all()
     
     return render_template('auth/my_activity.html', 
                          title='My Activity',
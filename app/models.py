@@ -13,6 +13,10 @@ def normalize_email(email):
         return email.strip().lower()
     return email
 
+def normalize_title_key(title, author):
+    """Case-insensitive catalog key for a title and author (Unicode case folding)"""
+    return f"{(title or '').casefold()}\x1f{(author or '').casefold()}"
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -248,6 +252,8 @@ class Book(db.Model):
     start_date = db.Column(db.Date, nullable=True)
     finish_date = db.Column(db.Date, nullable=True)
     cover_url = db.Column(db.String(512), nullable=True)
+    # Local mirror of a remote cover_url, maintained by the cover mirror
+    cover_digest = db.Column(db.String(64), nullable=True)
     want_to_read = db.Column(db.Boolean, default=False)
     library_only = db.Column(db.Boolean, default=False)
     # New metadata fields
@@ -266,10 +272,25 @@ class Book(db.Model):
     # Add unique constraint for ISBN per user (only when ISBN is not null)
     __table_args__ = (
         db.UniqueConstraint('user_id', 'isbn', name='unique_user_isbn'),
+        db.Index('ix_book_isbn', 'isbn'),
+        db.Index('ix_book_user_finish_date', 'user_id', 'finish_date'),
+        db.Index('ix_book_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_book_user_id', 'user_id', 'id'),
+        db.Index('ix_book_shared_book_id', 'shared_book_id'),
+        # Community queries: finished in a date range, or unfinished ordered by start date
+        db.Index('ix_book_finish_date_start_date', 'finish_date', 'start_date'),
+        # Public library keyset pages
+        db.Index('ix_book_finish_date_id', 'finish_date', 'id'),
+        db.Index('ix_book_want_to_read_id', 'want_to_read', 'id'),
+        # Cover mirror: unmirrored books, and every book using a given cover URL
+        db.Index('ix_book_cover_digest_url', 'cover_digest', 'cover_url'),
+        db.Index('ix_book_cover_url', 'cover_url'),
     )
     
     # Relationship to shared book data
     shared_book = db.relationship('SharedBookData', backref='books')
+    cover_image = db.relationship('CoverImage', primaryjoin='foreign(Book.cover_digest) == CoverImage.digest',
+                                  viewonly=True, uselist=False)
 
     def __init__(self, title, author, user_id, isbn=None, shared_book_id=None, start_date=None, finish_date=None, cover_url=None, want_to_read=False, library_only=False, description=None, published_date=None, page_count=None, categories=None, publisher=None, language=None, average_rating=None, rating_count=None, **kwargs):
         self.title = title
@@ -327,10 +348,19 @@ class Book(db.Model):
     
     @property
     def secure_cover_url(self):
-        """Return HTTPS version of cover URL for security."""
-        if self.cover_url and self.cover_url.startswith('http://'):
-            return self.cover_url.replace('http://', 'https://')
-        return self.cover_url
+        """Return the locally mirrored cover, or the HTTPS version of the cover URL."""
+        from .services.cover_service import served_cover_url
+        return served_cover_url(self.cover_url, self.cover_digest)
+    
+    @property
+    def cover_placeholder(self):
+        """Inline placeholder image shown while the stored cover loads, if any"""
+        return self.cover_image.placeholder if self.cover_digest and self.cover_image else None
+    
+    @property
+    def cover_color(self):
+        """Dominant colour of the stored cover ('#rrggbb'), if any"""
+        return self.cover_image.color if self.cover_digest and self.cover_image else None
     
     @property
     def custom_id(self):
@@ -352,6 +382,9 @@ class Book(db.Model):
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'finish_date': self.finish_date.isoformat() if self.finish_date else None,
             'cover_url': self.cover_url,
+            'cover_image_url': self.secure_cover_url,
+            'cover_placeholder': self.cover_placeholder,
+            'cover_color': self.cover_color,
             'want_to_read': self.want_to_read,
             'library_only': self.library_only,
             'description': self.description,
@@ -367,19 +400,9 @@ class Book(db.Model):
         }
     
     def update_average_rating(self):
-        """Update the book's average rating based on all user ratings"""
-        from .models import UserRating
-        
-        ratings = UserRating.query.filter_by(book_id=self.id).all()
-        if ratings:
-            total_rating = sum(r.rating for r in ratings)
-            self.average_rating = round(total_rating / len(ratings), 1)
-            self.rating_count = len(ratings)
-        else:
-            self.average_rating = None
-            self.rating_count = 0
-        
-        db.session.commit()
+        """Recompute this book's rating aggregates from its ratings (repairs drift)"""
+        from app.services.rating_service import RatingService
+        RatingService(db.session).rebuild_book(self.id)
     
     def get_user_rating(self, user_id):
         """Get a specific user's rating for this book"""
@@ -403,6 +426,7 @@ class UserRating(db.Model):
     # Ensure one rating per user per book
     __table_args__ = (
         db.UniqueConstraint('user_id', 'book_id', name='unique_user_book_rating'),
+        db.Index('ix_user_rating_book_id', 'book_id'),
     )
     
     # Relationships
@@ -447,6 +471,8 @@ class ReadingLog(db.Model):
     # Ensure unique log per user per book per date
     __table_args__ = (
         db.UniqueConstraint('user_id', 'book_id', 'date', name='unique_user_book_date'),
+        db.Index('ix_reading_log_user_date', 'user_id', 'date'),
+        db.Index('ix_reading_log_book_id', 'book_id'),
     )
     
     def to_dict(self):
@@ -463,6 +489,261 @@ class ReadingLog(db.Model):
     def __repr__(self):
         return f'<ReadingLog {self.book_id} {self.user_id} {self.date}>'
 
+class UserStats(db.Model):
+    """Materialized per-user reading statistics, maintained on every library write"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_books = db.Column(db.Integer, nullable=False, default=0)
+    finished_books = db.Column(db.Integer, nullable=False, default=0)
+    currently_reading = db.Column(db.Integer, nullable=False, default=0)
+    want_to_read = db.Column(db.Integer, nullable=False, default=0)
+    library_only = db.Column(db.Integer, nullable=False, default=0)
+    total_pages_read = db.Column(db.Integer, nullable=False, default=0)
+    reading_log_count = db.Column(db.Integer, nullable=False, default=0)
+    # Books finished per period, keyed by 'YYYY' and 'YYYY-MM'
+    finished_by_period = db.Column(db.JSON, nullable=False, default=dict)
+    # Bumped on every book or reading-log write; keys caches of derived views
+    library_version = db.Column(db.Integer, nullable=False, default=0)
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    def to_dict(self):
+        """Convert statistics to dictionary for API responses"""
+        return {
+            'total_books': self.total_books,
+            'finished_books': self.finished_books,
+            'currently_reading': self.currently_reading,
+            'want_to_read': self.want_to_read,
+            'library_only': self.library_only,
+            'total_pages_read': self.total_pages_read,
+            'reading_log_count': self.reading_log_count,
+            'finished_by_period': dict(self.finished_by_period or {}),
+            'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None
+        }
+    
+    def __repr__(self):
+        return f'<UserStats user={self.user_id} books={self.total_books}>'
+
+class RatingAggregate:
+    """Running rating aggregates: count, sum and a 1-5 star histogram"""
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+    
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else None
+    
+    @property
+    def histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+class BookRatingStats(RatingAggregate, db.Model):
+    """Running rating aggregates for a book, updated in the same transaction as each rating write"""
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), primary_key=True)
+    
+    def __repr__(self):
+        return f'<BookRatingStats book={self.book_id} count={self.rating_count} sum={self.rating_sum}>'
+
+class SharedBookRatingStats(RatingAggregate, db.Model):
+    """Rating aggregates across every user's copy of a shared book"""
+    shared_book_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), primary_key=True)
+    
+    def __repr__(self):
+        return f'<SharedBookRatingStats shared_book={self.shared_book_id} count={self.rating_count}>'
+
+class SharedBookNeighbor(db.Model):
+    """Top-K most similar shared books by reader co-occurrence, from the periodic recommendation build"""
+    shared_book_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_shared_book_neighbor_neighbor_id', 'neighbor_id'),
+    )
+    
+    def __repr__(self):
+        return f'<SharedBookNeighbor {self.shared_book_id} #{self.rank} -> {self.neighbor_id}>'
+
+class UserRecommendation(db.Model):
+    """Precomputed "readers like you also read" list for a user, in rank order"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    shared_book_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_user_recommendation_shared_book_id', 'shared_book_id'),
+    )
+    
+    def __repr__(self):
+        return f'<UserRecommendation user={self.user_id} #{self.rank} -> {self.shared_book_id}>'
+
+class SharedBookTerm(db.Model):
+    """One weighted term of a shared book's metadata in the similar-books index (unit-length TF-IDF vector)"""
+    shared_book_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), primary_key=True)
+    term = db.Column(db.String(80), primary_key=True)
+    weight = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_shared_book_term_term', 'term'),
+    )
+    
+    def __repr__(self):
+        return f'<SharedBookTerm {self.shared_book_id} {self.term}={self.weight:.3f}>'
+
+class SimilarBook(db.Model):
+    """Top-K shared books with the most similar metadata, maintained by the similar-books index"""
+    shared_book_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_id = db.Column(db.Integer, db.ForeignKey('shared_book_data.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_similar_book_similar_id', 'similar_id'),
+    )
+    
+    def __repr__(self):
+        return f'<SimilarBook {self.shared_book_id} #{self.rank} -> {self.similar_id}>'
+
+class CoverSource(db.Model):
+    """A remote cover URL and the mirrored image it resolved to (cover mirror)"""
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(512), unique=True, nullable=False)
+    digest = db.Column(db.String(64), db.ForeignKey('cover_image.digest'), nullable=True)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<CoverSource {self.url} -> {self.digest}>'
+
+class CoverImage(db.Model):
+    """A mirrored cover, stored once per SHA-256 of its original bytes"""
+    digest = db.Column(db.String(64), primary_key=True)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    # Shown while the cover loads: a tiny WebP data URI and the dominant colour ('#rrggbb')
+    placeholder = db.Column(db.Text, nullable=True)
+    color = db.Column(db.String(7), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<CoverImage {self.digest[:12]} {self.width}x{self.height}>'
+
+class ReadingDay(db.Model):
+    """Per-user daily reading rollup: one row for each day with at least one log"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    # Logs are unique per (user, book, date), so this is also the log count for the day
+    books = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ReadingDay user={self.user_id} {self.date} pages={self.pages} books={self.books}>'
+
+class ReadingStreak(db.Model):
+    """Persisted reading-streak state, updated incrementally as reading days change"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # Length of the run of consecutive reading days ending at last_log_date
+    current_run = db.Column(db.Integer, nullable=False, default=0)
+    longest_run = db.Column(db.Integer, nullable=False, default=0)
+    last_log_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<ReadingStreak user={self.user_id} run={self.current_run} last={self.last_log_date}>'
+
+class ActivityEvent(db.Model):
+    """Append-only community feed entry, written when a sharing user reads"""
+    __table_args__ = (
+        db.Index('ix_activity_event_type_id', 'event_type', 'id'),
+        db.Index('ix_activity_event_type_date', 'event_type', 'event_date'),
+        db.Index('ix_activity_event_user_id', 'user_id', 'id'),
+        db.Index('ix_activity_event_book_id', 'book_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=True)
+    event_type = db.Column(db.String(20), nullable=False)  # started, finished, logged, rated
+    event_date = db.Column(db.Date, nullable=True)
+    pages_read = db.Column(db.Integer, nullable=True)
+    rating = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    user = db.relationship('User')
+    book = db.relationship('Book')
+    
+    def to_dict(self):
+        """Convert event to dictionary for API responses, with user and book summaries"""
+        return {
+            'id': self.id,
+            'event_type': self.event_type,
+            'user_id': self.user_id,
+            'book_id': self.book_id,
+            'date': self.event_date.isoformat() if self.event_date else None,
+            'pages_read': self.pages_read,
+            'rating': self.rating,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'user': {
+                'id': self.user.id,
+                'username': self.user.username,
+                'profile_picture': self.user.profile_picture
+            } if self.user else None,
+            'book': {
+                'id': self.book.id,
+                'uid': self.book.uid,
+                'title': self.book.title,
+                'author': self.book.author,
+                'cover_url': self.book.cover_url,
+                'start_date': self.book.start_date.isoformat() if self.book.start_date else None,
+                'finish_date': self.book.finish_date.isoformat() if self.book.finish_date else None
+            } if self.book else None
+        }
+    
+    def __repr__(self):
+        return f'<ActivityEvent {self.event_type} user={self.user_id} book={self.book_id}>'
+
+class CacheVersion(db.Model):
+    """Named instance-wide version counter, bumped by writes that invalidate shared caches"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
+class Lease(db.Model):
+    """Named lease that lets one request or worker process at a time do shared work"""
+    name = db.Column(db.String(50), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<Lease {self.name} until {self.expires_at}>'
+
+class CommunitySnapshot(db.Model):
+    """Precomputed community aggregates shared by all worker processes"""
+    name = db.Column(db.String(50), primary_key=True)
+    # cache_version value the payload was computed from
+    version = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    computed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<CommunitySnapshot {self.name} v{self.version}>'
+
+class JobRun(db.Model):
+    """When a periodic background job last completed, and what it did"""
+    name = db.Column(db.String(50), primary_key=True)
+    completed_at = db.Column(db.DateTime, nullable=False)
+    summary = db.Column(db.JSON, nullable=False, default=dict)
+    
+    def __repr__(self):
+        return f'<JobRun {self.name} at {self.completed_at}>'
+
 class SystemSettings(db.Model):
     """System-wide settings controlled by administrators"""
     id = db.Column(db.Integer, primary_key=True)
@@ -505,6 +786,8 @@ class SharedBookData(db.Model):
     custom_id = db.Column(db.String(20), unique=True, nullable=False)  # Custom ID for books without ISBN
     title = db.Column(db.String(255), nullable=False)
     author = db.Column(db.String(255), nullable=False)
+    # normalize_title_key(title, author), kept in step by the validator below
+    title_key = db.Column(db.String(1024), nullable=True)
     isbn = db.Column(db.String(13), nullable=True)  # Optional ISBN
     cover_url = db.Column(db.String(512), nullable=True)
     description = db.Column(db.Text, nullable=True)
@@ -519,6 +802,14 @@ class SharedBookData(db.Model):
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_shared_book_data_isbn', 'isbn'),
+        # Books without an ISBN are matched to the catalog by title and author
+        db.Index('ix_shared_book_data_title_key', 'title_key'),
+        # Incremental similar-books indexing picks up rows changed since its last run
+        db.Index('ix_shared_book_data_updated_at', 'updated_at'),
+    )
+    
     # Relationships
     creator = db.relationship('User', backref='shared_books_created')
     
@@ -534,6 +825,12 @@ class SharedBookData(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
     
+    @db.validates('title', 'author')
+    def _update_title_key(self, key, value):
+        title, author = (value, self.author) if key == 'title' else (self.title, value)
+        self.title_key = normalize_title_key(title, author)
+        return value
+    
     def _generate_custom_id(self, title, author):
         """Generate a custom ID based on title and author"""
         # Create a base from title and author
@@ -547,10 +844,7 @@ class SharedBookData(db.Model):
     @classmethod
     def find_by_title_author(cls, title, author):
         """Find shared book data by title and author (case-insensitive)"""
-        return cls.query.filter(
-            db.func.lower(cls.title) == db.func.lower(title),
-            db.func.lower(cls.author) == db.func.lower(author)
-        ).first()
+        return cls.query.filter_by(title_key=normalize_title_key(title, author)).order_by(cls.id).first()
     
     @classmethod
     def find_by_isbn(cls, isbn):
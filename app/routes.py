@@ -1,7 +1,7 @@
-from flask import Blueprint, current_app, render_template, request, redirect, url_for, jsonify, flash, send_file
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, jsonify, flash, send_file, abort
 from flask_login import login_required, current_user
 from .models import Book, db, ReadingLog, User, SystemSettings, SharedBookData
-from .utils import fetch_book_data, get_reading_streak, get_google_books_cover, generate_month_review_image, ensure_https_url, standardize_categories
+from .utils import fetch_book_data, get_reading_streak, get_google_books_cover, ensure_https_url, standardize_categories
 from datetime import datetime, date, timedelta
 import pytz
 import secrets
@@ -13,6 +13,20 @@ import csv
 import json
 import re
 from .forms import AddBookForm
+from .services.book_service import BookService
+from .services.stats_service import StatsService
+from .services.forecast_service import ForecastService
+from .services.user_service import UserService, LEADERBOARD_WINDOWS
+from .services.activity_service import ActivityService, STARTED, FINISHED, LOGGED, MAX_FEED_PAGE_SIZE
+from .services.community_service import CommunityService
+from .services.public_library_service import PublicLibraryService, PUBLIC_LIBRARY_FILTERS
+from .services.loading import load_profile, lazy_load_guard
+from .services.profile_service import ProfileService
+from .services.cover_service import COVER_PROFILE, cover_store_dir, schedule_mirror
+from .services.image_service import AVATAR_PROFILE, FORMATS, accepted_formats, avatar_store_dir, find_derivative
+from .services.sprite_service import SpriteService
+from .services.wrapup_service import WrapupService, RenderFailed
+from .services.image_jobs import JobTimeout
 
 bp = Blueprint('main', __name__)
 
@@ -95,28 +109,34 @@ def api_docs():
 @login_required
 def index():
     # This now serves as the dashboard/homepage
-    # Get user's books for statistics
-    all_books = Book.query.filter_by(user_id=current_user.id).all()
-    
     # Get recent books (last 10 added)
     recent_books = Book.query.filter_by(user_id=current_user.id).order_by(Book.id.desc()).limit(10).all()
     
     # Get currently reading books
-    currently_reading = [book for book in all_books if not book.finish_date and not book.want_to_read and not book.library_only]
+    currently_reading = Book.query.filter_by(user_id=current_user.id).filter(
+        Book.finish_date.is_(None),
+        Book.want_to_read.isnot(True),
+        Book.library_only.isnot(True)
+    ).all()
     
     # Get recently finished books (last 5)
     recently_finished = Book.query.filter_by(user_id=current_user.id).filter(Book.finish_date.isnot(None)).order_by(Book.finish_date.desc()).limit(5).all()
     
-    # Get reading statistics
-    total_books = len(all_books)
-    finished_books = len([book for book in all_books if book.finish_date])
-    want_to_read = len([book for book in all_books if book.want_to_read])
-    currently_reading_count = len(currently_reading)
-    library_only = len([book for book in all_books if book.library_only])
+    # Get reading statistics from the materialized counters
+    stats = StatsService(db.session).get_user_stats(current_user.id)
+    total_books = stats.total_books
+    finished_books = stats.finished_books
+    want_to_read = stats.want_to_read
+    currently_reading_count = stats.currently_reading
+    library_only = stats.library_only
     
     # Get reading streak
     reading_streak = current_user.get_reading_streak()
     
+    # Progress and finish-date forecasts for currently reading books
+    forecasts = ForecastService(db.session).get_forecasts(current_user.id)['books']
+    book_forecasts = {entry['book_id']: entry for entry in forecasts}
+    
     return render_template('dashboard.html',
                          total_books=total_books,
                          finished_books=finished_books,
@@ -126,6 +146,7 @@ def index():
                          reading_streak=reading_streak,
                          recent_books=recent_books,
                          currently_reading=currently_reading,
+                         book_forecasts=book_forecasts,
                          recently_finished=recently_finished)
 
 @bp.route('/library')
@@ -163,8 +184,8 @@ def library():
     if language:
         query = query.filter(Book.language == language)
     
-    # Get filtered books
-    all_filtered_books = query.all()
+    # Get filtered books (with their cover placeholders)
+    all_filtered_books = query.options(*load_profile('book_list')).all()
     
     # Sort books by reading status priority
     def get_sort_priority(book):
@@ -207,6 +228,9 @@ def library():
     # Fetch all users for assignment functionality
     users = User.query.all()
     
+    # Covers added since the last run are mirrored locally in the background
+    schedule_mirror()
+    
     return render_template('library.html',
                          books=books,
                          categories=categories,
@@ -402,7 +426,8 @@ def add_book():
 @bp.route('/book/<uid>', methods=['GET', 'POST'])
 @login_required
 def view_book(uid):
-    book = Book.query.filter_by(uid=uid, user_id=current_user.id).first_or_404()
+    book = Book.query.filter_by(uid=uid, user_id=current_user.id)\
+        .options(*load_profile('book_detail')).first_or_404()
     
     # Get today's date in configured timezone
     timezone = pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
@@ -452,9 +477,7 @@ def view_book(uid):
         
         elif 'delete_book' in request.form:
             # Delete the book
-            ReadingLog.query.filter_by(book_id=book.id).delete()
-            db.session.delete(book)
-            db.session.commit()
+            BookService(db.session).delete_book(book.uid, current_user.id)
             flash('Book deleted successfully.', 'success')
             return redirect(url_for('main.index'))
         
@@ -526,9 +549,7 @@ def log_reading(uid):
 @login_required
 def delete_book(uid):
     book = Book.query.filter_by(uid=uid, user_id=current_user.id).first_or_404()
-    ReadingLog.query.filter_by(book_id=book.id).delete()
-    db.session.delete(book)
-    db.session.commit()
+    BookService(db.session).delete_book(book.uid, current_user.id)
     flash('Book deleted successfully.')
     return redirect(url_for('main.index'))
 
@@ -635,21 +656,15 @@ def search_books():
 @bp.route('/public-library')
 def public_library():
     filter_status = request.args.get('filter', 'all')
-    books_query = Book.query
+    if filter_status not in PUBLIC_LIBRARY_FILTERS:
+        filter_status = 'all'
     
-    if filter_status == 'currently_reading':
-        books_query = books_query.filter(
-            Book.finish_date.is_(None),
-            Book.want_to_read.isnot(True),  # Handle NULL and False
-            Book.library_only.isnot(True)  # Handle NULL and False
-        )
-    elif filter_status == 'want_to_read':
-        books_query = books_query.filter(Book.want_to_read.is_(True))
-    else:  # Default "Show All" case
-        books_query = books_query.order_by(Book.finish_date.desc().nullslast(), Book.id.desc())
-    
-    books = books_query.all()
-    return render_template('public_library.html', books=books, filter_status=filter_status)
+    try:
+        page = PublicLibraryService(db.session).get_page(filter_status, request.args.get('cursor'))
+    except ValueError:
+        return redirect(url_for('main.public_library', filter=filter_status))
+    return render_template('public_library.html', books=page['books'], filter_status=filter_status,
+                           next_cursor=page['next_cursor'])
 
 @bp.route('/book/<uid>/edit', methods=['GET', 'POST'])
 @login_required
@@ -706,28 +721,93 @@ def edit_book(uid):
         return redirect(url_for('main.view_book', uid=book.uid))
     return render_template('edit_book.html', book=book)
 
+def _send_derivative(store_dir, profile, digest, name):
+    """
+    Serve a stored image derivative. 'variant' gets WebP when the Accept
+    header lists it and JPEG otherwise, 'variant.webp'/'variant.jpg' get that
+    format, and ?w=<pixels> picks the smallest variant at least that wide
+    """
+    found = find_derivative(store_dir, profile, digest, name, request.accept_mimetypes,
+                            request.args.get('w', type=int))
+    if found is None:
+        abort(404)
+    path, mimetype, negotiated = found
+    # Content-addressed, so it never changes
+    response = send_file(path, mimetype=mimetype, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if negotiated:
+        response.vary.add('Accept')
+    return response
+
+@bp.route('/covers/<digest>/<name>')
+def cover_image(digest, name):
+    """Serve a mirrored or uploaded cover variant"""
+    return _send_derivative(cover_store_dir(), COVER_PROFILE, digest, name)
+
+@bp.route('/avatars/<digest>/<name>')
+def avatar_image(digest, name):
+    """Serve an uploaded profile picture variant"""
+    return _send_derivative(avatar_store_dir(), AVATAR_PROFILE, digest, name)
+
+@bp.route('/library/sprites/<int:page>-<int:version>')
+@login_required
+def cover_sprite(page, version):
+    """Serve a page of the user's cover sprite sheets (layout from /api/books/sprites/<page>)"""
+    ext = accepted_formats(request.accept_mimetypes)[0]
+    try:
+        path = SpriteService(db.session).get_image(current_user.id, page, version, ext)
+    except JobTimeout:
+        return "Sprite sheet is still being prepared, please try again shortly", 503, {'Retry-After': '5'}
+    if path is None:
+        # Unknown page, no local covers, or a library version that has since changed
+        abort(404)
+    # Versioned URL, so it never changes
+    response = send_file(path, mimetype=FORMATS[ext][1], max_age=31536000)
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
 @bp.route('/month_review/<int:year>/<int:month>.jpg')
 @login_required  
 def month_review(year, month):
-    # Query books finished in the given month/year by current user
-    books = Book.query.filter(
-        Book.user_id == current_user.id,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= datetime(year, month, 1),
-        Book.finish_date < (
-            datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
-        )
-    ).all()
-    
-    if not books:
+    # Rendered once per set of finished books and covers; repeat views are a file send
+    try:
+        review = WrapupService(db.session).get_month_review(current_user.id, year, month)
+    except JobTimeout:
+        # The render carries on in the image pool and is cached when done
+        return "Your wrap-up is still being prepared, please try again shortly", 503, {'Retry-After': '5'}
+    except RenderFailed:
+        return "Your wrap-up could not be prepared, please try again", 503, {'Retry-After': '5'}
+    if review is None:
         # This should only be accessed if there are books (from month_wrapup)
         return "No books found", 404
 
-    img = generate_month_review_image(books, month, year)
-    buf = BytesIO()
-    img.save(buf, format='JPEG')
-    buf.seek(0)
-    return send_file(buf, mimetype='image/jpeg', as_attachment=True, download_name=f"month_review_{year}_{month}.jpg")
+    image, etag = review
+    response = send_file(image, mimetype='image/jpeg', as_attachment=True,
+                         download_name=f"month_review_{year}_{month}.jpg", etag=etag or False, conditional=True)
+    response.cache_control.private = True
+    return response
+
+@bp.route('/year_review/<int:year>/<int:page>.jpg')
+@login_required
+def year_review(year, page):
+    # Covers are tiled over as many pages as the year needs; each page is cached like a wrap-up
+    try:
+        review = WrapupService(db.session).get_year_review(current_user.id, year, page)
+    except JobTimeout:
+        return "Your year in review is still being prepared, please try again shortly", 503, {'Retry-After': '5'}
+    except RenderFailed:
+        return "Your year in review could not be prepared, please try again", 503, {'Retry-After': '5'}
+    if review is None:
+        return "No books found", 404
+
+    image, etag = review
+    response = send_file(image, mimetype='image/jpeg', as_attachment=True,
+                         download_name=f"year_review_{year}_{page}.jpg", etag=etag or False, conditional=True)
+    response.cache_control.private = True
+    return response
 
 @bp.route('/month_wrapup')
 @login_required
@@ -1041,130 +1121,80 @@ def bulk_import():
 @login_required
 def community_activity():
     """Show activity from users who have enabled activity sharing"""
-    
-    # Get users who share their reading activity
-    sharing_users = User.query.filter_by(share_reading_activity=True, is_active=True).all()
-    
-    # Recent books (books finished in the last 30 days)
-    recent_finished_books = Book.query.join(User).filter(
-        User.share_reading_activity == True,
-        User.is_active == True,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= (datetime.now().date() - timedelta(days=30))
-    ).order_by(Book.finish_date.desc()).limit(20).all()
-    
-    # Recent reading logs (from last 7 days)
-    recent_logs = ReadingLog.query.join(User).filter(
-        User.share_reading_activity == True,
-        User.is_active == True,
-        ReadingLog.date >= (datetime.now().date() - timedelta(days=7))
-    ).order_by(ReadingLog.date.desc()).limit(50).all()
-    
-    # Currently reading books from sharing users
-    currently_reading = Book.query.join(User).filter(
-        User.share_current_reading == True,
-        User.is_active == True,
-        Book.start_date.isnot(None),
-        Book.finish_date.is_(None)
-    ).order_by(Book.start_date.desc()).limit(20).all()
-    
-    # Get some statistics
-    total_books_this_month = Book.query.join(User).filter(
-        User.share_reading_activity == True,
-        User.is_active == True,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= datetime.now().date().replace(day=1)
-    ).count()
-    
-    total_active_readers = len(sharing_users)
+    snapshot = CommunityService(db.session).get_snapshot()
     
     return render_template('community_activity.html',
-                         recent_finished_books=recent_finished_books,
-                         recent_logs=recent_logs,
-                         currently_reading=currently_reading,
-                         total_books_this_month=total_books_this_month,
-                         total_active_readers=total_active_readers,
-                         sharing_users=sharing_users)
+                         total_books_this_month=snapshot['books_this_month'],
+                         currently_reading_count=snapshot['currently_reading'],
+                         recent_activity_count=snapshot['recent_activity_count'],
+                         total_active_readers=snapshot['sharing_readers'])
 
 @bp.route('/community_activity/active_readers')
 @login_required
+@lazy_load_guard
 def community_active_readers():
     """Show list of active readers"""
-    sharing_users = User.query.filter_by(share_reading_activity=True, is_active=True).all()
-    
-    # Get stats for each user
-    user_stats = []
-    for user in sharing_users:
-        books_this_month = Book.query.filter(
-            Book.user_id == user.id,
-            Book.finish_date.isnot(None),
-            Book.finish_date >= datetime.now().date().replace(day=1)
-        ).count()
-        
-        total_books = Book.query.filter(
-            Book.user_id == user.id,
-            Book.finish_date.isnot(None)
-        ).count()
-        
-        currently_reading_count = Book.query.filter(
-            Book.user_id == user.id,
-            Book.start_date.isnot(None),
-            Book.finish_date.is_(None)
-        ).count()
-        
-        user_stats.append({
-            'user': user,
-            'books_this_month': books_this_month,
-            'total_books': total_books,
-            'currently_reading': currently_reading_count
-        })
+    window = request.args.get('window', 'month')
+    if window not in LEADERBOARD_WINDOWS:
+        window = 'month'
+    page = request.args.get('page', 1, type=int)
     
-    # Sort by activity (books this month + currently reading)
-    user_stats.sort(key=lambda x: x['books_this_month'] + x['currently_reading'], reverse=True)
+    leaderboard = UserService(db.session).get_leaderboard(window, page)
     
-    return render_template('community_stats/active_readers.html', user_stats=user_stats)
+    return render_template('community_stats/active_readers.html',
+                         user_stats=leaderboard['entries'],
+                         leaderboard=leaderboard)
 
 @bp.route('/community_activity/books_this_month')
 @login_required
+@lazy_load_guard
 def community_books_this_month():
     """Show books finished this month"""
-    books = Book.query.join(User).filter(
-        User.share_reading_activity == True,
-        User.is_active == True,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= datetime.now().date().replace(day=1)
-    ).order_by(Book.finish_date.desc()).all()
+    page = ActivityService(db.session).get_feed(
+        [FINISHED],
+        before=request.args.get('before', type=int),
+        limit=MAX_FEED_PAGE_SIZE,
+        since=datetime.now().date().replace(day=1)
+    )
+    books = [event.book for event in page['events']]
     
     month_name = calendar.month_name[datetime.now().month]
     return render_template('community_stats/books_this_month.html', 
                          books=books, 
                          month_name=month_name,
-                         year=datetime.now().year)
+                         year=datetime.now().year,
+                         next_cursor=page['next_cursor'])
 
 @bp.route('/community_activity/currently_reading')
 @login_required
+@lazy_load_guard
 def community_currently_reading():
     """Show books currently being read"""
-    books = Book.query.join(User).filter(
-        User.share_current_reading == True,
-        User.is_active == True,
-        Book.start_date.isnot(None),
-        Book.finish_date.is_(None)
-    ).order_by(Book.start_date.desc()).all()
+    page = ActivityService(db.session).get_feed(
+        [STARTED],
+        before=request.args.get('before', type=int),
+        limit=MAX_FEED_PAGE_SIZE,
+        still_reading=True
+    )
+    books = [event.book for event in page['events']]
     
-    return render_template('community_stats/currently_reading.html', books=books)
+    return render_template('community_stats/currently_reading.html', books=books,
+                         next_cursor=page['next_cursor'])
 
 @bp.route('/community_activity/recent_activity')
 @login_required
+@lazy_load_guard
 def community_recent_activity():
     """Show recent reading activity"""
-    recent_logs = ReadingLog.query.join(User).filter(
-        User.share_reading_activity == True,
-        User.is_active == True,
-        ReadingLog.date >= (datetime.now().date() - timedelta(days=7))
-    ).order_by(ReadingLog.date.desc()).limit(50).all()
+    page = ActivityService(db.session).get_feed(
+        [LOGGED],
+        before=request.args.get('before', type=int),
+        limit=50,
+        since=datetime.now().date() - timedelta(days=7)
+    )
     
-    return render_template('community_stats/recent_activity.html', recent_logs=recent_logs)
+    return render_template('community_stats/recent_activity.html', recent_logs=page['events'],
+                         next_cursor=page['next_cursor'])
 
 @bp.route('/user/<int:user_id>/profile')
 @login_required
@@ -1177,23 +1207,10 @@ def user_profile(user_id):
         flash('This user has not enabled profile sharing.', 'warning')
         return redirect(url_for('main.community_activity'))
     
-    # Get user's reading statistics
-    total_books = Book.query.filter(
-        Book.user_id == user.id,
-        Book.finish_date.isnot(None)
-    ).count()
-    
-    books_this_year = Book.query.filter(
-        Book.user_id == user.id,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= date(datetime.now().year, 1, 1)
-    ).count()
-    
-    books_this_month = Book.query.filter(
-        Book.user_id == user.id,
-        Book.finish_date.isnot(None),
-        Book.finish_date >= datetime.now().date().replace(day=1)
-    ).count()
+    # Counts come from the cached profile summary
+    summary = ProfileService(db.session).get_summary(user.id)
+    if summary is None:
+        abort(404)
     
     currently_reading = Book.query.filter(
         Book.user_id == user.id,
@@ -1206,16 +1223,14 @@ def user_profile(user_id):
         Book.finish_date.isnot(None)
     ).order_by(Book.finish_date.desc()).limit(10).all()
     
-    reading_logs_count = ReadingLog.query.filter_by(user_id=user.id).count()
-    
     return render_template('user_profile.html',
                          profile_user=user,
-                         total_books=total_books,
-                         books_this_year=books_this_year,
-                         books_this_month=books_this_month,
+                         total_books=summary['finished_books'],
+                         books_this_year=summary['books_this_year'],
+                         books_this_month=summary['books_this_month'],
                          currently_reading=currently_reading,
                          recent_finished=recent_finished,
-                         reading_logs_count=reading_logs_count)
+                         reading_logs_count=summary['reading_logs_count'])
 
 @bp.route('/api/categories', methods=['GET'])
 @login_required
@@ -1309,8 +1324,8 @@ def library_mass_edit():
     if language:
         query = query.filter(Book.language == language)
     
-    # Get filtered books
-    all_filtered_books = query.all()
+    # Get filtered books (with their cover placeholders)
+    all_filtered_books = query.options(*load_profile('book_list')).all()
     
     # Sort books by reading status priority
     def get_sort_priority(book):
@@ -0,0 +1,359 @@
+"""
+ActivityService - Fan-out-on-write community activity feed
+Events are appended to activity_event from flush events when a sharing user
+starts, finishes, logs or rates a book, and read back with a keyset cursor
+"""
+
+from typing import Optional, Dict, Any, Iterable
+from datetime import date, datetime, timezone
+
+from sqlalchemy import event, select, and_, or_, func, inspect as sa_inspect
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from ..models import ActivityEvent, Book, ReadingLog, User, UserRating, db
+from .cache import bump_version
+from .stats_service import previous_value, _load_previous_value
+
+
+STARTED = 'started'
+FINISHED = 'finished'
+LOGGED = 'logged'
+RATED = 'rated'
+
+# The privacy flag that must be on when an event of each type is written
+SHARE_FLAGS = {
+    STARTED: 'share_current_reading',
+    FINISHED: 'share_reading_activity',
+    LOGGED: 'share_reading_activity',
+    RATED: 'share_reading_activity',
+}
+
+MAX_FEED_PAGE_SIZE = 100
+
+# Instance-wide cache version bumped when events are withdrawn or who appears in the feed changes
+COMMUNITY_VERSION = 'community'
+
+TRACKED_ATTRIBUTES = (
+    Book.user_id, Book.start_date, Book.finish_date, Book.want_to_read, Book.library_only, UserRating.rating,
+    ReadingLog.book_id, ReadingLog.date, ReadingLog.pages_read,
+    User.share_current_reading, User.share_reading_activity, User.is_active
+)
+
+_PENDING_KEY = 'activity_events_pending'
+
+
+def _is_currently_reading(book: Book, value=getattr) -> bool:
+    """Whether a book counts as being read; pass value=previous_value to ask about before the flush"""
+    return bool(value(book, 'start_date')) and not value(book, 'finish_date') \
+        and not value(book, 'want_to_read') and not value(book, 'library_only')
+
+
+def _still_reading():
+    """SQL filter matching _is_currently_reading for a joined Book"""
+    return and_(Book.start_date.isnot(None), Book.finish_date.is_(None),
+                Book.want_to_read.isnot(True), Book.library_only.isnot(True))
+
+
+def _collect_events(session, flush_context, instances):
+    """before_flush: note new events, keep edited ones current and remove events whose source is going away"""
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    table = ActivityEvent.__table__
+    connection = session.connection()
+    removals = []
+    # Events about to be written again; the snapshot picks the new one up like any new event
+    replaced = []
+    changed = False
+
+    for obj in session.new:
+        if isinstance(obj, Book):
+            if obj.finish_date:
+                pending.append((FINISHED, obj))
+            elif _is_currently_reading(obj):
+                pending.append((STARTED, obj))
+        elif isinstance(obj, ReadingLog):
+            pending.append((LOGGED, obj))
+        elif isinstance(obj, UserRating):
+            pending.append((RATED, obj))
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Book):
+            # Events carry the owner, so a book moved to another user gets new ones
+            moved = obj.user_id != previous_value(obj, 'user_id')
+            # A moved or cleared date replaces the event written for the old one
+            if moved or obj.finish_date != previous_value(obj, 'finish_date'):
+                removals.append(and_(table.c.book_id == obj.id, table.c.event_type == FINISHED))
+                if obj.finish_date:
+                    pending.append((FINISHED, obj))
+            # The started event only exists while the book is being read
+            if moved or obj.start_date != previous_value(obj, 'start_date') \
+                    or _is_currently_reading(obj) != _is_currently_reading(obj, previous_value):
+                removals.append(and_(table.c.book_id == obj.id, table.c.event_type == STARTED))
+                if _is_currently_reading(obj):
+                    pending.append((STARTED, obj))
+        elif isinstance(obj, ReadingLog):
+            # An edited log keeps its place in the feed with the new numbers
+            connection.execute(
+                table.update().where(
+                    table.c.event_type == LOGGED,
+                    table.c.user_id == previous_value(obj, 'user_id'),
+                    table.c.book_id == previous_value(obj, 'book_id'),
+                    table.c.event_date == previous_value(obj, 'date')
+                ).values(book_id=obj.book_id, event_date=obj.date, pages_read=obj.pages_read)
+            )
+        elif isinstance(obj, UserRating):
+            if obj.rating != previous_value(obj, 'rating'):
+                # A re-rating replaces the event for the old rating
+                replaced.append(and_(
+                    table.c.event_type == RATED,
+                    table.c.user_id == obj.user_id,
+                    table.c.book_id == obj.book_id
+                ))
+                pending.append((RATED, obj))
+        elif isinstance(obj, User):
+            # Opting out also withdraws what was already shared
+            revoked = [event_type for event_type, flag in SHARE_FLAGS.items()
+                       if previous_value(obj, flag) and not getattr(obj, flag)]
+            if revoked:
+                removals.append(and_(table.c.user_id == obj.id, table.c.event_type.in_(revoked)))
+            elif any(getattr(obj, attr) != previous_value(obj, attr)
+                     for attr in ('is_active', 'share_current_reading', 'share_reading_activity')):
+                changed = True
+
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            removals.append(table.c.book_id == obj.id)
+        elif isinstance(obj, ReadingLog):
+            removals.append(and_(
+                table.c.event_type == LOGGED,
+                table.c.user_id == previous_value(obj, 'user_id'),
+                table.c.book_id == previous_value(obj, 'book_id'),
+                table.c.event_date == previous_value(obj, 'date')
+            ))
+        elif isinstance(obj, UserRating):
+            removals.append(and_(
+                table.c.event_type == RATED,
+                table.c.user_id == obj.user_id,
+                table.c.book_id == obj.book_id
+            ))
+        elif isinstance(obj, User):
+            removals.append(table.c.user_id == obj.id)
+
+    if removals or replaced:
+        connection.execute(table.delete().where(or_(*removals, *replaced)))
+    if removals or changed:
+        bump_version(connection, COMMUNITY_VERSION)
+
+
+def _event_row(event_type: str, obj, now: datetime) -> Dict[str, Any]:
+    row = {'event_type': event_type, 'user_id': obj.user_id, 'created_at': now,
+           'pages_read': None, 'rating': None}
+    if event_type == STARTED:
+        row.update(book_id=obj.id, event_date=obj.start_date)
+    elif event_type == FINISHED:
+        row.update(book_id=obj.id, event_date=obj.finish_date)
+    elif event_type == LOGGED:
+        row.update(book_id=obj.book_id, event_date=obj.date, pages_read=obj.pages_read)
+    else:
+        row.update(book_id=obj.book_id, event_date=now.date(), rating=obj.rating)
+    return row
+
+
+def _write_events(session, flush_context):
+    """after_flush: append events for users whose sharing flags allow them"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    connection = session.connection()
+    user = User.__table__
+    user_ids = {obj.user_id for _, obj in pending if obj.user_id is not None}
+    if not user_ids:
+        return
+    sharing = {
+        row.id: row for row in connection.execute(
+            select(user.c.id, user.c.is_active, user.c.share_current_reading, user.c.share_reading_activity)
+            .where(user.c.id.in_(user_ids))
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for event_type, obj in pending:
+        flags = sharing.get(obj.user_id)
+        if flags is None or not flags.is_active or not getattr(flags, SHARE_FLAGS[event_type]):
+            continue
+        if sa_inspect(obj).was_deleted:
+            continue
+        rows.append(_event_row(event_type, obj, now))
+
+    if rows:
+        # New events reach the community snapshot on its next rebuild
+        connection.execute(ActivityEvent.__table__.insert(), rows)
+
+
+def _discard_events(session, previous_transaction):
+    """Drop events collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """Hook activity feed writes into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_events):
+        return
+    for attribute in TRACKED_ATTRIBUTES:
+        if not event.contains(attribute, 'set', _load_previous_value):
+            event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_events)
+    event.listen(Session, 'after_flush', _write_events)
+    event.listen(Session, 'after_soft_rollback', _discard_events)
+
+
+def backfill_activity_events(connection) -> int:
+    """
+    Seed the feed from existing books, logs and ratings of users who share
+
+    Returns:
+        Number of events written
+    """
+    book, log, rating, user = (Book.__table__, ReadingLog.__table__,
+                               UserRating.__table__, User.__table__)
+    active = user.c.is_active == True
+    shares_activity = and_(active, user.c.share_reading_activity == True)
+    rows = []
+
+    for row in connection.execute(
+        select(book.c.id, book.c.user_id, book.c.start_date, book.c.finish_date, book.c.created_at)
+        .select_from(book.join(user, user.c.id == book.c.user_id))
+        .where(book.c.finish_date.isnot(None), shares_activity)
+    ):
+        rows.append({'event_type': FINISHED, 'user_id': row.user_id, 'book_id': row.id,
+                     'event_date': row.finish_date, 'created_at': row.created_at})
+
+    for row in connection.execute(
+        select(book.c.id, book.c.user_id, book.c.start_date, book.c.created_at)
+        .select_from(book.join(user, user.c.id == book.c.user_id))
+        .where(book.c.start_date.isnot(None), book.c.finish_date.is_(None),
+               book.c.want_to_read.isnot(True), book.c.library_only.isnot(True),
+               active, user.c.share_current_reading == True)
+    ):
+        rows.append({'event_type': STARTED, 'user_id': row.user_id, 'book_id': row.id,
+                     'event_date': row.start_date, 'created_at': row.created_at})
+
+    for row in connection.execute(
+        select(log.c.user_id, log.c.book_id, log.c.date, log.c.pages_read, log.c.created_at)
+        .select_from(log.join(user, user.c.id == log.c.user_id))
+        .where(shares_activity)
+    ):
+        rows.append({'event_type': LOGGED, 'user_id': row.user_id, 'book_id': row.book_id,
+                     'event_date': row.date, 'pages_read': row.pages_read, 'created_at': row.created_at})
+
+    for row in connection.execute(
+        select(rating.c.user_id, rating.c.book_id, rating.c.rating, rating.c.created_at)
+        .select_from(rating.join(user, user.c.id == rating.c.user_id))
+        .where(shares_activity)
+    ):
+        rows.append({'event_type': RATED, 'user_id': row.user_id, 'book_id': row.book_id,
+                     'event_date': row.created_at.date() if row.created_at else None,
+                     'rating': row.rating, 'created_at': row.created_at})
+
+    # Insert oldest first so the keyset order matches chronology
+    rows.sort(key=lambda row: (row['event_date'] or date.min, row['created_at'] or datetime.min))
+    for row in rows:
+        row.setdefault('pages_read', None)
+        row.setdefault('rating', None)
+    if rows:
+        connection.execute(ActivityEvent.__table__.insert(), rows)
+    return len(rows)
+
+
+def feed_books(events) -> list:
+    """Book dictionaries with a user summary for STARTED or FINISHED events"""
+    books = []
+    for event in events:
+        book = event.book.to_dict()
+        book['user'] = {'id': event.user.id, 'username': event.user.username}
+        books.append(book)
+    return books
+
+
+class ActivityService:
+    """Service class for the community activity feed"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_feed(self, event_types: Optional[Iterable[str]] = None, before: Optional[int] = None,
+                 limit: int = 20, since: Optional[date] = None,
+                 still_reading: bool = False) -> Dict[str, Any]:
+        """
+        Read one page of the feed, newest first
+
+        Args:
+            event_types: Restrict to these event types
+            before: Keyset cursor - only events with a lower id
+            limit: Page size
+            since: Only events dated on or after this day
+            still_reading: Only events whose book is still being read
+
+        Returns:
+            Dictionary with 'events' (ActivityEvent objects) and 'next_cursor'
+        """
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+
+        query = ActivityEvent.query.join(ActivityEvent.user)\
+            .filter(User.is_active == True)\
+            .options(contains_eager(ActivityEvent.user))
+        if still_reading:
+            query = query.join(ActivityEvent.book)\
+                .filter(_still_reading())\
+                .options(contains_eager(ActivityEvent.book))
+        else:
+            query = query.options(joinedload(ActivityEvent.book))
+        if event_types:
+            query = query.filter(ActivityEvent.event_type.in_(list(event_types)))
+        if since:
+            query = query.filter(ActivityEvent.event_date >= since)
+        if before:
+            query = query.filter(ActivityEvent.id < before)
+
+        events = query.order_by(ActivityEvent.id.desc()).limit(limit + 1).all()
+        next_cursor = events[limit - 1].id if len(events) > limit else None
+        return {'events': events[:limit], 'next_cursor': next_cursor}
+
+    def count_events(self, event_type: str, since: Optional[date] = None,
+                     still_reading: bool = False, distinct_users: bool = False) -> int:
+        """
+        Count events of one type, optionally dated on or after a day
+        
+        Args:
+            event_type: Event type to count
+            since: Only events dated on or after this day
+            still_reading: Only events whose book is still being read
+            distinct_users: Count users with such events instead of events
+        """
+        counted = func.count(ActivityEvent.user_id.distinct()) if distinct_users else func.count(ActivityEvent.id)
+        query = self.db.query(counted).join(ActivityEvent.user).filter(
+            User.is_active == True,
+            ActivityEvent.event_type == event_type
+        )
+        if since:
+            query = query.filter(ActivityEvent.event_date >= since)
+        if still_reading:
+            query = query.join(ActivityEvent.book).filter(_still_reading())
+        return query.scalar()
+
+    def rebuild(self) -> int:
+        """
+        Rebuild the feed from current library data and sharing settings
+
+        Returns:
+            Number of events written
+        """
+        connection = self.db.connection()
+        connection.execute(ActivityEvent.__table__.delete())
+        written = backfill_activity_events(connection)
+        bump_version(connection, COMMUNITY_VERSION)
+        self.db.commit()
+        return written
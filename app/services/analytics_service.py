@@ -0,0 +1,182 @@
+"""
+AnalyticsService - Per-user reading analytics
+Aggregates come from range reads on the daily rollup and the user's finished
+books; series are reduced with NumPy and results cached per library version
+"""
+
+from typing import Dict, Any, List, Optional
+from collections import Counter
+from datetime import date
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models import Book, ReadingDay
+from ..utils import standardize_categories
+from .cache import VersionedCache
+from .stats_service import StatsService
+from .streak_service import configured_today
+
+
+ROLLING_WINDOW_DAYS = 30
+TOP_BREAKDOWN = 10
+
+_analytics_cache = VersionedCache(max_entries=512)
+
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+def page_series(days: np.ndarray, pages: np.ndarray, year: int, today: date) -> Dict[str, Any]:
+    """
+    Weekly/monthly totals, rolling pace and trend for one year of daily pages
+
+    Args:
+        days: datetime64[D] array of reading days, ascending
+        pages: Pages read on each day
+        year: Calendar year the series covers
+        today: Last day that counts towards pace for the current year
+    """
+    # 1970-01-01 was a Thursday, so this shifts every day back to its Monday
+    week_starts = days - (days.astype(np.int64) + 3) % 7
+    weeks, week_index = np.unique(week_starts, return_inverse=True)
+    week_pages = np.bincount(week_index, weights=pages, minlength=len(weeks))
+
+    months, month_index = np.unique(days.astype('datetime64[M]'), return_inverse=True)
+    month_pages = np.bincount(month_index, weights=pages, minlength=len(months))
+
+    # Dense daily series from 1 January up to today (or year end)
+    start = np.datetime64(date(year, 1, 1), 'D')
+    end = min(np.datetime64(date(year + 1, 1, 1), 'D'), np.datetime64(today, 'D') + np.timedelta64(1, 'D'))
+    span = max(int((end - start).astype(np.int64)), 0)
+    dense = np.zeros(span)
+    in_span = days < end
+    dense[(days[in_span] - start).astype(np.int64)] = pages[in_span]
+
+    cumulative = np.concatenate(([0.0], np.cumsum(dense)))
+    window_end = np.arange(1, span + 1)
+    window_start = np.maximum(window_end - ROLLING_WINDOW_DAYS, 0)
+    rolling = (cumulative[window_end] - cumulative[window_start]) / (window_end - window_start)
+    # Sample the rolling pace once a week, ending on the most recent day
+    samples = np.arange(span - 1, -1, -7)[::-1]
+
+    trend = None
+    if len(weeks) >= 2:
+        week_numbers = ((weeks - weeks[0]).astype(np.int64) // 7).astype(float)
+        trend = np.polyfit(week_numbers, week_pages, 1)[0]
+
+    return {
+        'total': int(pages.sum()),
+        'reading_days': int(len(days)),
+        'average_per_day': _round(dense.mean()) if span else None,
+        'average_per_reading_day': _round(pages.mean()) if len(pages) else None,
+        'by_week': [{'week_start': str(week), 'pages': int(total)} for week, total in zip(weeks, week_pages)],
+        'by_month': [{'month': str(month), 'pages': int(total)} for month, total in zip(months, month_pages)],
+        'rolling_pace': [
+            {'date': str(start + np.timedelta64(int(index), 'D')), 'pages_per_day': _round(rolling[index])} for index in samples
+        ],
+        'weekly_trend': _round(trend)
+    }
+
+
+def finish_summary(rows) -> Dict[str, Any]:
+    """Days-to-finish and gaps between finishes for (start, finish, previous_finish) rows"""
+    started = [(start, finish) for start, finish, _ in rows if start and finish >= start]
+    gaps = [(finish - previous).days for _, finish, previous in rows if previous]
+
+    durations = np.array([(finish - start).days for start, finish in started], dtype=float)
+    gaps = np.array(gaps, dtype=float)
+    return {
+        'books_with_dates': int(len(durations)),
+        'average_days': _round(durations.mean()) if len(durations) else None,
+        'median_days': _round(np.median(durations)) if len(durations) else None,
+        'average_days_between_finishes': _round(gaps.mean()) if len(gaps) else None
+    }
+
+
+def breakdown(counter: Counter, label: str) -> List[Dict[str, Any]]:
+    return [{label: name, 'count': count} for name, count in counter.most_common(TOP_BREAKDOWN)]
+
+
+class AnalyticsService:
+    """Service class for reading analytics"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_analytics(self, user_id: int, year: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Get reading analytics for one calendar year
+
+        Results are cached until the user's library version changes (or the
+        day rolls over, since pace is measured up to today).
+
+        Args:
+            user_id: User ID
+            year: Calendar year (defaults to the current year)
+
+        Returns:
+            Dictionary of page series, pace, books per year and breakdowns
+        """
+        today = configured_today()
+        year = year or today.year
+        stats = StatsService(self.db).get_user_stats(user_id)
+
+        key = (user_id, year, today)
+        cached = _analytics_cache.get(key, stats.library_version)
+        if cached is not None:
+            return cached
+
+        analytics = self._compute(user_id, year, today, stats)
+        _analytics_cache.set(key, stats.library_version, analytics)
+        return analytics
+
+    def _compute(self, user_id: int, year: int, today: date, stats) -> Dict[str, Any]:
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+
+        day_rows = self.db.query(ReadingDay.date, ReadingDay.pages).filter(
+            ReadingDay.user_id == user_id,
+            ReadingDay.date >= start,
+            ReadingDay.date < end
+        ).order_by(ReadingDay.date).all()
+        days = np.array([row[0] for row in day_rows], dtype='datetime64[D]')
+        pages = np.array([row[1] for row in day_rows], dtype=np.int64)
+
+        # Finished books in the year, with the previous finish via a window function
+        book = Book.__table__
+        previous_finish = func.lag(book.c.finish_date, type_=book.c.finish_date.type)\
+            .over(order_by=(book.c.finish_date, book.c.id))
+        finished = self.db.execute(
+            select(
+                book.c.author, book.c.categories, book.c.start_date, book.c.finish_date, previous_finish
+            ).where(
+                book.c.user_id == user_id,
+                book.c.finish_date >= start,
+                book.c.finish_date < end
+            )
+        ).all()
+
+        authors = Counter(row[0] for row in finished if row[0])
+        genres = Counter()
+        for row in finished:
+            cleaned = standardize_categories(row[1])
+            if cleaned:
+                genres.update(category.strip() for category in cleaned.split(','))
+
+        books_per_year = {
+            period: count for period, count in sorted((stats.finished_by_period or {}).items())
+            if len(period) == 4
+        }
+
+        return {
+            'year': year,
+            'library_version': stats.library_version,
+            'pages': page_series(days, pages, year, today),
+            'books_finished': len(finished),
+            'books_per_year': books_per_year,
+            'finish_time': finish_summary([(row[2], row[3], row[4]) for row in finished]),
+            'authors': breakdown(authors, 'author'),
+            'genres': breakdown(genres, 'genre')
+        }
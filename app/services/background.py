@@ -0,0 +1,93 @@
+"""
+Periodic background jobs
+Jobs are started from request handlers in a daemon thread with their own app
+context, at most once per interval in each process. A job only runs while its
+process holds the job's lease in the database, so when several worker
+processes start the same job at once one of them does the work and the
+others skip it. Completed runs are recorded in job_run
+"""
+
+from typing import Callable, Optional, Dict, Any
+from datetime import datetime, timezone
+from threading import Lock, Thread
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from ..models import db, JobRun
+from .cache import acquire_lease, release_lease
+
+
+# Longest a job may run before another process may start it again
+JOB_LEASE_SECONDS = 3600
+
+_lock = Lock()
+_next_run = {}
+
+
+def schedule(name: str, interval: int, job: Callable) -> bool:
+    """
+    Run job(db.session) in the background unless it ran in this process within
+    the last interval seconds or another process is running it. Disabled when
+    interval is 0 and under testing
+
+    Returns:
+        True if the job was started
+    """
+    if interval <= 0 or current_app.testing:
+        return False
+    now = time.monotonic()
+    with _lock:
+        if now < _next_run.get(name, 0.0):
+            return False
+        _next_run[name] = now + interval
+    app = current_app._get_current_object()
+    Thread(target=_run, args=(app, name, job), daemon=True, name=f'background-{name}').start()
+    return True
+
+
+def _run(app, name: str, job: Callable) -> None:
+    with app.app_context():
+        try:
+            run_leased(db.session, name, job)
+        except Exception as e:
+            app.logger.error(f"Background job '{name}' failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def run_leased(session, name: str, job: Callable) -> bool:
+    """
+    Run job(session) while holding the job's lease
+
+    Returns:
+        True if the job ran, False if another process holds the lease
+    """
+    lease = f'job:{name}'
+    if not acquire_lease(session, lease, JOB_LEASE_SECONDS):
+        return False
+    try:
+        job(session)
+    finally:
+        session.rollback()
+        release_lease(session, lease)
+    return True
+
+
+def last_run(session, name: str) -> Optional[datetime]:
+    """When a job last recorded a completed run (UTC), or None"""
+    completed_at = session.execute(select(JobRun.completed_at).where(JobRun.name == name)).scalar()
+    if completed_at is not None and completed_at.tzinfo is None:
+        # SQLite hands back naive datetimes for values stored as UTC
+        completed_at = completed_at.replace(tzinfo=timezone.utc)
+    return completed_at
+
+
+def record_run(connection, name: str, at: datetime, summary: Dict[str, Any]) -> None:
+    """Store a job's completion time and summary in its job_run row"""
+    table = JobRun.__table__
+    values = {'summary': summary, 'completed_at': at}
+    result = connection.execute(table.update().where(table.c.name == name).values(**values))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=name, **values))
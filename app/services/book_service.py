@@ -9,7 +9,8 @@ import secrets
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 
-from ..models import Book, User, SharedBookData, ReadingLog, db
+from ..models import Book, User, SharedBookData, ReadingLog, UserRating, db
+from .loading import load_profile
 from ..utils import fetch_book_data, get_google_books_cover, ensure_https_url, standardize_categories
 
 
@@ -156,7 +157,7 @@ class BookService:
                                        Book.author.ilike(search_term),
                                        Book.isbn.ilike(search_term)))
         
-        return query.order_by(Book.created_at.desc()).all()
+        return query.options(*load_profile('book_list')).order_by(Book.created_at.desc()).all()
     
     def get_book_by_uid(self, uid: str, user_id: int) -> Optional[Book]:
         """
@@ -233,6 +234,13 @@ class BookService:
         if not book:
             return False
         
+        # Delete dependent rows through the session (not bulk deletes) so
+        # flush-time bookkeeping such as user statistics sees them
+        for reading_log in ReadingLog.query.filter_by(book_id=book.id).all():
+            self.db.delete(reading_log)
+        for rating in UserRating.query.filter_by(book_id=book.id).all():
+            self.db.delete(rating)
+        
         self.db.delete(book)
         self.db.commit()
         return True
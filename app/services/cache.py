@@ -0,0 +1,107 @@
+"""
+Caches for derived read models
+Entries are stored with the version of the data they were computed from and
+are treated as missing once that version moves on. Per-user versions live on
+user_stats; instance-wide versions are named counters in cache_version, shared
+by every worker process. Leases let one of those processes at a time rebuild
+something expensive while the others keep serving what it replaces
+"""
+
+from typing import Any, Hashable, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from ..models import CacheVersion, Lease
+
+
+class VersionedCache:
+    """Thread-safe LRU cache whose entries are valid for a single data version"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, version: Any, max_age: Optional[float] = None) -> Optional[Any]:
+        """Return the cached value for key if it was stored at this version (and within max_age seconds)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version or (max_age is not None and monotonic() - entry[2] > max_age):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, version: Any, value: Any) -> None:
+        """Store a value computed from the given data version"""
+        with self._lock:
+            self._entries[key] = (version, value, monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def get_version(connection, name: str) -> int:
+    """Current value of a named instance-wide version counter"""
+    table = CacheVersion.__table__
+    version = connection.execute(select(table.c.version).where(table.c.name == name)).scalar()
+    return version or 0
+
+
+def bump_version(connection, name: str) -> None:
+    """Invalidate everything cached against a named version counter"""
+    table = CacheVersion.__table__
+    result = connection.execute(
+        table.update().where(table.c.name == name).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=name, version=1))
+
+
+def acquire_lease(session, name: str, seconds: float) -> bool:
+    """
+    Take a named lease for up to seconds unless another process holds it.
+    Commits, so the lease is visible to every worker at once
+
+    Returns:
+        True if the lease was taken
+    """
+    table = Lease.__table__
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=seconds)
+    result = session.execute(
+        table.update().where(table.c.name == name, table.c.expires_at <= now).values(expires_at=expires_at)
+    )
+    if result.rowcount == 0:
+        if session.execute(select(table.c.name).where(table.c.name == name)).first() is not None:
+            # Held by someone else until it expires
+            session.rollback()
+            return False
+        try:
+            session.execute(table.insert().values(name=name, expires_at=expires_at))
+            session.commit()
+        except IntegrityError:
+            # Another process created the lease between the update and the insert
+            session.rollback()
+            return False
+    else:
+        session.commit()
+    return True
+
+
+def release_lease(session, name: str) -> None:
+    """Give up a lease before it expires, committing"""
+    table = Lease.__table__
+    session.execute(table.update().where(table.c.name == name).values(expires_at=datetime.now(timezone.utc)))
+    session.commit()
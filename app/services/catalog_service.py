@@ -0,0 +1,109 @@
+"""
+CatalogService - The shared book catalog
+Links per-user Book copies to SharedBookData records so that catalog-wide data
+(rating aggregates, recommendations) can be keyed by one row per title
+"""
+
+from typing import Dict, Any, List
+
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import Session
+
+from ..models import Book, SharedBookData, normalize_title_key
+from .rating_service import backfill_shared_rating_stats
+
+
+LINK_BATCH_SIZE = 500
+
+SHARED_METADATA = ('cover_url', 'description', 'published_date', 'page_count', 'categories',
+                   'publisher', 'language')
+
+
+class CatalogService:
+    """Service class for the shared book catalog"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def link_books(self, batch_size: int = LINK_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Link every Book without a shared record to one, creating records as needed,
+        then roll existing ratings up to the shared records
+
+        Books are matched by ISBN, or by case-insensitive title and author when
+        they have no ISBN (the same rules used when adding a book). Each batch
+        is committed on its own.
+
+        Returns:
+            Dictionary with 'linked', 'created' and 'rated' counts
+        """
+        book = Book.__table__
+        linked = created = 0
+        last_id = 0
+        while True:
+            rows = self.db.execute(
+                select(book.c.id, book.c.user_id, book.c.title, book.c.author, book.c.isbn,
+                       *[book.c[column] for column in SHARED_METADATA])
+                .where(book.c.shared_book_id.is_(None), book.c.id > last_id)
+                .order_by(book.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            links, new_records = self._link_batch(rows)
+            if links:
+                self.db.execute(
+                    book.update().where(book.c.id == bindparam('target_id'))
+                    .values(shared_book_id=bindparam('new_shared_book_id')),
+                    links
+                )
+            self.db.commit()
+            linked += len(links)
+            created += new_records
+
+        rated = backfill_shared_rating_stats(self.db.connection())
+        self.db.commit()
+        return {'linked': linked, 'created': created, 'rated': rated}
+
+    def _link_batch(self, rows) -> tuple:
+        """Shared record for each book in a batch: one lookup for ISBNs, one for titles"""
+        shared = SharedBookData.__table__
+        by_isbn = {row.isbn for row in rows if row.isbn}
+        by_title = {normalize_title_key(row.title, row.author) for row in rows if not row.isbn}
+
+        found_isbn, found_title = {}, {}
+        if by_isbn:
+            for shared_id, isbn in self.db.execute(
+                select(shared.c.id, shared.c.isbn).where(shared.c.isbn.in_(by_isbn)).order_by(shared.c.id)
+            ):
+                found_isbn.setdefault(isbn, shared_id)
+        if by_title:
+            for shared_id, title_key in self.db.execute(
+                select(shared.c.id, shared.c.title_key).where(shared.c.title_key.in_(by_title)).order_by(shared.c.id)
+            ):
+                found_title.setdefault(title_key, shared_id)
+
+        links: List[Dict[str, Any]] = []
+        pending = {}
+        for row in rows:
+            if row.isbn:
+                lookup, key = found_isbn, row.isbn
+            else:
+                lookup, key = found_title, normalize_title_key(row.title, row.author)
+            if key not in lookup and key not in pending:
+                # The first copy seen provides the record's metadata
+                pending[key] = SharedBookData(
+                    title=row.title, author=row.author, isbn=row.isbn, created_by=row.user_id,
+                    **{column: row._mapping[column] for column in SHARED_METADATA}
+                )
+                self.db.add(pending[key])
+            links.append((row.id, lookup, key))
+
+        if pending:
+            self.db.flush()
+        return [
+            {'target_id': book_id,
+             'new_shared_book_id': lookup[key] if key in lookup else pending[key].id}
+            for book_id, lookup, key in links
+        ], len(pending)
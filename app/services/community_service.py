@@ -0,0 +1,148 @@
+"""
+CommunityService - Shared community snapshot
+Community aggregates and the first page of each feed are computed once and
+stored in community_snapshot, where every worker process reads them. A
+snapshot is served while it is younger than COMMUNITY_SNAPSHOT_TTL seconds
+and matches the community cache version, which the activity feed bumps only
+when shared events are withdrawn; new events wait for the next rebuild. Only
+the request holding the rebuild lease recomputes a stale snapshot, everyone
+else keeps serving the previous one meanwhile
+"""
+
+from typing import Dict, Any
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import CommunitySnapshot, CacheVersion, User
+from .activity_service import (
+    ActivityService, feed_books, COMMUNITY_VERSION, STARTED, FINISHED, LOGGED
+)
+from .cache import get_version, acquire_lease, release_lease
+from .streak_service import configured_today
+
+
+SNAPSHOT_NAME = 'community'
+# Feed pages of this size are served from the snapshot
+SNAPSHOT_PAGE_SIZE = 20
+DEFAULT_SNAPSHOT_TTL = 300
+# Longest a rebuild may take before another process may start one
+REBUILD_LEASE = 'community_snapshot'
+REBUILD_LEASE_SECONDS = 60
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for values stored as UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class CommunityService:
+    """Service class for the shared community snapshot"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """
+        Get community aggregates, recomputing them only when stale
+
+        Returns:
+            Snapshot payload with counts and the first page of each feed
+        """
+        snapshot, version = self._load()
+        if snapshot is not None and self._is_fresh(snapshot, version):
+            return snapshot.payload
+        if not acquire_lease(self.db, REBUILD_LEASE, REBUILD_LEASE_SECONDS):
+            # Someone else is rebuilding; until the first snapshot exists there is nothing to share
+            return snapshot.payload if snapshot is not None else self._compute()
+        try:
+            return self.refresh(version)
+        finally:
+            release_lease(self.db, REBUILD_LEASE)
+
+    def refresh(self, version: int = None) -> Dict[str, Any]:
+        """
+        Recompute the snapshot and store it for every worker
+
+        Args:
+            version: Community cache version the snapshot is computed at
+
+        Returns:
+            The new snapshot payload
+        """
+        if version is None:
+            version = get_version(self.db.connection(), COMMUNITY_VERSION)
+        payload = self._compute()
+
+        table = CommunitySnapshot.__table__
+        values = {'version': version, 'payload': payload, 'computed_at': datetime.now(timezone.utc)}
+        update = table.update().where(table.c.name == SNAPSHOT_NAME).values(**values)
+        if self.db.execute(update).rowcount == 0:
+            try:
+                self.db.execute(table.insert().values(name=SNAPSHOT_NAME, **values))
+                self.db.commit()
+                return payload
+            except IntegrityError:
+                # A concurrent refresh stored the first snapshot; overwrite it instead
+                self.db.rollback()
+                self.db.execute(update)
+        self.db.commit()
+        return payload
+
+    def _load(self):
+        """Snapshot row and current community version in one round trip"""
+        version = select(CacheVersion.version).where(CacheVersion.name == COMMUNITY_VERSION).scalar_subquery()
+        row = self.db.query(CommunitySnapshot, version)\
+            .filter(CommunitySnapshot.name == SNAPSHOT_NAME).first()
+        if row is None:
+            return None, get_version(self.db.connection(), COMMUNITY_VERSION)
+        return row[0], row[1] or 0
+
+    @staticmethod
+    def _is_fresh(snapshot: CommunitySnapshot, version: int) -> bool:
+        ttl = current_app.config.get('COMMUNITY_SNAPSHOT_TTL', DEFAULT_SNAPSHOT_TTL)
+        age = datetime.now(timezone.utc) - _as_utc(snapshot.computed_at)
+        return (
+            snapshot.version == version
+            and age < timedelta(seconds=ttl)
+            # Month and 7/30-day windows move with the calendar
+            and snapshot.payload.get('as_of') == configured_today().isoformat()
+        )
+
+    def _compute(self) -> Dict[str, Any]:
+        today = configured_today()
+        month_start = today.replace(day=1)
+        feed = ActivityService(self.db)
+
+        finished_page = feed.get_feed([FINISHED], limit=SNAPSHOT_PAGE_SIZE, since=month_start)
+        reading_page = feed.get_feed([STARTED], limit=SNAPSHOT_PAGE_SIZE, still_reading=True)
+        activity_page = feed.get_feed([LOGGED], limit=SNAPSHOT_PAGE_SIZE)
+
+        sharing_readers = self.db.query(func.count(User.id)).filter(
+            User.share_reading_activity == True,
+            User.is_active == True
+        ).scalar()
+
+        return {
+            'as_of': today.isoformat(),
+            'active_readers': feed.count_events(LOGGED, today - timedelta(days=30), distinct_users=True),
+            'sharing_readers': sharing_readers,
+            'books_this_month': feed.count_events(FINISHED, month_start),
+            'currently_reading': feed.count_events(STARTED, still_reading=True),
+            'recent_activity_count': feed.count_events(LOGGED, today - timedelta(days=7)),
+            'books_this_month_page': {
+                'books': feed_books(finished_page['events']),
+                'next_cursor': finished_page['next_cursor']
+            },
+            'currently_reading_page': {
+                'books': feed_books(reading_page['events']),
+                'next_cursor': reading_page['next_cursor']
+            },
+            'recent_activity_page': {
+                'events': [event.to_dict() for event in activity_page['events']],
+                'next_cursor': activity_page['next_cursor']
+            }
+        }
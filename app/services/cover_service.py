@@ -0,0 +1,340 @@
+"""
+CoverService - Local mirror of remote book covers
+Remote cover URLs (Google Books, OpenLibrary) are downloaded once per URL in
+the background. The image is stored under the SHA-256 of its bytes, so a
+cover reached through several URLs or owned by many users is kept once, as a
+fixed set of resized WebP and JPEG variants (see image_service). Uploaded
+covers go into the same store. Books record the digest of their cover, and
+pages and the API serve the local variant with immutable cache headers
+instead of hot-linking the upstream image. Cover URLs are user-editable, so
+hosts that resolve to private or loopback addresses are never fetched.
+"""
+
+from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+import ipaddress
+import os
+import re
+import socket
+
+import requests
+from flask import current_app
+from sqlalchemy import event, inspect, select, update, and_, or_
+from sqlalchemy.orm import Session
+
+from ..models import Book, CoverSource, CoverImage
+from ..utils import ensure_https_url
+from .background import schedule
+from .stats_service import bump_library_versions
+from .image_jobs import run_job
+from .image_service import ImageProfile, StoredImage, derivative_path, is_valid_digest, read_placeholder, store_image
+
+
+# Fixed-size variants are cropped to the cover aspect ratio; 'full' keeps its
+# own aspect ratio and is only bounded
+VARIANTS = {
+    'thumb': (100, 150),
+    'grid': (200, 300),
+    'full': (600, 900),
+}
+FIXED_VARIANTS = ('thumb', 'grid')
+DEFAULT_VARIANT = 'grid'
+COVER_PROFILE = ImageProfile(VARIANTS, FIXED_VARIANTS, DEFAULT_VARIANT)
+
+MAX_COVER_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+MAX_REDIRECTS = 3
+FETCH_WORKERS = 4
+# URLs that failed this many times are not retried
+MAX_FAILURES = 3
+DEFAULT_BATCH_SIZE = 50
+
+DEFAULT_MIRROR_INTERVAL = 300
+MIRROR_JOB_NAME = 'cover_mirror'
+
+_STORED_COVER_URL = re.compile(r'^/covers/([0-9a-f]{64})/')
+
+
+def is_remote(url: Optional[str]) -> bool:
+    """Whether a cover URL points at an upstream server (local paths are already served by us)"""
+    return bool(url) and url.startswith(('http://', 'https://'))
+
+
+def stored_cover_digest(url: Optional[str]) -> Optional[str]:
+    """Digest of a cover URL that points into our own store (uploaded covers), else None"""
+    match = _STORED_COVER_URL.match(url or '')
+    return match.group(1) if match else None
+
+
+def cover_store_dir() -> str:
+    return current_app.config['COVER_STORE_DIR']
+
+
+def stored_variant_path(digest: Optional[str], variant: str = DEFAULT_VARIANT) -> Optional[str]:
+    """Path of a stored cover variant's JPEG, or None if the digest/variant is unknown"""
+    if variant not in VARIANTS or not is_valid_digest(digest):
+        return None
+    path = derivative_path(cover_store_dir(), digest, variant)
+    return path if os.path.exists(path) else None
+
+
+def cover_url_for(digest: str, variant: str = DEFAULT_VARIANT) -> str:
+    """URL a stored cover variant is served from (format chosen per request)"""
+    return f'/covers/{digest}/{variant}'
+
+
+def served_cover_url(cover_url: Optional[str], digest: Optional[str], variant: str = DEFAULT_VARIANT) -> Optional[str]:
+    """The URL to hand to clients: the local variant when mirrored, else the HTTPS source"""
+    if digest:
+        return cover_url_for(digest, variant)
+    if cover_url and cover_url.startswith('http://'):
+        return cover_url.replace('http://', 'https://')
+    return cover_url
+
+
+def store_cover(store_dir: str, data: bytes) -> StoredImage:
+    """
+    Write a cover's variants to content-addressed storage (no-op if already stored)
+
+    Returns:
+        The SHA-256 digest of the bytes, original size and placeholder
+
+    Raises:
+        InvalidImage: If the bytes are not a usable image
+    """
+    return store_image(store_dir, data, COVER_PROFILE)
+
+
+class UnsafeCoverURL(ValueError):
+    """Raised for cover URLs that resolve to a private, loopback or otherwise non-public address"""
+    pass
+
+
+def check_public_url(url: str) -> None:
+    """
+    Refuse URLs the server must not fetch on a user's behalf (anything that
+    is not http(s) or whose host resolves to a non-public address)
+
+    Raises:
+        UnsafeCoverURL: If the URL is not safe to fetch
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise UnsafeCoverURL(f'Not an http(s) URL: {url}')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise UnsafeCoverURL(f'Cannot resolve {parts.hostname}: {e}') from e
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise UnsafeCoverURL(f'{parts.hostname} resolves to non-public address {address}')
+
+
+def download_cover(url: str) -> bytes:
+    """
+    Download a remote cover, refusing non-public hosts (also after redirects)
+    and oversized responses
+
+    Raises:
+        requests.RequestException/ValueError: If the download fails, is unsafe or is too large
+    """
+    url = ensure_https_url(url)
+    for _ in range(MAX_REDIRECTS + 1):
+        check_public_url(url)
+        with requests.get(url, timeout=FETCH_TIMEOUT, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            response.raise_for_status()
+            data = BytesIO()
+            for chunk in response.iter_content(64 * 1024):
+                data.write(chunk)
+                if data.tell() > MAX_COVER_BYTES:
+                    raise ValueError(f'Cover larger than {MAX_COVER_BYTES} bytes')
+            return data.getvalue()
+    raise ValueError(f'Too many redirects for {url}')
+
+
+def _fetch_and_store(store_dir: str, url: str):
+    """Download and store one cover; returns the StoredImage or the exception"""
+    try:
+        return store_cover(store_dir, download_cover(url))
+    except Exception as e:
+        return e
+
+
+def _assign_mirrored_covers(session, flush_context, instances):
+    """before_flush: point new and re-covered books at an already mirrored or uploaded image"""
+    books = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, Book) and (obj in session.new or _cover_url_changed(obj))
+    ]
+    if not books:
+        return
+    urls = {book.cover_url for book in books if is_remote(book.cover_url)}
+    digests = {}
+    if urls:
+        digests = dict(session.execute(
+            select(CoverSource.url, CoverSource.digest).where(CoverSource.url.in_(urls))
+        ).all())
+    for book in books:
+        book.cover_digest = digests.get(book.cover_url) or stored_cover_digest(book.cover_url)
+
+
+def _cover_url_changed(book: Book) -> bool:
+    return inspect(book).attrs.cover_url.history.has_changes()
+
+
+def register_listeners() -> None:
+    """Keep each book's cover_digest in step with its cover_url"""
+    if not event.contains(Session, 'before_flush', _assign_mirrored_covers):
+        event.listen(Session, 'before_flush', _assign_mirrored_covers)
+
+
+def schedule_mirror() -> None:
+    """Mirror newly added remote covers in the background every COVER_MIRROR_INTERVAL seconds"""
+    interval = current_app.config.get('COVER_MIRROR_INTERVAL', DEFAULT_MIRROR_INTERVAL)
+    schedule(MIRROR_JOB_NAME, interval, _mirror_job)
+
+
+def _mirror_job(session: Session) -> None:
+    service = CoverService(session)
+    service.mirror()
+    service.fill_placeholders()
+
+
+class CoverService:
+    """Service class for the local cover mirror"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def mirror(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Mirror up to batch_size remote cover URLs used by books not yet mirrored.
+        Each URL is downloaded once; every book using it is updated together
+
+        Returns:
+            Dictionary with the number of URLs 'mirrored' and 'failed', and 'books' updated
+        """
+        book, source = Book.__table__, CoverSource.__table__
+        urls = self.db.execute(
+            select(book.c.cover_url)
+            .outerjoin(source, source.c.url == book.c.cover_url)
+            .where(
+                book.c.cover_digest.is_(None),
+                or_(book.c.cover_url.like('http://%'), book.c.cover_url.like('https://%')),
+                or_(source.c.id.is_(None), source.c.digest.isnot(None), source.c.failures < MAX_FAILURES),
+            )
+            .group_by(book.c.cover_url)
+            .limit(batch_size)
+        ).scalars().all()
+        if not urls:
+            return {'mirrored': 0, 'failed': 0, 'books': 0}
+
+        known = dict(self.db.execute(
+            select(source.c.url, source.c.digest).where(source.c.url.in_(urls), source.c.digest.isnot(None))
+        ).all())
+        pending = [url for url in urls if url not in known]
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            results = dict(zip(pending, pool.map(partial(_fetch_and_store, cover_store_dir()), pending)))
+
+        now = datetime.now(timezone.utc)
+        connection = self.db.connection()
+        failed = 0
+        for url, result in results.items():
+            if isinstance(result, Exception):
+                current_app.logger.warning(f"Cover mirror could not fetch {url}: {result}")
+                failed += 1
+                self._record_source(connection, url, None, now)
+                continue
+            self._record_image(connection, result, now)
+            self._record_source(connection, url, result.digest, now)
+            known[url] = result.digest
+
+        # Cached views of these libraries (e.g. cover sprite sheets, public
+        # library pages) now show the wrong covers; the bulk update below
+        # bypasses the flush listeners that would otherwise say so
+        from .public_library_service import bump_if_shared
+        owners = self.db.execute(
+            select(book.c.user_id).distinct()
+            .where(book.c.cover_digest.is_(None), book.c.cover_url.in_(list(known)))
+        ).scalars().all()
+        bump_library_versions(connection, owners)
+        bump_if_shared(connection, owners)
+        updated = 0
+        for url, digest in known.items():
+            updated += connection.execute(
+                update(book).where(and_(book.c.cover_digest.is_(None), book.c.cover_url == url))
+                .values(cover_digest=digest)
+            ).rowcount
+        self.db.commit()
+        return {'mirrored': len(results) - failed, 'failed': failed, 'books': updated}
+
+    def store_upload(self, data: bytes) -> str:
+        """
+        Store an uploaded cover image (resized in the image pool)
+
+        Returns:
+            The cover URL to give the book
+
+        Raises:
+            InvalidImage: If the upload is not a usable image
+            JobTimeout: If resizing takes longer than IMAGE_JOB_TIMEOUT
+        """
+        stored = run_job(store_image, cover_store_dir(), data, COVER_PROFILE)
+        self._record_image(self.db.connection(), stored, datetime.now(timezone.utc))
+        return cover_url_for(stored.digest, 'full')
+
+    def fill_placeholders(self, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Give up to batch_size covers stored before placeholders existed a
+        placeholder, made from their stored thumbnail
+
+        Returns:
+            Number of covers updated
+        """
+        image = CoverImage.__table__
+        digests = self.db.execute(
+            select(image.c.digest).where(image.c.placeholder.is_(None)).limit(batch_size)
+        ).scalars().all()
+        filled = 0
+        for digest in digests:
+            path = stored_variant_path(digest, 'thumb')
+            if path is None:
+                continue
+            try:
+                placeholder, color = read_placeholder(path)
+            except Exception as e:
+                current_app.logger.warning(f"Could not make a placeholder for cover {digest}: {e}")
+                continue
+            self.db.execute(image.update().where(image.c.digest == digest).values(placeholder=placeholder, color=color))
+            filled += 1
+        self.db.commit()
+        return filled
+
+    @staticmethod
+    def _record_image(connection, stored: StoredImage, at: datetime) -> None:
+        image = CoverImage.__table__
+        if connection.execute(select(image.c.digest).where(image.c.digest == stored.digest)).first() is None:
+            width, height = stored.size
+            connection.execute(image.insert().values(
+                digest=stored.digest, width=width, height=height, placeholder=stored.placeholder,
+                color=stored.color, created_at=at
+            ))
+
+    @staticmethod
+    def _record_source(connection, url: str, digest: Optional[str], at: datetime) -> None:
+        source = CoverSource.__table__
+        values = {'digest': digest, 'last_attempt_at': at}
+        if digest is None:
+            values['failures'] = source.c.failures + 1
+        result = connection.execute(source.update().where(source.c.url == url).values(**values))
+        if result.rowcount == 0:
+            connection.execute(source.insert().values(
+                url=url, digest=digest, last_attempt_at=at, failures=0 if digest else 1
+            ))
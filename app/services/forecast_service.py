@@ -0,0 +1,186 @@
+"""
+ForecastService - Reading-pace model and finish-date forecasts
+Pace is an exponentially weighted rate over recent reading days; every
+currently-reading book is forecast in one vectorized pass from a single
+grouped query, and results are cached per library version
+"""
+
+from typing import Dict, Any, Optional
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import func, case, select, and_, or_
+from sqlalchemy.orm import Session
+
+from ..models import Book, ReadingDay, ReadingLog
+from .cache import VersionedCache
+from .stats_service import StatsService
+from .streak_service import configured_today
+
+
+# Recent reading is weighted with this half-life when estimating pace
+PACE_HALF_LIFE_DAYS = 7
+PACE_HISTORY_DAYS = 60
+# A book's share of the user's pace comes from pages logged in this window
+BOOK_SHARE_DAYS = 30
+
+_forecast_cache = VersionedCache(max_entries=1024)
+
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+def reading_pace(days: np.ndarray, pages: np.ndarray, today: date) -> Dict[str, Any]:
+    """
+    Pages-per-day rates from a series of (day, pages) within the pace history
+
+    Args:
+        days: datetime64[D] array of reading days
+        pages: Pages read on each day
+        today: Last day of the series
+
+    Returns:
+        Simple 7- and 30-day averages and the exponentially weighted rate
+    """
+    age = (np.datetime64(today, 'D') - days).astype(np.int64)
+    age = np.clip(age, 0, None)
+
+    # Zero-page days count towards the decay too, so weight every day of history
+    history = np.arange(PACE_HISTORY_DAYS)
+    history_weights = 0.5 ** (history / PACE_HALF_LIFE_DAYS)
+    weighted = (pages * 0.5 ** (age / PACE_HALF_LIFE_DAYS)).sum() / history_weights.sum()
+
+    return {
+        'pages_per_day_7d': _round(pages[age < 7].sum() / 7),
+        'pages_per_day_30d': _round(pages[age < 30].sum() / 30),
+        'pages_per_day': _round(weighted)
+    }
+
+
+class ForecastService:
+    """Service class for reading pace and finish-date forecasts"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_forecasts(self, user_id: int, goal: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Get reading pace, a finish-date forecast for every currently-reading
+        book, and a projection for the current year
+
+        Args:
+            user_id: User ID
+            goal: Optional number of books the user wants to finish this year
+
+        Returns:
+            Dictionary with 'pace', 'books' and 'year' sections
+        """
+        today = configured_today()
+        stats = StatsService(self.db).get_user_stats(user_id)
+
+        key = (user_id, today)
+        forecasts = _forecast_cache.get(key, stats.library_version)
+        if forecasts is None:
+            forecasts = self._compute(user_id, today, stats)
+            _forecast_cache.set(key, stats.library_version, forecasts)
+
+        if goal:
+            forecasts = dict(forecasts, year=self._goal_progress(forecasts['year'], goal))
+        return forecasts
+
+    def _compute(self, user_id: int, today: date, stats) -> Dict[str, Any]:
+        history_start = today - timedelta(days=PACE_HISTORY_DAYS - 1)
+        day_rows = self.db.query(ReadingDay.date, ReadingDay.pages).filter(
+            ReadingDay.user_id == user_id,
+            ReadingDay.date >= history_start,
+            ReadingDay.date <= today
+        ).all()
+        days = np.array([row[0] for row in day_rows], dtype='datetime64[D]')
+        pages = np.array([row[1] for row in day_rows], dtype=float)
+        pace = reading_pace(days, pages, today)
+
+        # Currently-reading books with total and recent pages in one grouped query
+        book = Book.__table__
+        log = ReadingLog.__table__
+        share_start = today - timedelta(days=BOOK_SHARE_DAYS - 1)
+        rows = self.db.execute(
+            select(
+                book.c.id, book.c.uid, book.c.title, book.c.page_count,
+                func.coalesce(func.sum(log.c.pages_read), 0),
+                func.coalesce(func.sum(case((log.c.date >= share_start, log.c.pages_read), else_=0)), 0)
+            ).select_from(
+                book.outerjoin(log, and_(log.c.book_id == book.c.id, log.c.user_id == user_id))
+            ).where(
+                book.c.user_id == user_id,
+                book.c.finish_date.is_(None),
+                or_(book.c.want_to_read.is_(None), book.c.want_to_read == False),
+                or_(book.c.library_only.is_(None), book.c.library_only == False)
+            ).group_by(book.c.id)
+        ).all()
+
+        books = []
+        if rows:
+            page_count = np.array([row[3] if row[3] else np.nan for row in rows], dtype=float)
+            pages_read = np.array([row[4] for row in rows], dtype=float)
+            recent = np.array([row[5] for row in rows], dtype=float)
+
+            # Each book progresses at its share of recent reading (even split if none)
+            share = recent / recent.sum() if recent.sum() > 0 else np.full(len(rows), 1 / len(rows))
+            rate = (pace['pages_per_day'] or 0) * share
+            remaining = np.clip(page_count - pages_read, 0, None)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                days_left = np.where(remaining == 0, 0, np.ceil(remaining / rate))
+                percent = np.minimum(pages_read / page_count * 100, 100)
+            forecastable = np.isfinite(days_left)
+
+            for index, row in enumerate(rows):
+                days_remaining = int(days_left[index]) if forecastable[index] else None
+                books.append({
+                    'book_id': row[0],
+                    'uid': row[1],
+                    'title': row[2],
+                    'page_count': row[3],
+                    'pages_read': int(pages_read[index]),
+                    'remaining_pages': None if np.isnan(remaining[index]) else int(remaining[index]),
+                    'percent_complete': None if np.isnan(percent[index]) else _round(percent[index], 1),
+                    'pages_per_day': _round(rate[index]),
+                    'days_remaining': days_remaining,
+                    'forecast_finish_date': (today + timedelta(days=days_remaining)).isoformat()
+                    if days_remaining is not None else None
+                })
+
+        year_end = date(today.year, 12, 31)
+        elapsed = (today - date(today.year, 1, 1)).days + 1
+        days_in_year = (year_end - date(today.year, 1, 1)).days + 1
+        finished = StatsService.finished_in(stats, today.year)
+        forecast_this_year = sum(
+            1 for entry in books
+            if entry['forecast_finish_date'] and entry['forecast_finish_date'] <= year_end.isoformat()
+        )
+
+        return {
+            'pace': pace,
+            'books': books,
+            'year': {
+                'year': today.year,
+                'finished': finished,
+                'projected_finished': _round(finished / elapsed * days_in_year, 1),
+                'forecast_finishes_in_progress': forecast_this_year,
+                'days_remaining': days_in_year - elapsed
+            }
+        }
+
+    @staticmethod
+    def _goal_progress(year: Dict[str, Any], goal: int) -> Dict[str, Any]:
+        """Add goal tracking to a year projection"""
+        # Today still counts as a reading day
+        months_left = (year['days_remaining'] + 1) / 30.44
+        books_needed = max(goal - year['finished'], 0)
+        return dict(
+            year,
+            goal=goal,
+            on_track=year['projected_finished'] >= goal,
+            books_needed=books_needed,
+            books_needed_per_month=_round(books_needed / months_left, 1)
+        )
@@ -0,0 +1,179 @@
+"""
+Image jobs - CPU-heavy image work in a dedicated process pool
+Compositing and re-encoding images holds the GIL for tens of milliseconds at
+a time, which delays every other request handled by the same worker. Jobs run
+in a small per-worker pool of processes instead, either synchronously with a
+deadline (run_job) or in the background with polling (submit_job/job_status).
+
+Job functions must be importable top-level functions taking and returning
+plain data (paths, bytes, numbers); they run without an app context.
+IMAGE_WORKERS = 0 runs jobs inline in the request thread.
+"""
+
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as JobTimeout
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+import multiprocessing
+import time
+
+from flask import current_app
+
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 30
+# Finished background jobs are forgotten after this many seconds
+RESULT_TTL = 300
+
+_pool = None
+_pool_lock = Lock()
+_jobs = {}
+_jobs_lock = Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """This worker's image process pool (None when jobs run inline)"""
+    global _pool
+    workers = current_app.config.get('IMAGE_WORKERS', DEFAULT_WORKERS)
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: forking a threaded server process can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose process died so the next job starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(fn: Callable, *args) -> Future:
+    pool = _get_pool()
+    if pool is None:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        return _get_pool().submit(fn, *args)
+
+
+def run_job(fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+    """
+    Run fn(*args) in the image pool and wait for its result
+
+    Args:
+        timeout: Seconds to wait (IMAGE_JOB_TIMEOUT by default)
+
+    Raises:
+        JobTimeout: If the job did not finish in time (it keeps running)
+        Exception: Whatever the job raised
+    """
+    if timeout is None:
+        timeout = current_app.config.get('IMAGE_JOB_TIMEOUT', DEFAULT_TIMEOUT)
+    return _submit(fn, *args).result(timeout=timeout)
+
+
+def submit_job(job_id: str, fn: Callable, *args, on_done: Optional[Callable[[Future], None]] = None) -> str:
+    """
+    Start fn(*args) in the background under job_id, unless a job with that id is
+    already running or finished recently in this worker
+
+    Args:
+        on_done: Called with the future when the job finishes (in a pool thread)
+
+    Returns:
+        The job id, for job_status/job_result
+    """
+    _prune()
+    with _jobs_lock:
+        if job_id in _jobs:
+            return job_id
+        future = _submit(fn, *args)
+        _jobs[job_id] = [future, None]
+
+    def finished(done: Future) -> None:
+        with _jobs_lock:
+            if job_id in _jobs:
+                _jobs[job_id][1] = time.monotonic()
+        if on_done is not None:
+            on_done(done)
+
+    future.add_done_callback(finished)
+    return job_id
+
+
+def wait_job(job_id: str, timeout: Optional[float] = None) -> Any:
+    """
+    Wait for a background job started in this worker and return its result
+
+    Raises:
+        KeyError: If the job is unknown
+        JobTimeout: If it did not finish in time (IMAGE_JOB_TIMEOUT by default)
+        Exception: Whatever the job raised; the job is forgotten so it can be retried
+    """
+    if timeout is None:
+        timeout = current_app.config.get('IMAGE_JOB_TIMEOUT', DEFAULT_TIMEOUT)
+    with _jobs_lock:
+        future = _jobs[job_id][0]
+    try:
+        return future.result(timeout=timeout)
+    except Exception:
+        if future.done():
+            forget_job(job_id)
+        raise
+
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    State of a background job started in this worker
+
+    Returns:
+        {'id', 'status': 'pending'|'done'|'failed', 'error'?}, or None if unknown
+    """
+    with _jobs_lock:
+        entry = _jobs.get(job_id)
+    if entry is None:
+        return None
+    future = entry[0]
+    if not future.done():
+        return {'id': job_id, 'status': 'pending'}
+    error = future.exception()
+    if error is not None:
+        return {'id': job_id, 'status': 'failed', 'error': str(error)}
+    return {'id': job_id, 'status': 'done'}
+
+
+def job_result(job_id: str) -> Any:
+    """Result of a finished background job (raises what the job raised; None if unknown or pending)"""
+    with _jobs_lock:
+        entry = _jobs.get(job_id)
+    if entry is None or not entry[0].done():
+        return None
+    return entry[0].result()
+
+
+def forget_job(job_id: str) -> None:
+    """Drop a finished job so the next submit_job with its id runs it again"""
+    with _jobs_lock:
+        entry = _jobs.get(job_id)
+        if entry is not None and entry[0].done():
+            del _jobs[job_id]
+
+
+def _prune() -> None:
+    cutoff = time.monotonic() - RESULT_TTL
+    with _jobs_lock:
+        for job_id in [job_id for job_id, (_, done_at) in _jobs.items() if done_at is not None and done_at < cutoff]:
+            del _jobs[job_id]
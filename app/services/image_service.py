@@ -0,0 +1,274 @@
+"""
+Image service - One derivative pipeline for covers and profile pictures
+An image is decoded once, downscaled while it is decoded (JPEG draft scaling,
+then Image.reduce) and encoded at a fixed set of sizes, each as WebP and JPEG,
+along with a tiny inline placeholder and a dominant colour to show while the
+real image loads. Derivatives are stored under the SHA-256 of the source
+bytes, so they never change and can be cached forever. A request gets WebP
+when its Accept header lists it and the smallest size at least as wide as the
+width it asks for.
+
+store_image is a plain function of bytes and paths so it can run in the image
+pool (see image_jobs).
+"""
+
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from io import BytesIO
+import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+
+# Extension -> (Pillow format, MIME type, encoder options); the first is preferred
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+FALLBACK_FORMAT = 'jpg'
+
+# Placeholders are a blurry WebP data URI this many pixels wide (a few hundred bytes)
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+
+# Decompression-bomb limit, checked from the header before any pixel is decoded
+MAX_IMAGE_PIXELS = 40_000_000
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+class InvalidImage(ValueError):
+    """Raised when uploaded or downloaded bytes are not a usable image"""
+    pass
+
+
+class ImageTooLarge(InvalidImage):
+    """Raised when an image has more pixels than MAX_IMAGE_PIXELS"""
+    pass
+
+
+class StoredImage(NamedTuple):
+    """Result of store_image"""
+    digest: str
+    # Original (width, height)
+    size: Tuple[int, int]
+    placeholder: str
+    color: str
+
+
+class ImageProfile(NamedTuple):
+    """The sizes an image is stored at"""
+    # Variant name -> (max width, max height), smallest first
+    variants: Dict[str, Tuple[int, int]]
+    # Variants cropped to exactly their size; the others keep the image's aspect ratio
+    cropped: Tuple[str, ...]
+    default: str
+
+
+AVATAR_PROFILE = ImageProfile(
+    variants={'small': (64, 64), 'medium': (160, 160), 'large': (512, 512)},
+    cropped=('small', 'medium', 'large'),
+    default='medium',
+)
+
+
+def is_valid_digest(digest: Optional[str]) -> bool:
+    return bool(_DIGEST.match(digest or ''))
+
+
+def derivative_path(store_dir: str, digest: str, variant: str, ext: str = FALLBACK_FORMAT) -> str:
+    """Path of a stored derivative"""
+    return os.path.join(store_dir, digest[:2], digest, f'{variant}.{ext}')
+
+
+def open_image(data: bytes, bounds: Tuple[int, int]) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode an image at roughly twice bounds, upright and flattened to RGB
+
+    Returns:
+        (decoded image, original (width, height))
+
+    Raises:
+        ImageTooLarge: If the image has more than MAX_IMAGE_PIXELS pixels
+        InvalidImage: If the bytes are not a readable image
+    """
+    try:
+        with Image.open(BytesIO(data)) as source:
+            size = source.size
+            if size[0] * size[1] > MAX_IMAGE_PIXELS:
+                raise ImageTooLarge(f'Image of {size[0]}x{size[1]} pixels is too large')
+            # JPEGs decode straight at 1/2, 1/4 or 1/8 scale when that still covers bounds
+            side = max(bounds)
+            source.draft('RGB', (side, side))
+            image = _flatten(ImageOps.exif_transpose(source))
+    except InvalidImage:
+        raise
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f'Unreadable image: {e}') from e
+    # Cheap box downscale to twice the size needed; LANCZOS does the rest
+    factor = int(min(image.width / bounds[0], image.height / bounds[1]) / 2)
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image, size
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy of an image, with any transparency composited onto white"""
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, 'white')
+        flat.paste(image, mask=image.getchannel('A'))
+        return flat
+    return image.convert('RGB')
+
+
+def render_placeholder(image: Image.Image) -> Tuple[str, str]:
+    """
+    Tiny stand-ins for an image while it loads
+
+    Returns:
+        (WebP data URI PLACEHOLDER_WIDTH pixels wide, dominant colour as '#rrggbb')
+    """
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * image.height // image.width or 1), Image.BILINEAR)
+    buffer = BytesIO()
+    small.save(buffer, format='WEBP', quality=PLACEHOLDER_QUALITY)
+    # Most common colour after reducing the placeholder to a small palette
+    palette = small.quantize(colors=4)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return (f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}",
+            f'#{red:02x}{green:02x}{blue:02x}')
+
+
+def read_placeholder(path: str) -> Tuple[str, str]:
+    """Placeholder of an already stored derivative, for images stored before placeholders existed"""
+    with Image.open(path) as image:
+        return render_placeholder(_flatten(image))
+
+
+def render_derivatives(data: bytes, profile: ImageProfile) -> Tuple[Dict[Tuple[str, str], bytes], Tuple[int, int], str, str]:
+    """
+    Decode an image once and encode every variant of the profile in every
+    format, and its placeholder
+
+    Returns:
+        ({(variant, ext): encoded bytes}, original (width, height), placeholder data URI, dominant colour)
+
+    Raises:
+        InvalidImage: If the bytes are not a usable image
+    """
+    largest = (max(w for w, _ in profile.variants.values()), max(h for _, h in profile.variants.values()))
+    image, size = open_image(data, largest)
+    derivatives = {}
+    for name, bounds in profile.variants.items():
+        if name in profile.cropped:
+            resized = ImageOps.fit(image, bounds, Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(bounds, Image.LANCZOS)
+        for ext, (image_format, _, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, **options)
+            derivatives[(name, ext)] = buffer.getvalue()
+    return (derivatives, size) + render_placeholder(image)
+
+
+def store_image(store_dir: str, data: bytes, profile: ImageProfile) -> StoredImage:
+    """
+    Image job: write an image's derivatives to content-addressed storage
+    (derivatives already stored are left alone)
+
+    Returns:
+        The SHA-256 digest of the bytes, original size and placeholder
+
+    Raises:
+        InvalidImage: If the bytes are not a usable image
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    derivatives, size, placeholder, color = render_derivatives(data, profile)
+    directory = os.path.dirname(derivative_path(store_dir, digest, profile.default))
+    os.makedirs(directory, exist_ok=True)
+    for (name, ext), encoded in derivatives.items():
+        path = derivative_path(store_dir, digest, name, ext)
+        if os.path.exists(path):
+            continue
+        # Write then rename so a concurrent reader never sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(encoded)
+        os.replace(tmp_path, path)
+    return StoredImage(digest, size, placeholder, color)
+
+
+def remove_image(store_dir: str, digest: str) -> None:
+    """Delete every derivative of an image"""
+    if is_valid_digest(digest):
+        shutil.rmtree(os.path.dirname(derivative_path(store_dir, digest, 'any')), ignore_errors=True)
+
+
+def best_variant(profile: ImageProfile, width: int) -> str:
+    """The smallest variant at least width pixels wide (the largest if none is)"""
+    for name, (variant_width, _) in profile.variants.items():
+        if variant_width >= width:
+            return name
+    return name
+
+
+def accepted_formats(accept: Iterable[Tuple[str, float]]) -> Tuple[str, ...]:
+    """
+    Extensions a client takes, best first. WebP only counts when the Accept
+    header names it, since */* is also sent by clients that cannot decode it
+    """
+    listed = {value for value, quality in accept if quality > 0}
+    return tuple(ext for ext, (_, mimetype, _) in FORMATS.items()
+                 if ext == FALLBACK_FORMAT or mimetype in listed)
+
+
+def find_derivative(store_dir: str, profile: ImageProfile, digest: str, name: str,
+                    accept: Iterable[Tuple[str, float]] = (),
+                    width: Optional[int] = None) -> Optional[Tuple[str, str, bool]]:
+    """
+    Pick the stored file to answer a request for an image
+
+    Args:
+        name: 'variant' for the best format the client accepts, or 'variant.ext'
+        accept: The request's Accept header as (MIME type, quality) pairs
+        width: Pick the variant by width instead of by name
+
+    Returns:
+        (path, MIME type, whether the format was negotiated), or None if not found
+    """
+    if not is_valid_digest(digest):
+        return None
+    variant, _, ext = name.partition('.')
+    if width:
+        variant = best_variant(profile, width)
+    if variant not in profile.variants or (ext and ext not in FORMATS):
+        return None
+    # Images stored before WebP derivatives existed only have the JPEG
+    for candidate in (ext,) if ext else accepted_formats(accept):
+        path = derivative_path(store_dir, digest, variant, candidate)
+        if os.path.exists(path):
+            return path, FORMATS[candidate][1], not ext
+    return None
+
+
+def avatar_store_dir() -> str:
+    return current_app.config['AVATAR_STORE_DIR']
+
+
+def avatar_url_for(digest: str, variant: str = AVATAR_PROFILE.default) -> str:
+    """URL a stored profile picture is served from (format chosen per request)"""
+    return f'/avatars/{digest}/{variant}'
+
+
+def avatar_digest(url: Optional[str]) -> Optional[str]:
+    """Digest of a profile picture URL served from the avatar store, else None"""
+    match = re.match(r'^/avatars/([0-9a-f]{64})/', url or '')
+    return match.group(1) if match else None
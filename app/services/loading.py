@@ -0,0 +1,83 @@
+"""
+Named relationship loading profiles and a lazy-load guard for list views
+List queries pick a profile instead of relying on per-row lazy loads, and views
+that render lists are wrapped in lazy_load_guard so any lazy load that still
+slips through is reported (or raised, depending on LAZY_LOAD_GUARD)
+"""
+
+from typing import Tuple
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from ..models import Book, ReadingLog, User, UserRating
+
+
+# Many-to-one relationships are joined; collections are loaded with one extra IN query.
+# Built on demand because backref attributes only exist once mappers are configured
+LOADING_PROFILES = {
+    'book_detail': lambda: (joinedload(Book.shared_book),),
+    'book_list': lambda: (joinedload(Book.cover_image),),
+    'book_with_owner': lambda: (joinedload(Book.user),),
+    'log_with_book': lambda: (joinedload(ReadingLog.book),),
+    'rating_with_user': lambda: (joinedload(UserRating.user),),
+    'user_detail': lambda: (
+        selectinload(User.books),
+        selectinload(User.reading_logs).joinedload(ReadingLog.book)
+    ),
+}
+
+
+class LazyLoadError(RuntimeError):
+    """Raised when a list view lazily loads a relationship and LAZY_LOAD_GUARD is 'raise'"""
+    pass
+
+
+def load_profile(name: str) -> Tuple:
+    """
+    Loader options for a named profile, for use as query.options(*load_profile(name))
+
+    Raises:
+        KeyError: If the profile does not exist
+    """
+    return LOADING_PROFILES[name]()
+
+
+def lazy_load_guard(view):
+    """Mark a view as rendering a list; lazy loads while it runs are flagged"""
+    @wraps(view)
+    def guarded(*args, **kwargs):
+        g.lazy_load_guard = view.__name__
+        g.lazy_loads = []
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.pop('lazy_load_guard', None)
+    return guarded
+
+
+def _flag_lazy_load(orm_execute_state):
+    """do_orm_execute: report lazy relationship loads inside guarded views"""
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None \
+            or not has_app_context():
+        return
+    view = g.get('lazy_load_guard')
+    mode = current_app.config.get('LAZY_LOAD_GUARD', 'warn')
+    if view is None or mode == 'off':
+        return
+
+    parent = orm_execute_state.lazy_loaded_from.class_.__name__
+    target = orm_execute_state.bind_mapper.class_.__name__ if orm_execute_state.bind_mapper else '?'
+    message = f"Lazy load of {target} from {parent} in list view '{view}' ({request.path})"
+    g.lazy_loads.append(message)
+    if mode == 'raise':
+        raise LazyLoadError(message)
+    current_app.logger.warning(message)
+
+
+def register_listeners() -> None:
+    """Watch every SQLAlchemy session for lazy loads in guarded views"""
+    if not event.contains(Session, 'do_orm_execute', _flag_lazy_load):
+        event.listen(Session, 'do_orm_execute', _flag_lazy_load)
@@ -0,0 +1,127 @@
+"""
+ProfileService - Public user profiles
+Summaries come from the materialized user_stats row and the persisted streak;
+the user's books are a keyset-paginated sub-resource. Both are cached for a
+short time per user and dropped as soon as the user's library version or
+public profile fields change
+"""
+
+from typing import Optional, Dict, Any, Tuple
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import Book, User, UserStats
+from .cache import VersionedCache
+from .public_library_service import book_list_columns, book_list_item, book_list_source
+from .stats_service import StatsService
+from .streak_service import StreakService, configured_today
+
+
+PROFILE_PAGE_SIZE = 24
+MAX_PROFILE_PAGE_SIZE = 100
+DEFAULT_PROFILE_CACHE_TTL = 60
+
+_summary_cache = VersionedCache(max_entries=1024)
+_books_cache = VersionedCache(max_entries=2048)
+
+
+def _cache_ttl() -> int:
+    return current_app.config.get('PROFILE_CACHE_TTL', DEFAULT_PROFILE_CACHE_TTL)
+
+
+class ProfileService:
+    """Service class for public user profiles"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def _load_visible(self, user_id: int) -> Tuple[Optional[User], Optional[UserStats]]:
+        """The user and their stats in one query, if the profile is shared"""
+        row = self.db.query(User, UserStats)\
+            .outerjoin(UserStats, UserStats.user_id == User.id)\
+            .filter(User.id == user_id, User.is_active == True).first()
+        if row is None or not row[0].share_reading_activity:
+            return None, None
+        user, stats = row
+        if stats is None:
+            stats = StatsService(self.db).get_user_stats(user.id)
+        return user, stats
+
+    def get_summary(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's public profile summary
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Profile data with counts, streak and the first page of books,
+            or None if the user is not found or not sharing
+        """
+        user, stats = self._load_visible(user_id)
+        if user is None:
+            return None
+
+        profile = user.to_dict()
+        today = configured_today()
+        key = (user.id, today)
+        version = (stats.library_version, profile)
+        summary = _summary_cache.get(key, version, max_age=_cache_ttl())
+        if summary is None:
+            first_page = self._books_page(user.id, None, PROFILE_PAGE_SIZE)
+            summary = {
+                **profile,
+                'total_books': stats.total_books,
+                'currently_reading': stats.currently_reading,
+                'finished_books': stats.finished_books,
+                'want_to_read': stats.want_to_read,
+                'books_this_year': StatsService.finished_in(stats, today.year),
+                'books_this_month': StatsService.finished_in(stats, today.year, today.month),
+                'reading_logs_count': stats.reading_log_count,
+                'reading_streak': StreakService(self.db).get_current_streak(
+                    user.id, user.reading_streak_offset or 0, today
+                ),
+                'books': first_page['books'],
+                'books_next_cursor': first_page['next_cursor']
+            }
+            _summary_cache.set(key, version, summary)
+        return summary
+
+    def get_books(self, user_id: int, before: Optional[int] = None,
+                  limit: int = PROFILE_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """
+        Get one page of a user's books, most recently added first
+
+        Args:
+            user_id: User ID
+            before: Cursor from a previous page
+            limit: Page size
+
+        Returns:
+            Dictionary with 'books' and 'next_cursor', or None if the user
+            is not found or not sharing
+        """
+        user, stats = self._load_visible(user_id)
+        if user is None:
+            return None
+
+        limit = max(1, min(limit, MAX_PROFILE_PAGE_SIZE))
+        key = (user.id, before, limit)
+        page = _books_cache.get(key, stats.library_version, max_age=_cache_ttl())
+        if page is None:
+            page = self._books_page(user.id, before, limit)
+            _books_cache.set(key, stats.library_version, page)
+        return page
+
+    def _books_page(self, user_id: int, before: Optional[int], limit: int) -> Dict[str, Any]:
+        book = Book.__table__
+        query = select(*book_list_columns()).select_from(book_list_source()).where(book.c.user_id == user_id)
+        if before:
+            query = query.where(book.c.id < before)
+        rows = self.db.execute(query.order_by(book.c.id.desc()).limit(limit + 1)).all()
+        return {
+            'books': [book_list_item(row) for row in rows[:limit]],
+            'next_cursor': rows[limit - 1].id if len(rows) > limit else None
+        }
@@ -0,0 +1,244 @@
+"""
+PublicLibraryService - Browse books from users who share their library
+Pages are read with a keyset cursor over indexed orderings and returned as a
+compact list projection. They are cached per filter against the instance-wide
+public library version, which is bumped by writes that can change what is shown
+"""
+
+from typing import Optional, Dict, Any, Tuple
+from datetime import date
+
+from sqlalchemy import event, select, and_, or_
+from sqlalchemy.orm import Session
+
+from ..models import Book, CoverImage, User
+from .cache import VersionedCache, get_version, bump_version
+from .cover_service import served_cover_url
+from .stats_service import previous_value, _load_previous_value
+
+
+PUBLIC_LIBRARY_VERSION = 'public_library'
+PUBLIC_LIBRARY_FILTERS = ('all', 'currently_reading', 'want_to_read')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+TRACKED_ATTRIBUTES = (User.share_library,)
+
+_PENDING_KEY = 'public_library_pending'
+
+_page_cache = VersionedCache(max_entries=512)
+
+
+def _collect_changes(session, flush_context, instances):
+    """before_flush: note whose library changes and whether visibility changes"""
+    pending = session.info.setdefault(_PENDING_KEY, {'user_ids': set(), 'force': False})
+
+    for obj in session.new:
+        if isinstance(obj, Book):
+            pending['user_ids'].add(obj.user_id)
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Book):
+            pending['user_ids'].update((obj.user_id, previous_value(obj, 'user_id')))
+        elif isinstance(obj, User) and obj.share_library != previous_value(obj, 'share_library'):
+            pending['force'] = True
+
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            pending['user_ids'].add(previous_value(obj, 'user_id'))
+        elif isinstance(obj, User):
+            pending['force'] = True
+
+
+def bump_if_shared(connection, user_ids, force: bool = False) -> None:
+    """Bump the public library version if any of these users shares their library"""
+    user_ids = set(user_ids) - {None}
+    changed = force
+    if not changed and user_ids:
+        user = User.__table__
+        changed = connection.execute(
+            select(user.c.id).where(user.c.id.in_(user_ids), user.c.share_library == True).limit(1)
+        ).first() is not None
+    if changed:
+        bump_version(connection, PUBLIC_LIBRARY_VERSION)
+
+
+def _bump_if_public(session, flush_context):
+    """after_flush: bump the public library version if a shared library changed"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    bump_if_shared(session.connection(), pending['user_ids'], pending['force'])
+
+
+def _discard_changes(session, previous_transaction):
+    """Drop changes collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """Hook public library invalidation into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_changes):
+        return
+    for attribute in TRACKED_ATTRIBUTES:
+        if not event.contains(attribute, 'set', _load_previous_value):
+            event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_changes)
+    event.listen(Session, 'after_flush', _bump_if_public)
+    event.listen(Session, 'after_soft_rollback', _discard_changes)
+
+
+def encode_cursor(finish_date: Optional[date], book_id: int) -> str:
+    """Cursor for the position after a book; finished books sort before unfinished ones"""
+    if finish_date is not None:
+        return f'f:{finish_date.isoformat()}:{book_id}'
+    return f'n:{book_id}'
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[date], int]:
+    """
+    Parse a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        kind, _, rest = cursor.partition(':')
+        if kind == 'f':
+            day, _, book_id = rest.rpartition(':')
+            return date.fromisoformat(day), int(book_id)
+        if kind == 'n':
+            return None, int(rest)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def book_list_columns() -> list:
+    """
+    Columns of the compact book list projection (no descriptions or metadata
+    blobs); select them from book_list_source()
+    """
+    book, cover = Book.__table__, CoverImage.__table__
+    return [
+        book.c.id, book.c.uid, book.c.title, book.c.author, book.c.isbn, book.c.cover_url, book.c.cover_digest,
+        book.c.page_count, book.c.start_date, book.c.finish_date, book.c.want_to_read,
+        book.c.library_only, cover.c.placeholder.label('cover_placeholder'), cover.c.color.label('cover_color')
+    ]
+
+
+def book_list_source():
+    """The book table with each book's stored cover, for book_list_columns()"""
+    book, cover = Book.__table__, CoverImage.__table__
+    return book.outerjoin(cover, cover.c.digest == book.c.cover_digest)
+
+
+def book_list_item(row) -> Dict[str, Any]:
+    """List projection of a row selected with book_list_columns()"""
+    return {
+        'id': row.id,
+        'uid': row.uid,
+        'title': row.title,
+        'author': row.author,
+        'isbn': row.isbn,
+        'cover_url': served_cover_url(row.cover_url, row.cover_digest),
+        'cover_placeholder': row.cover_placeholder,
+        'cover_color': row.cover_color,
+        'page_count': row.page_count,
+        'start_date': row.start_date.isoformat() if row.start_date else None,
+        'finish_date': row.finish_date.isoformat() if row.finish_date else None,
+        'want_to_read': bool(row.want_to_read),
+        'library_only': bool(row.library_only)
+    }
+
+
+class PublicLibraryService:
+    """Service class for the public library browse"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_page(self, filter_status: str = 'all', cursor: Optional[str] = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        Get one page of shared books
+
+        Args:
+            filter_status: 'all', 'currently_reading' or 'want_to_read'
+            cursor: Cursor from a previous page
+            limit: Page size
+
+        Returns:
+            Dictionary with 'books' (list projection) and 'next_cursor'
+
+        Raises:
+            ValueError: If the filter or cursor is invalid
+        """
+        if filter_status not in PUBLIC_LIBRARY_FILTERS:
+            raise ValueError(f"Unknown filter '{filter_status}'. Use one of: {', '.join(PUBLIC_LIBRARY_FILTERS)}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        position = decode_cursor(cursor) if cursor else None
+
+        version = get_version(self.db.connection(), PUBLIC_LIBRARY_VERSION)
+        key = (filter_status, cursor, limit)
+        page = _page_cache.get(key, version)
+        if page is None:
+            page = self._query_page(filter_status, position, limit)
+            _page_cache.set(key, version, page)
+        return page
+
+    def _query_page(self, filter_status: str, position, limit: int) -> Dict[str, Any]:
+        book, user = Book.__table__, User.__table__
+        base = select(
+            *book_list_columns(), user.c.id.label('owner_id'), user.c.username
+        ).select_from(
+            book_list_source().join(user, user.c.id == book.c.user_id)
+        ).where(
+            user.c.share_library == True,
+            book.c.library_only.isnot(True)
+        )
+
+        after_date, after_id = position if position else (None, None)
+        rows = []
+        if filter_status == 'all' and (position is None or after_date is not None):
+            # Finished books first, most recent finish first
+            finished = base.where(book.c.finish_date.isnot(None))
+            if position:
+                finished = finished.where(or_(
+                    book.c.finish_date < after_date,
+                    and_(book.c.finish_date == after_date, book.c.id < after_id)
+                ))
+            rows = self.db.execute(
+                finished.order_by(book.c.finish_date.desc(), book.c.id.desc()).limit(limit + 1)
+            ).all()
+            after_id = None
+
+        if len(rows) <= limit:
+            # Then unfinished books, newest first
+            if filter_status == 'want_to_read':
+                rest = base.where(book.c.want_to_read.is_(True))
+            elif filter_status == 'currently_reading':
+                rest = base.where(book.c.finish_date.is_(None), book.c.want_to_read.isnot(True))
+            else:
+                rest = base.where(book.c.finish_date.is_(None))
+            if after_id is not None:
+                rest = rest.where(book.c.id < after_id)
+            rows += self.db.execute(
+                rest.order_by(book.c.id.desc()).limit(limit + 1 - len(rows))
+            ).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.finish_date if filter_status == 'all' else None, last.id)
+
+        return {
+            'books': [self._project(row) for row in rows[:limit]],
+            'next_cursor': next_cursor
+        }
+
+    @staticmethod
+    def _project(row) -> Dict[str, Any]:
+        return dict(book_list_item(row), user={'id': row.owner_id, 'username': row.username})
@@ -0,0 +1,315 @@
+"""
+RatingService - Incremental rating aggregates
+One book_rating_stats row per rated book and one shared_book_rating_stats row
+per rated shared book hold the rating count, sum and 1-5 star histogram. Rows
+are moved by deltas from flush events, so a rating write costs the same however
+many ratings the book (or every copy of the title) already has
+"""
+
+from typing import Dict, Any, Optional
+
+from sqlalchemy import event, func, select, case, bindparam, or_
+from sqlalchemy.orm import Session
+
+from ..models import Book, BookRatingStats, SharedBookData, SharedBookRatingStats, UserRating
+from .stats_service import previous_value, _load_previous_value
+
+
+STARS = range(1, 6)
+STAR_COLUMNS = [f'stars_{stars}' for stars in STARS]
+VALUE_COLUMNS = ['rating_count', 'rating_sum'] + STAR_COLUMNS
+
+TRACKED_ATTRIBUTES = (UserRating.book_id, UserRating.rating, Book.shared_book_id)
+
+_PENDING_KEY = 'book_rating_pending'
+
+
+def _aggregate_columns(rating):
+    """(count, sum, stars_1..stars_5) over a user_rating table expression"""
+    return [
+        func.count(rating.c.id), func.coalesce(func.sum(rating.c.rating), 0),
+        *[func.coalesce(func.sum(case((rating.c.rating == stars, 1), else_=0)), 0) for stars in STARS]
+    ]
+
+
+def _aggregate_ratings():
+    """SELECT of (book_id, aggregates) grouped per book from user_rating"""
+    rating = UserRating.__table__
+    return (
+        select(rating.c.book_id, *_aggregate_columns(rating))
+        .where(rating.c.book_id.isnot(None))
+        .group_by(rating.c.book_id)
+    )
+
+
+def _aggregate_shared_ratings():
+    """SELECT of (shared_book_id, aggregates) over the ratings of every linked copy"""
+    rating, book = UserRating.__table__, Book.__table__
+    return (
+        select(book.c.shared_book_id, *_aggregate_columns(rating))
+        .select_from(rating.join(book, book.c.id == rating.c.book_id))
+        .where(book.c.shared_book_id.isnot(None))
+        .group_by(book.c.shared_book_id)
+    )
+
+
+def _apply_delta(connection, table, key_column, key, delta, aggregate) -> None:
+    """Move one aggregate row by a delta, creating it from an aggregate when missing"""
+    values = {column: table.c[column] + change for column, change in zip(VALUE_COLUMNS, delta)}
+    result = connection.execute(table.update().where(table.c[key_column] == key).values(**values))
+    if result.rowcount == 0:
+        # First rating, or a row rated before aggregates existed: the flush
+        # has already happened, so aggregating its ratings gives the exact row
+        connection.execute(table.insert().from_select([key_column] + VALUE_COLUMNS, aggregate))
+
+
+def _recompute(connection, table, key_column, key, aggregate) -> None:
+    """Replace one aggregate row with a fresh aggregate"""
+    connection.execute(table.delete().where(table.c[key_column] == key))
+    connection.execute(table.insert().from_select([key_column] + VALUE_COLUMNS, aggregate))
+
+
+def _recompute_shared(connection, shared_book_id: int) -> None:
+    book = Book.__table__
+    _recompute(connection, SharedBookRatingStats.__table__, 'shared_book_id', shared_book_id,
+               _aggregate_shared_ratings().where(book.c.shared_book_id == shared_book_id))
+
+
+def _sync_book(connection, book_id: int) -> None:
+    """Copy a book's aggregates onto the average_rating/rating_count columns the API exposes"""
+    stats = BookRatingStats.__table__
+    row = connection.execute(
+        select(stats.c.rating_count, stats.c.rating_sum).where(stats.c.book_id == book_id)
+    ).first()
+    count, total = (row.rating_count, row.rating_sum) if row else (0, 0)
+    book = Book.__table__
+    connection.execute(book.update().where(book.c.id == book_id).values(
+        rating_count=count,
+        average_rating=round(total / count, 1) if count else None
+    ))
+
+
+def backfill_rating_stats(connection) -> int:
+    """
+    Rebuild the whole book_rating_stats table from user_rating
+
+    Returns:
+        Number of rated books
+    """
+    table = BookRatingStats.__table__
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select(['book_id'] + VALUE_COLUMNS, _aggregate_ratings()))
+
+    # Books nobody rates any more read as unrated, like _sync_book leaves them
+    book = Book.__table__
+    connection.execute(
+        book.update().where(
+            book.c.id.notin_(select(table.c.book_id)),
+            or_(book.c.rating_count != 0, book.c.average_rating.isnot(None))
+        ).values(rating_count=0, average_rating=None)
+    )
+
+    rows = connection.execute(select(table.c.book_id, table.c.rating_count, table.c.rating_sum)).all()
+    if rows:
+        connection.execute(
+            book.update().where(book.c.id == bindparam('target_id')).values(
+                rating_count=bindparam('new_count'), average_rating=bindparam('new_average')),
+            [{'target_id': row.book_id, 'new_count': row.rating_count,
+              'new_average': round(row.rating_sum / row.rating_count, 1)} for row in rows]
+        )
+    return len(rows)
+
+
+def backfill_shared_rating_stats(connection) -> int:
+    """
+    Rebuild the whole shared_book_rating_stats table from user_rating and book links
+
+    Returns:
+        Number of rated shared books
+    """
+    table = SharedBookRatingStats.__table__
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select(['shared_book_id'] + VALUE_COLUMNS, _aggregate_shared_ratings()))
+    return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def _new_pending() -> Dict[str, Any]:
+    return {'books': {}, 'relinked_books': set(), 'recompute_shared': set()}
+
+
+def _collect_rating_deltas(session, flush_context, instances):
+    """before_flush: record how pending rating changes move each book's aggregates"""
+    pending = session.info.setdefault(_PENDING_KEY, _new_pending())
+    books = pending['books']
+
+    def add(book_id, rating, sign):
+        if book_id is None or rating not in STARS:
+            return
+        delta = books.setdefault(book_id, [0] * len(VALUE_COLUMNS))
+        delta[0] += sign
+        delta[1] += sign * rating
+        delta[1 + rating] += sign
+
+    for obj in session.new:
+        if isinstance(obj, UserRating):
+            add(obj.book_id, obj.rating, 1)
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, UserRating):
+            add(previous_value(obj, 'book_id'), previous_value(obj, 'rating'), -1)
+            add(obj.book_id, obj.rating, 1)
+        elif isinstance(obj, Book):
+            previous_shared = previous_value(obj, 'shared_book_id')
+            if previous_shared != obj.shared_book_id:
+                # All of the copy's ratings move between shared books
+                pending['relinked_books'].add(obj.id)
+                pending['recompute_shared'].update({previous_shared, obj.shared_book_id} - {None})
+
+    deleted_books, deleted_shared = [], []
+    for obj in session.deleted:
+        if isinstance(obj, UserRating):
+            add(previous_value(obj, 'book_id'), previous_value(obj, 'rating'), -1)
+        elif isinstance(obj, Book):
+            deleted_books.append(obj.id)
+            if previous_value(obj, 'shared_book_id') is not None:
+                pending['recompute_shared'].add(previous_value(obj, 'shared_book_id'))
+        elif isinstance(obj, SharedBookData):
+            deleted_shared.append(obj.id)
+
+    # Remove derived rows before the rows they describe go away
+    connection = session.connection() if deleted_books or deleted_shared else None
+    if deleted_books:
+        table = BookRatingStats.__table__
+        connection.execute(table.delete().where(table.c.book_id.in_(deleted_books)))
+        for book_id in deleted_books:
+            books.pop(book_id, None)
+    if deleted_shared:
+        table = SharedBookRatingStats.__table__
+        connection.execute(table.delete().where(table.c.shared_book_id.in_(deleted_shared)))
+        pending['recompute_shared'].difference_update(deleted_shared)
+
+
+def _apply_rating_deltas(session, flush_context):
+    """after_flush: write accumulated rating deltas in the same transaction"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    rating = UserRating.__table__
+    book = Book.__table__
+    connection = session.connection()
+
+    changed = {book_id: delta for book_id, delta in pending['books'].items() if any(delta)}
+    for book_id, delta in changed.items():
+        _apply_delta(connection, BookRatingStats.__table__, 'book_id', book_id, delta,
+                     _aggregate_ratings().where(rating.c.book_id == book_id))
+        _sync_book(connection, book_id)
+        # The columns were written through Core; loaded copies reload them on next access
+        loaded = session.identity_map.get(session.identity_key(Book, book_id))
+        if loaded is not None:
+            session.expire(loaded, ['rating_count', 'average_rating'])
+
+    # Roll the per-copy deltas up to their shared books; relinked copies are
+    # covered by recomputing both sides instead
+    incremental = [book_id for book_id in changed if book_id not in pending['relinked_books']]
+    shared_deltas = {}
+    if incremental:
+        links = connection.execute(
+            select(book.c.id, book.c.shared_book_id).where(
+                book.c.id.in_(incremental), book.c.shared_book_id.isnot(None))
+        ).all()
+        for book_id, shared_book_id in links:
+            if shared_book_id in pending['recompute_shared']:
+                continue
+            total = shared_deltas.setdefault(shared_book_id, [0] * len(VALUE_COLUMNS))
+            for index, change in enumerate(changed[book_id]):
+                total[index] += change
+
+    for shared_book_id, delta in shared_deltas.items():
+        if any(delta):
+            _apply_delta(connection, SharedBookRatingStats.__table__, 'shared_book_id', shared_book_id, delta,
+                         _aggregate_shared_ratings().where(book.c.shared_book_id == shared_book_id))
+    for shared_book_id in pending['recompute_shared']:
+        _recompute_shared(connection, shared_book_id)
+
+
+def _discard_rating_deltas(session, previous_transaction):
+    """Drop deltas collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """Hook rating aggregate maintenance into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_rating_deltas):
+        return
+    for attribute in TRACKED_ATTRIBUTES:
+        if not event.contains(attribute, 'set', _load_previous_value):
+            event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_rating_deltas)
+    event.listen(Session, 'after_flush', _apply_rating_deltas)
+    event.listen(Session, 'after_soft_rollback', _discard_rating_deltas)
+
+
+def _summary(stats) -> Dict[str, Any]:
+    if stats is None:
+        return {'average_rating': None, 'rating_count': 0, 'histogram': {stars: 0 for stars in STARS}}
+    return {
+        'average_rating': stats.average_rating,
+        'rating_count': stats.rating_count,
+        'histogram': stats.histogram
+    }
+
+
+class RatingService:
+    """Service class for book rating aggregates"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_rating_summary(self, book_id: int) -> Dict[str, Any]:
+        """
+        Get a book's rating aggregates with a single-row read
+
+        Returns:
+            Dictionary with 'average_rating', 'rating_count' and 'histogram'
+        """
+        stats: Optional[BookRatingStats] = self.db.get(BookRatingStats, book_id)
+        return _summary(stats)
+
+    def get_shared_rating_summary(self, shared_book_id: int) -> Dict[str, Any]:
+        """
+        Get rating aggregates across every user's copy of a shared book with a single-row read
+
+        Returns:
+            Dictionary with 'average_rating', 'rating_count' and 'histogram'
+        """
+        stats: Optional[SharedBookRatingStats] = self.db.get(SharedBookRatingStats, shared_book_id)
+        return _summary(stats)
+
+    def rebuild_book(self, book_id: int) -> None:
+        """Recompute one book's aggregates (and its shared book's) from its ratings"""
+        rating = UserRating.__table__
+        connection = self.db.connection()
+        _recompute(connection, BookRatingStats.__table__, 'book_id', book_id,
+                   _aggregate_ratings().where(rating.c.book_id == book_id))
+        _sync_book(connection, book_id)
+        book = Book.__table__
+        shared_book_id = connection.execute(select(book.c.shared_book_id).where(book.c.id == book_id)).scalar()
+        if shared_book_id is not None:
+            _recompute_shared(connection, shared_book_id)
+        self.db.commit()
+
+    def rebuild_all(self) -> int:
+        """
+        Recompute every book's and shared book's aggregates from user_rating
+
+        Returns:
+            Number of rated books
+        """
+        connection = self.db.connection()
+        rebuilt = backfill_rating_stats(connection)
+        backfill_shared_rating_stats(connection)
+        self.db.commit()
+        return rebuilt
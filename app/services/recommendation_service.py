@@ -0,0 +1,340 @@
+"""
+RecommendationService - "Readers like you also read"
+Item-item collaborative filtering over the shared catalog. A periodic build
+turns library rows and ratings into a sparse user x shared-book matrix, scores
+item pairs by cosine similarity of their reader vectors and stores the top-K
+neighbours of every shared book plus a ranked list per user. Requests only read
+those tables.
+
+The build works on flat NumPy arrays in coordinate form (row, column, value)
+rather than dense matrices, so memory grows with the number of library rows
+and co-read pairs, not with users x books.
+"""
+
+from typing import Dict, Any, List, Tuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select, exists, or_
+from sqlalchemy.orm import Session
+
+from ..models import (
+    Book, SharedBookData, SharedBookNeighbor, User, UserRating, UserRecommendation
+)
+from .background import schedule, last_run, record_run
+
+
+NEIGHBORS_PER_BOOK = 20
+RECOMMENDATIONS_PER_USER = 50
+DEFAULT_PAGE_SIZE = 20
+# Only the highest-weighted books of very large libraries form pairs, which
+# bounds the pair count per reader at MAX_ITEMS_PER_USER^2 / 2
+MAX_ITEMS_PER_USER = 500
+# Accumulated pairs are merged whenever the buffer grows past this many
+PAIR_CHUNK = 2_000_000
+INSERT_BATCH = 10_000
+
+DEFAULT_BUILD_INTERVAL = 6 * 3600
+BUILD_SNAPSHOT_NAME = 'recommendations'
+
+
+def interaction_weight(rating) -> float:
+    """
+    Strength of a reader-book link: 1 for a book in the library, raised towards
+    2 by its rating (1 star adds nothing, 5 stars 1). Always positive, so a
+    rated book never counts for less than an unrated one
+    """
+    return 1.0 if rating is None else 1.0 + (rating - 1) / 4.0
+
+
+def item_neighbors(users: np.ndarray, items: np.ndarray, weights: np.ndarray, n_items: int,
+                   k: int = NEIGHBORS_PER_BOOK, max_items_per_user: int = MAX_ITEMS_PER_USER,
+                   normalize: bool = True) -> Tuple[np.ndarray, ...]:
+    """
+    Top-k item-item cosine neighbours of a sparse user x item matrix
+
+    Args:
+        users, items, weights: Matrix entries in coordinate form, one per (user, item)
+        n_items: Number of item columns
+        k: Neighbours kept per item
+        normalize: Divide by column norms; pass False when columns are already unit length
+
+    Returns:
+        (source, neighbour, score, rank) arrays sorted by source, then by descending score
+    """
+    empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64))
+    keep = weights > 0
+    users, items, weights = users[keep], items[keep], weights[keep]
+    if len(users) == 0:
+        return empty
+
+    norms = np.sqrt(np.bincount(items, weights=weights ** 2, minlength=n_items))
+
+    # Group entries by user, highest weight first so large libraries keep their favourites
+    order = np.lexsort((-weights, users))
+    users, items, weights = users[order], items[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    ends = np.r_[starts[1:], len(users)]
+
+    pair_keys, pair_weights = [], []
+    buffered = 0
+    merged_keys = np.empty(0, np.int64)
+    merged_weights = np.empty(0)
+
+    def merge(keys, values):
+        unique, inverse = np.unique(keys, return_inverse=True)
+        return unique, np.bincount(inverse, weights=values)
+
+    for start, end in zip(starts, ends):
+        count = min(end - start, max_items_per_user)
+        if count < 2:
+            continue
+        user_items = items[start:start + count]
+        user_weights = weights[start:start + count]
+        first, second = np.triu_indices(count, 1)
+        low = np.minimum(user_items[first], user_items[second])
+        high = np.maximum(user_items[first], user_items[second])
+        pair_keys.append(low * n_items + high)
+        pair_weights.append(user_weights[first] * user_weights[second])
+        buffered += len(first)
+        if buffered >= PAIR_CHUNK:
+            merged_keys, merged_weights = merge(
+                np.concatenate([merged_keys] + pair_keys), np.concatenate([merged_weights] + pair_weights))
+            pair_keys, pair_weights, buffered = [], [], 0
+
+    if pair_keys:
+        merged_keys, merged_weights = merge(
+            np.concatenate([merged_keys] + pair_keys), np.concatenate([merged_weights] + pair_weights))
+    if len(merged_keys) == 0:
+        return empty
+
+    low, high = merged_keys // n_items, merged_keys % n_items
+    scores = merged_weights / (norms[low] * norms[high]) if normalize else merged_weights
+
+    # Both directions, then the best k per source
+    source = np.concatenate((low, high))
+    neighbour = np.concatenate((high, low))
+    scores = np.concatenate((scores, scores))
+    order = np.lexsort((neighbour, -scores, source))
+    source, neighbour, scores = source[order], neighbour[order], scores[order]
+    group_starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+    group_sizes = np.diff(np.r_[group_starts, len(source)])
+    rank = np.arange(len(source)) - np.repeat(group_starts, group_sizes)
+    top = rank < k
+    return source[top], neighbour[top], scores[top], rank[top]
+
+
+def user_scores(items: np.ndarray, weights: np.ndarray, indptr: np.ndarray,
+                neighbours: np.ndarray, scores: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank unseen items for one user from the neighbour lists of the items they have
+
+    Args:
+        items, weights: The user's items and their weights
+        indptr: Offsets into neighbours/scores for each item (CSR row pointer)
+        neighbours, scores: Neighbour lists of every item, concatenated
+        limit: Number of items to return
+
+    Returns:
+        (items, scores) best first
+    """
+    starts, ends = indptr[items], indptr[items + 1]
+    counts = ends - starts
+    if counts.sum() == 0:
+        return np.empty(0, np.int64), np.empty(0)
+    # Positions of every neighbour entry of every item, without a Python loop
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(starts, counts) + offsets
+
+    candidates, inverse = np.unique(neighbours[positions], return_inverse=True)
+    totals = np.bincount(inverse, weights=scores[positions] * np.repeat(weights, counts))
+    unseen = ~np.isin(candidates, items)
+    candidates, totals = candidates[unseen], totals[unseen]
+    best = np.lexsort((candidates, -totals))[:limit]
+    return candidates[best], totals[best]
+
+
+def _remove_derived_rows(session, flush_context, instances):
+    """before_flush: drop recommendation rows that point at users or shared books being deleted"""
+    users = [obj.id for obj in session.deleted if isinstance(obj, User)]
+    shared = [obj.id for obj in session.deleted if isinstance(obj, SharedBookData)]
+    if not users and not shared:
+        return
+    connection = session.connection()
+    recommendation = UserRecommendation.__table__
+    neighbor = SharedBookNeighbor.__table__
+    if users:
+        connection.execute(recommendation.delete().where(recommendation.c.user_id.in_(users)))
+    if shared:
+        connection.execute(recommendation.delete().where(recommendation.c.shared_book_id.in_(shared)))
+        connection.execute(neighbor.delete().where(or_(
+            neighbor.c.shared_book_id.in_(shared), neighbor.c.neighbor_id.in_(shared))))
+
+
+def register_listeners() -> None:
+    """Keep precomputed recommendations free of deleted users and shared books"""
+    if not event.contains(Session, 'before_flush', _remove_derived_rows):
+        event.listen(Session, 'before_flush', _remove_derived_rows)
+
+
+def schedule_build_if_stale() -> None:
+    """
+    Rebuild in the background when the stored build is older than
+    RECOMMENDATION_BUILD_INTERVAL seconds (0 disables)
+    """
+    interval = current_app.config.get('RECOMMENDATION_BUILD_INTERVAL', DEFAULT_BUILD_INTERVAL)
+
+    def build_if_stale(session):
+        service = RecommendationService(session)
+        if service.is_stale(interval):
+            service.build()
+
+    schedule(BUILD_SNAPSHOT_NAME, interval, build_if_stale)
+
+
+class RecommendationService:
+    """Service class for collaborative-filtering recommendations"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_for_user(self, user_id: int, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Get a user's recommendations with one indexed read, skipping books
+        they have added since the last build
+
+        Returns:
+            List of shared book summaries with a 'score', best first
+        """
+        recommendation, book = UserRecommendation.__table__, Book.__table__
+        owned = exists().where(
+            book.c.shared_book_id == recommendation.c.shared_book_id,
+            book.c.user_id == user_id
+        )
+        rows = self.db.execute(
+            self._select(recommendation, recommendation.c.shared_book_id)
+            .where(recommendation.c.user_id == user_id, ~owned)
+            .order_by(recommendation.c.rank)
+            .limit(max(1, min(limit, RECOMMENDATIONS_PER_USER)))
+        ).all()
+        return [self._project(row) for row in rows]
+
+    def get_for_book(self, book_uid: str, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Get the shared books most often read alongside a book, with one indexed read
+
+        Returns:
+            List of shared book summaries with a 'score', best first
+        """
+        neighbor, book = SharedBookNeighbor.__table__, Book.__table__
+        rows = self.db.execute(
+            self._select(neighbor, neighbor.c.neighbor_id)
+            .join(book, book.c.shared_book_id == neighbor.c.shared_book_id)
+            .where(book.c.uid == book_uid)
+            .order_by(neighbor.c.rank)
+            .limit(max(1, min(limit, NEIGHBORS_PER_BOOK)))
+        ).all()
+        return [self._project(row) for row in rows]
+
+    @staticmethod
+    def _select(table, shared_column):
+        shared = SharedBookData.__table__
+        return select(
+            table.c.score, shared.c.id, shared.c.custom_id, shared.c.title, shared.c.author,
+            shared.c.isbn, shared.c.cover_url
+        ).select_from(table.join(shared, shared.c.id == shared_column))
+
+    @staticmethod
+    def _project(row) -> Dict[str, Any]:
+        return {
+            'shared_book_id': row.id,
+            'custom_id': row.custom_id,
+            'title': row.title,
+            'author': row.author,
+            'isbn': row.isbn,
+            'cover_url': row.cover_url,
+            'score': round(row.score, 4)
+        }
+
+    def is_stale(self, interval: int) -> bool:
+        """Whether the stored build is missing or older than interval seconds"""
+        built_at = last_run(self.db, BUILD_SNAPSHOT_NAME)
+        return built_at is None or datetime.now(timezone.utc) - built_at >= timedelta(seconds=interval)
+
+    def build(self) -> Dict[str, int]:
+        """
+        Rebuild neighbour lists and per-user recommendations from library data
+
+        Only libraries of users who share them contribute co-occurrence, but
+        every active reader gets recommendations from their own books.
+
+        Returns:
+            Dictionary with 'books', 'neighbors' and 'users' counts
+        """
+        book, rating, user = Book.__table__, UserRating.__table__, User.__table__
+        rows = self.db.execute(
+            select(book.c.user_id, book.c.shared_book_id, rating.c.rating, user.c.share_library)
+            .select_from(
+                book.join(user, user.c.id == book.c.user_id)
+                .outerjoin(rating, (rating.c.book_id == book.c.id) & (rating.c.user_id == book.c.user_id))
+            )
+            .where(book.c.shared_book_id.isnot(None), user.c.is_active == True)
+        ).all()
+
+        user_ids = np.fromiter((row.user_id for row in rows), np.int64, len(rows))
+        shared_ids = np.fromiter((row.shared_book_id for row in rows), np.int64, len(rows))
+        weights = np.fromiter((interaction_weight(row.rating) for row in rows), float, len(rows))
+        sharing = np.fromiter((bool(row.share_library) for row in rows), bool, len(rows))
+
+        # Column and row indices; duplicate copies of a title keep their strongest link
+        item_ids, items = np.unique(shared_ids, return_inverse=True)
+        reader_ids, readers = np.unique(user_ids, return_inverse=True)
+        n_items = len(item_ids)
+        keys = readers.astype(np.int64) * n_items + items
+        order = np.lexsort((-weights, keys))
+        keep = order[np.r_[True, keys[order][1:] != keys[order][:-1]]] if len(order) else order
+        readers, items, weights, sharing = readers[keep], items[keep], weights[keep], sharing[keep]
+
+        source, neighbour, scores, ranks = item_neighbors(
+            readers[sharing], items[sharing], weights[sharing], n_items)
+        indptr = np.r_[0, np.cumsum(np.bincount(source, minlength=n_items))]
+
+        recommendations = []
+        order = np.argsort(readers, kind='stable')
+        for entries in np.split(order, np.flatnonzero(np.diff(readers[order])) + 1):
+            if len(entries) == 0:
+                continue
+            best, totals = user_scores(items[entries], weights[entries], indptr, neighbour, scores,
+                                       RECOMMENDATIONS_PER_USER)
+            reader = int(reader_ids[readers[entries[0]]])
+            recommendations.extend(
+                {'user_id': reader, 'rank': rank, 'shared_book_id': int(item_ids[item]), 'score': float(total)}
+                for rank, (item, total) in enumerate(zip(best, totals)) if total > 0
+            )
+
+        neighbors = [
+            {'shared_book_id': int(item_ids[a]), 'rank': int(rank), 'neighbor_id': int(item_ids[b]),
+             'score': float(score)}
+            for a, b, score, rank in zip(source, neighbour, scores, ranks)
+        ]
+
+        self._store(neighbors, recommendations)
+        return {
+            'books': n_items,
+            'neighbors': len(neighbors),
+            'users': len({row['user_id'] for row in recommendations})
+        }
+
+    def _store(self, neighbors: List[Dict[str, Any]], recommendations: List[Dict[str, Any]]) -> None:
+        """Replace both tables and the build marker in one transaction"""
+        connection = self.db.connection()
+        for table, rows in ((SharedBookNeighbor.__table__, neighbors),
+                            (UserRecommendation.__table__, recommendations)):
+            connection.execute(table.delete())
+            for index in range(0, len(rows), INSERT_BATCH):
+                connection.execute(table.insert(), rows[index:index + INSERT_BATCH])
+
+        record_run(connection, BUILD_SNAPSHOT_NAME, datetime.now(timezone.utc),
+                   {'neighbors': len(neighbors), 'recommendations': len(recommendations)})
+        self.db.commit()
@@ -0,0 +1,222 @@
+"""
+RollupService - Per-user daily reading rollup
+One reading_day row per (user, date) holds the pages read and books touched
+that day, maintained from flush events so day-based views avoid scanning logs
+"""
+
+from typing import Dict, Any, Tuple
+from array import array
+from base64 import b64encode
+from collections import defaultdict
+from datetime import date
+import sys
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from ..models import ReadingDay, ReadingLog, User, db
+from .stats_service import previous_value, _load_previous_value
+
+
+# Heatmaps always carry 366 day slots so leap and non-leap years decode alike
+HEATMAP_DAYS = 366
+# Pages are packed as unsigned 16-bit values; larger daily totals saturate
+MAX_PACKED_PAGES = 0xFFFF
+MAX_HEATMAP_YEARS = 20
+
+_PENDING_KEY = 'reading_day_pending'
+
+
+def _aggregate_days():
+    """SELECT of (user_id, date, pages, books) grouped per day from reading_log"""
+    log = ReadingLog.__table__
+    return (
+        select(log.c.user_id, log.c.date,
+               func.coalesce(func.sum(log.c.pages_read), 0), func.count(log.c.id))
+        .where(log.c.user_id.isnot(None), log.c.date.isnot(None))
+        .group_by(log.c.user_id, log.c.date)
+    )
+
+
+def backfill_reading_days(connection) -> None:
+    """Rebuild the whole reading_day table from reading_log in one statement"""
+    table = ReadingDay.__table__
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select(
+        ['user_id', 'date', 'pages', 'books'], _aggregate_days()))
+
+
+def _collect_day_deltas(session, flush_context, instances):
+    """before_flush: record how pending log changes move each reading day"""
+    pending = session.info.setdefault(_PENDING_KEY, defaultdict(lambda: [0, 0]))
+
+    def add(user_id, day, pages, sign):
+        if user_id is None or day is None:
+            return
+        delta = pending[(user_id, day)]
+        delta[0] += sign * (pages or 0)
+        delta[1] += sign
+
+    for obj in session.new:
+        if isinstance(obj, ReadingLog):
+            add(obj.user_id, obj.date, obj.pages_read, 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, ReadingLog) and session.is_modified(obj, include_collections=False):
+            add(previous_value(obj, 'user_id'), previous_value(obj, 'date'),
+                previous_value(obj, 'pages_read'), -1)
+            add(obj.user_id, obj.date, obj.pages_read, 1)
+
+    deleted_users = []
+    for obj in session.deleted:
+        if isinstance(obj, ReadingLog):
+            add(previous_value(obj, 'user_id'), previous_value(obj, 'date'),
+                previous_value(obj, 'pages_read'), -1)
+        elif isinstance(obj, User):
+            deleted_users.append(obj.id)
+
+    if deleted_users:
+        table = ReadingDay.__table__
+        session.connection().execute(table.delete().where(table.c.user_id.in_(deleted_users)))
+        for key in [key for key in pending if key[0] in deleted_users]:
+            pending.pop(key)
+
+
+def _apply_day_deltas(session, flush_context):
+    """after_flush: write accumulated day deltas in the same transaction"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    table = ReadingDay.__table__
+    log = ReadingLog.__table__
+    connection = session.connection()
+
+    for (user_id, day), (pages, books) in pending.items():
+        if not pages and not books:
+            continue
+        key = (table.c.user_id == user_id) & (table.c.date == day)
+        result = connection.execute(table.update().where(key).values(
+            pages=table.c.pages + pages, books=table.c.books + books))
+        if result.rowcount == 0:
+            # New day, or a day logged before the rollup existed: the flush has
+            # already happened, so aggregating its logs gives the exact row
+            connection.execute(table.insert().from_select(
+                ['user_id', 'date', 'pages', 'books'],
+                _aggregate_days().where(log.c.user_id == user_id, log.c.date == day)))
+        elif books < 0:
+            connection.execute(table.delete().where(key, table.c.books <= 0))
+
+
+def _discard_day_deltas(session, previous_transaction):
+    """Drop deltas collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """Hook daily rollup maintenance into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_day_deltas):
+        return
+    for attribute in (ReadingLog.user_id, ReadingLog.date, ReadingLog.pages_read):
+        if not event.contains(attribute, 'set', _load_previous_value):
+            event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_day_deltas)
+    event.listen(Session, 'after_flush', _apply_day_deltas)
+    event.listen(Session, 'after_soft_rollback', _discard_day_deltas)
+
+
+def encode_year(days) -> Dict[str, Any]:
+    """
+    Encode one year of (date, pages) rows as a presence bitmap plus packed pages
+
+    The bitmap has one bit per day of the year (bit 0 = 1 January, most
+    significant bit first within each byte). Pages holds one little-endian
+    uint16 per set bit, in day order.
+    """
+    bitmap = bytearray((HEATMAP_DAYS + 7) // 8)
+    pages = array('H')
+    total = 0
+    for day, day_pages in days:
+        index = day.timetuple().tm_yday - 1
+        bitmap[index >> 3] |= 0x80 >> (index & 7)
+        pages.append(min(day_pages or 0, MAX_PACKED_PAGES))
+        total += day_pages or 0
+    if sys.byteorder == 'big':
+        pages.byteswap()
+    return {
+        'active_days': len(pages),
+        'total_pages': total,
+        'bitmap': b64encode(bytes(bitmap)).decode('ascii'),
+        'pages': b64encode(pages.tobytes()).decode('ascii')
+    }
+
+
+class RollupService:
+    """Service class for the daily reading rollup"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_period_totals(self, user_id: int, start_date: date, end_date: date) -> Tuple[int, int]:
+        """
+        Get pages read and number of reading days in an inclusive date range
+
+        Args:
+            user_id: User ID
+            start_date: First day of the range
+            end_date: Last day of the range
+
+        Returns:
+            Tuple of (total_pages, reading_days)
+        """
+        pages, days = self.db.query(
+            func.coalesce(func.sum(ReadingDay.pages), 0), func.count(ReadingDay.date)
+        ).filter(
+            ReadingDay.user_id == user_id,
+            ReadingDay.date >= start_date,
+            ReadingDay.date <= end_date
+        ).one()
+        return pages, days
+
+    def get_heatmap(self, user_id: int, start_year: int, end_year: int) -> Dict[str, Any]:
+        """
+        Get compact calendar heatmaps for a span of years from one range read
+
+        Args:
+            user_id: User ID
+            start_year: First year (inclusive)
+            end_year: Last year (inclusive)
+
+        Returns:
+            Dictionary with the encoding description and one entry per year
+        """
+        if end_year < start_year:
+            raise ValueError("end_year must not be before start_year")
+        if end_year - start_year + 1 > MAX_HEATMAP_YEARS:
+            raise ValueError(f"At most {MAX_HEATMAP_YEARS} years can be requested at once")
+
+        rows = self.db.query(ReadingDay.date, ReadingDay.pages).filter(
+            ReadingDay.user_id == user_id,
+            ReadingDay.date >= date(start_year, 1, 1),
+            ReadingDay.date <= date(end_year, 12, 31)
+        ).order_by(ReadingDay.date).all()
+
+        by_year = defaultdict(list)
+        for day, pages in rows:
+            by_year[day.year].append((day, pages))
+
+        return {
+            'encoding': {
+                'bitmap': f'base64, {HEATMAP_DAYS} bits, bit 0 = Jan 1, MSB first',
+                'pages': 'base64, little-endian uint16 per set bit, saturating'
+            },
+            'years': [
+                dict(year=year, **encode_year(by_year.get(year, [])))
+                for year in range(start_year, end_year + 1)
+            ]
+        }
+
+    def rebuild_all(self) -> None:
+        """Rebuild every user's daily rollup from reading logs (repairs any drift)"""
+        backfill_reading_days(self.db.connection())
+        self.db.commit()
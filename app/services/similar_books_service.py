@@ -0,0 +1,331 @@
+"""
+SimilarBooksService - Content-based "similar books"
+Every shared book's description words, normalized categories, author and
+publisher are turned into a unit-length TF-IDF vector stored as
+shared_book_term rows. The top-K most similar books by cosine similarity are
+kept in similar_book, so requests only read that table.
+
+The index is kept up to date incrementally: each run re-indexes only shared
+books created or edited since the previous run, scoring them against the
+stored vectors through the term index and merging them into the lists of the
+books they resemble. A full rebuild recalibrates IDF weights across the whole
+catalog.
+"""
+
+from typing import Dict, Any, List
+from collections import Counter
+from datetime import datetime, timezone
+import math
+import re
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select, func, or_
+from sqlalchemy.orm import Session
+
+from ..models import Book, SharedBookData, SharedBookTerm, SimilarBook
+from ..utils import standardize_categories
+from .background import schedule, last_run, record_run
+from .recommendation_service import item_neighbors
+
+
+SIMILAR_PER_BOOK = 20
+DEFAULT_PAGE_SIZE = 10
+MAX_TERMS_PER_BOOK = 64
+TERM_LENGTH = 80
+# Relative importance of each metadata field, by term prefix
+FIELD_WEIGHTS = {'w': 1.0, 'c': 2.0, 'a': 3.0, 'p': 1.0}
+# Terms carried by more than this share of the catalog (and at least
+# MIN_COMMON_DF books) say little about similarity and are not matched on
+MAX_DF_RATIO = 0.1
+MIN_COMMON_DF = 50
+# A full rebuild pairs up only the books a term weighs most in, so each term
+# costs at most MAX_POSTINGS_PER_TERM^2 / 2 pairs however large the catalog
+MAX_POSTINGS_PER_TERM = 100
+# Existing books whose lists an incremental run may update, per new book
+MERGE_CANDIDATES = 200
+# Larger incremental batches fall back to a full rebuild
+MAX_INCREMENTAL = 1000
+INSERT_BATCH = 10_000
+
+DEFAULT_INDEX_INTERVAL = 300
+INDEX_SNAPSHOT_NAME = 'similar_books'
+
+STOPWORDS = frozenset('''
+    about above after again against all also among and any are around because been before being below
+    between both but can could did does doing down during each even every few for from further had has
+    have having her here hers herself him himself his how into its itself just like many more most much
+    must never new not now off once one only other our ours out over own same she should since some
+    still such than that the their theirs them themselves then there these they this those through too
+    under until upon very was way were what when where which while who whom why will with within without
+    would yet you your yours book books story novel author edition read reader readers world life
+'''.split())
+
+_WORD = re.compile(r"[a-z][a-z']+")
+_TAG = re.compile(r'<[^>]+>')
+_AUTHOR_SPLIT = re.compile(r',|&|;|\band\b')
+
+
+def document_terms(description, categories, author, publisher) -> Counter:
+    """Prefixed term counts for one book's metadata"""
+    terms = Counter()
+    if description:
+        for word in _WORD.findall(_TAG.sub(' ', description).lower()):
+            word = word.strip("'")
+            if len(word) >= 3 and word not in STOPWORDS:
+                terms[f'w:{word}'] += 1
+    # "Fiction / Science Fiction / General" contributes each level as a category
+    for category in (standardize_categories(categories) or '').split(','):
+        for part in category.split('/'):
+            part = ' '.join(part.lower().split())
+            if part and part != 'general':
+                terms[f'c:{part}'] += 1
+    for name in _AUTHOR_SPLIT.split((author or '').lower()):
+        name = ' '.join(name.split())
+        if name:
+            terms[f'a:{name}'] += 1
+    if publisher and publisher.strip():
+        terms[f"p:{' '.join(publisher.lower().split())}"] += 1
+    return Counter({term[:TERM_LENGTH]: count for term, count in terms.items()})
+
+
+def term_weights(counts: Counter, df: Dict[str, int], n_docs: int) -> Dict[str, float]:
+    """Unit-length TF-IDF vector of a book's strongest terms"""
+    weights = {
+        term: FIELD_WEIGHTS[term[0]] * (1 + math.log(count)) * (math.log((n_docs + 1) / (df.get(term, 0) + 1)) + 1)
+        for term, count in counts.items()
+    }
+    top = sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:MAX_TERMS_PER_BOOK]
+    norm = math.sqrt(sum(weight * weight for _, weight in top))
+    return {term: weight / norm for term, weight in top} if norm else {}
+
+
+def common_df(n_docs: int) -> int:
+    """Document frequency above which a term is not used for matching"""
+    return max(MIN_COMMON_DF, int(MAX_DF_RATIO * n_docs))
+
+
+def _remove_derived_rows(session, flush_context, instances):
+    """before_flush: drop index rows of shared books being deleted"""
+    shared = [obj.id for obj in session.deleted if isinstance(obj, SharedBookData)]
+    if not shared:
+        return
+    connection = session.connection()
+    term, similar = SharedBookTerm.__table__, SimilarBook.__table__
+    connection.execute(term.delete().where(term.c.shared_book_id.in_(shared)))
+    connection.execute(similar.delete().where(or_(
+        similar.c.shared_book_id.in_(shared), similar.c.similar_id.in_(shared))))
+
+
+def register_listeners() -> None:
+    """Keep the similar-books index free of deleted shared books"""
+    if not event.contains(Session, 'before_flush', _remove_derived_rows):
+        event.listen(Session, 'before_flush', _remove_derived_rows)
+
+
+def schedule_index() -> None:
+    """Index new and edited shared books in the background every SIMILAR_BOOKS_INDEX_INTERVAL seconds"""
+    interval = current_app.config.get('SIMILAR_BOOKS_INDEX_INTERVAL', DEFAULT_INDEX_INTERVAL)
+    schedule(INDEX_SNAPSHOT_NAME, interval, lambda session: SimilarBooksService(session).update())
+
+
+class SimilarBooksService:
+    """Service class for content-based similar books"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_for_book(self, book_uid: str, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Get the shared books most similar to a book, with one indexed read
+
+        Returns:
+            List of shared book summaries with a 'score', most similar first
+        """
+        similar, shared, book = SimilarBook.__table__, SharedBookData.__table__, Book.__table__
+        rows = self.db.execute(
+            select(similar.c.score, shared.c.id, shared.c.custom_id, shared.c.title, shared.c.author,
+                   shared.c.isbn, shared.c.cover_url)
+            .select_from(
+                similar.join(shared, shared.c.id == similar.c.similar_id)
+                .join(book, book.c.shared_book_id == similar.c.shared_book_id)
+            )
+            .where(book.c.uid == book_uid)
+            .order_by(similar.c.rank)
+            .limit(max(1, min(limit, SIMILAR_PER_BOOK)))
+        ).all()
+        return [{
+            'shared_book_id': row.id,
+            'custom_id': row.custom_id,
+            'title': row.title,
+            'author': row.author,
+            'isbn': row.isbn,
+            'cover_url': row.cover_url,
+            'score': round(row.score, 4)
+        } for row in rows]
+
+    def update(self) -> Dict[str, int]:
+        """
+        Index shared books created or edited since the last run, or rebuild
+        everything when there is no previous run or too much has changed
+
+        Returns:
+            Dictionary with 'indexed' and 'lists' counts
+        """
+        since = last_run(self.db, INDEX_SNAPSHOT_NAME)
+        if since is None:
+            return self.rebuild()
+
+        started = datetime.now(timezone.utc)
+        shared = SharedBookData.__table__
+        changed = self.db.execute(
+            self._metadata_query().where(shared.c.updated_at > since.replace(tzinfo=None)).order_by(shared.c.id)
+        ).all()
+        if len(changed) > MAX_INCREMENTAL:
+            return self.rebuild()
+
+        lists = self._index_incrementally(changed) if changed else 0
+        record_run(self.db.connection(), INDEX_SNAPSHOT_NAME, started, {'indexed': len(changed)})
+        self.db.commit()
+        return {'indexed': len(changed), 'lists': lists}
+
+    @staticmethod
+    def _metadata_query():
+        shared = SharedBookData.__table__
+        return select(shared.c.id, shared.c.description, shared.c.categories, shared.c.author, shared.c.publisher)
+
+    def _index_incrementally(self, changed) -> int:
+        connection = self.db.connection()
+        term, similar = SharedBookTerm.__table__, SimilarBook.__table__
+        changed_ids = [row.id for row in changed]
+
+        # Forget the old vectors and lists of the changed books
+        connection.execute(term.delete().where(term.c.shared_book_id.in_(changed_ids)))
+        connection.execute(similar.delete().where(or_(
+            similar.c.shared_book_id.in_(changed_ids), similar.c.similar_id.in_(changed_ids))))
+
+        counts = {row.id: document_terms(row.description, row.categories, row.author, row.publisher)
+                  for row in changed}
+        all_terms = set().union(*counts.values())
+        df = Counter()
+        for chunk in _chunks(sorted(all_terms)):
+            df.update(dict(connection.execute(
+                select(term.c.term, func.count()).where(term.c.term.in_(chunk)).group_by(term.c.term)
+            ).all()))
+        for document in counts.values():
+            df.update(document.keys())
+        n_docs = connection.execute(select(func.count()).select_from(SharedBookData.__table__)).scalar()
+        vectors = {shared_id: term_weights(document, df, n_docs) for shared_id, document in counts.items()}
+
+        rows = [{'shared_book_id': shared_id, 'term': name, 'weight': weight}
+                for shared_id, vector in vectors.items() for name, weight in vector.items()]
+        for index in range(0, len(rows), INSERT_BATCH):
+            connection.execute(term.insert(), rows[index:index + INSERT_BATCH])
+
+        # Score each changed book against every stored vector sharing an informative term
+        limit = common_df(n_docs)
+        matchable = sorted(name for name in all_terms if 1 < df[name] <= limit)
+        postings = {}
+        for chunk in _chunks(matchable):
+            for shared_id, name, weight in connection.execute(
+                select(term.c.shared_book_id, term.c.term, term.c.weight).where(term.c.term.in_(chunk))
+            ):
+                postings.setdefault(name, []).append((shared_id, weight))
+
+        new_lists = {}
+        for shared_id, vector in vectors.items():
+            scores = Counter()
+            for name, weight in vector.items():
+                for other, other_weight in postings.get(name, ()):
+                    if other != shared_id:
+                        scores[other] += weight * other_weight
+            new_lists[shared_id] = scores.most_common()
+
+        # Merge the changed books into the lists of the unchanged books they resemble
+        incoming = {}
+        for shared_id, scored in new_lists.items():
+            for other, score in scored[:MERGE_CANDIDATES]:
+                if other not in new_lists:
+                    incoming.setdefault(other, []).append((shared_id, score))
+        existing = {}
+        for chunk in _chunks(sorted(incoming)):
+            for row in connection.execute(
+                select(similar.c.shared_book_id, similar.c.similar_id, similar.c.score)
+                .where(similar.c.shared_book_id.in_(chunk))
+            ):
+                existing.setdefault(row.shared_book_id, []).append((row.similar_id, row.score))
+
+        rewrite = {shared_id: scored[:SIMILAR_PER_BOOK] for shared_id, scored in new_lists.items()}
+        for shared_id, entries in incoming.items():
+            current = existing.get(shared_id, [])
+            merged = sorted(current + entries, key=lambda item: (-item[1], item[0]))[:SIMILAR_PER_BOOK]
+            if merged != sorted(current, key=lambda item: (-item[1], item[0])):
+                rewrite[shared_id] = merged
+
+        if rewrite:
+            for chunk in _chunks(sorted(rewrite)):
+                connection.execute(similar.delete().where(similar.c.shared_book_id.in_(chunk)))
+            self._insert_lists(rewrite)
+        return len(rewrite)
+
+    def rebuild(self) -> Dict[str, int]:
+        """
+        Re-index the whole catalog with fresh IDF weights
+
+        Returns:
+            Dictionary with 'indexed' and 'lists' counts
+        """
+        started = datetime.now(timezone.utc)
+        documents = self.db.execute(self._metadata_query().order_by(SharedBookData.id)).all()
+        counts = [document_terms(row.description, row.categories, row.author, row.publisher) for row in documents]
+        df = Counter()
+        for document in counts:
+            df.update(document.keys())
+        n_docs = len(documents)
+        vectors = [term_weights(document, df, n_docs) for document in counts]
+
+        connection = self.db.connection()
+        term, similar = SharedBookTerm.__table__, SimilarBook.__table__
+        connection.execute(term.delete())
+        rows = [{'shared_book_id': row.id, 'term': name, 'weight': weight}
+                for row, vector in zip(documents, vectors) for name, weight in vector.items()]
+        for index in range(0, len(rows), INSERT_BATCH):
+            connection.execute(term.insert(), rows[index:index + INSERT_BATCH])
+
+        # Terms are the rows and books the columns of a sparse matrix of unit
+        # columns, so the item-item dot products are the cosine similarities
+        limit = common_df(n_docs)
+        vocabulary = {name: index for index, name in enumerate(
+            sorted(name for name, count in df.items() if 1 < count <= limit))}
+        entries = [(vocabulary[name], column, weight)
+                   for column, vector in enumerate(vectors)
+                   for name, weight in vector.items() if name in vocabulary]
+        term_index = np.fromiter((entry[0] for entry in entries), np.int64, len(entries))
+        book_index = np.fromiter((entry[1] for entry in entries), np.int64, len(entries))
+        weights = np.fromiter((entry[2] for entry in entries), float, len(entries))
+        source, neighbour, scores, _ = item_neighbors(
+            term_index, book_index, weights, n_docs, k=SIMILAR_PER_BOOK, max_items_per_user=MAX_POSTINGS_PER_TERM,
+            normalize=False)
+
+        lists = {}
+        for a, b, score in zip(source, neighbour, scores):
+            lists.setdefault(documents[a].id, []).append((documents[b].id, float(score)))
+        connection.execute(similar.delete())
+        self._insert_lists(lists)
+
+        record_run(connection, INDEX_SNAPSHOT_NAME, started, {'indexed': n_docs})
+        self.db.commit()
+        return {'indexed': n_docs, 'lists': len(lists)}
+
+    def _insert_lists(self, lists: Dict[int, list]) -> None:
+        rows = [{'shared_book_id': shared_id, 'rank': rank, 'similar_id': other, 'score': score}
+                for shared_id, scored in lists.items() for rank, (other, score) in enumerate(scored)]
+        table = SimilarBook.__table__
+        for index in range(0, len(rows), INSERT_BATCH):
+            self.db.connection().execute(table.insert(), rows[index:index + INSERT_BATCH])
+
+
+def _chunks(values: list, size: int = 500):
+    """Split IN lists to stay under database parameter limits"""
+    for index in range(0, len(values), size):
+        yield values[index:index + size]
@@ -0,0 +1,157 @@
+"""
+SpriteService - Cover sprite sheets for large library grids
+A page of a user's library (SPRITE_PAGE_SIZE books, oldest first) is packed
+into one image of the locally stored cover thumbnails, plus a map of where
+each book's tile sits, so a grid of hundreds of covers costs a handful of
+requests. Sheets are built in the image pool straight from the cover store
+and cached on disk per user, page and library version. Books whose cover is
+not stored locally are left out of the map and keep their own cover URL.
+"""
+
+from typing import Optional, Dict, Any, List, Tuple
+from io import BytesIO
+import glob
+import os
+import tempfile
+
+from flask import current_app
+from PIL import Image, ImageOps
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models import Book
+from .cache import VersionedCache
+from .cover_service import VARIANTS, stored_variant_path
+from .image_jobs import run_job
+from .image_service import FORMATS
+from .stats_service import StatsService
+
+
+SPRITE_PAGE_SIZE = 100
+SPRITE_COLUMNS = 10
+SPRITE_VARIANT = 'thumb'
+
+_sheet_cache = VersionedCache(max_entries=1024)
+
+
+def sprite_job(paths: List[str], tile: Tuple[int, int], columns: int, ext: str) -> bytes:
+    """
+    Image job: paste stored cover thumbnails into a grid, left to right and
+    top to bottom, and encode it in the given format
+    """
+    width, height = tile
+    rows = -(-len(paths) // columns)
+    sheet = Image.new('RGB', (min(len(paths), columns) * width, rows * height), 'white')
+    for index, path in enumerate(paths):
+        with Image.open(path) as cover:
+            cover = cover.convert('RGB')
+            if cover.size != tile:
+                cover = ImageOps.fit(cover, tile, Image.LANCZOS)
+            sheet.paste(cover, ((index % columns) * width, (index // columns) * height))
+    image_format, _, options = FORMATS[ext]
+    buffer = BytesIO()
+    sheet.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+class SpriteService:
+    """Service class for cover sprite sheets"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_sheet(self, user_id: int, page: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Get the layout of one page of the user's cover sprite sheets
+
+        Returns:
+            Dictionary with 'page', 'pages', 'version', 'tile' (width and
+            height), 'columns' and 'offsets' ({book uid: {'x', 'y'}}), or None
+            if there is no such page
+        """
+        return self._cached(user_id, page)[0]
+
+    def get_image(self, user_id: int, page: int, version: int, ext: str) -> Optional[str]:
+        """
+        Path of a sprite sheet image, built in the image pool if not cached
+
+        Returns:
+            The path, or None if the page has no tiles or version is not the
+            user's current library version
+
+        Raises:
+            JobTimeout: If building the sheet takes longer than IMAGE_JOB_TIMEOUT
+        """
+        sheet, paths = self._cached(user_id, page)
+        if sheet is None or sheet['version'] != version or not paths:
+            return None
+        directory = os.path.join(current_app.config['SPRITE_CACHE_DIR'], str(user_id))
+        path = os.path.join(directory, f'{page}-v{version}.{ext}')
+        if os.path.exists(path):
+            return path
+
+        tile = VARIANTS[SPRITE_VARIANT]
+        data = run_job(sprite_job, paths, tile, SPRITE_COLUMNS, ext)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so a concurrent request never sends a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+        # Only the current library version of a page is kept
+        for stale in glob.glob(os.path.join(directory, f'{page}-v*.*')):
+            if not stale.startswith(os.path.join(directory, f'{page}-v{version}.')):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        return path
+
+    def _cached(self, user_id: int, page: int) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        A page's layout and the thumbnail paths of its tiles, in tile order.
+        They are cached together so the image is always built from the same
+        tiles the layout points into
+        """
+        version = StatsService(self.db).get_user_stats(user_id).library_version
+        cached = _sheet_cache.get((user_id, page), version)
+        if cached is None:
+            cached = self._layout(user_id, page, version)
+            _sheet_cache.set((user_id, page), version, cached)
+        return cached
+
+    def _layout(self, user_id: int, page: int, version: int) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        total = self.db.execute(select(func.count(Book.id)).where(Book.user_id == user_id)).scalar()
+        pages = max(1, -(-total // SPRITE_PAGE_SIZE))
+        if not 1 <= page <= pages:
+            return None, []
+        width, height = VARIANTS[SPRITE_VARIANT]
+        tiles = self._tiles(user_id, page)
+        offsets = {
+            uid: {'x': (index % SPRITE_COLUMNS) * width, 'y': (index // SPRITE_COLUMNS) * height}
+            for index, (uid, _) in enumerate(tiles)
+        }
+        return {
+            'page': page,
+            'pages': pages,
+            'version': version,
+            'tile': {'width': width, 'height': height},
+            'columns': SPRITE_COLUMNS,
+            'offsets': offsets,
+        }, [path for _, path in tiles]
+
+    def _tiles(self, user_id: int, page: int) -> List[Tuple[str, str]]:
+        """(book uid, stored thumbnail path) of the page's books with a locally stored cover"""
+        rows = self.db.execute(
+            select(Book.uid, Book.cover_digest)
+            .where(Book.user_id == user_id)
+            .order_by(Book.id)
+            .offset((page - 1) * SPRITE_PAGE_SIZE)
+            .limit(SPRITE_PAGE_SIZE)
+        ).all()
+        tiles = []
+        for uid, digest in rows:
+            path = stored_variant_path(digest, SPRITE_VARIANT) if digest else None
+            if path:
+                tiles.append((uid, path))
+        return tiles
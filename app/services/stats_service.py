@@ -0,0 +1,310 @@
+"""
+StatsService - Materialized per-user reading statistics
+Counters live in the user_stats table and are maintained from SQLAlchemy
+flush events, so every write path updates them in the same transaction
+"""
+
+from typing import Optional, Dict, Any
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import event, func, case, select, and_, or_, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from ..models import Book, ReadingLog, User, UserStats, db
+
+
+COUNTER_FIELDS = (
+    'total_books', 'finished_books', 'currently_reading', 'want_to_read',
+    'library_only', 'total_pages_read', 'reading_log_count'
+)
+
+# Attributes whose previous value is needed to compute exact deltas
+TRACKED_ATTRIBUTES = (
+    Book.user_id, Book.finish_date, Book.want_to_read, Book.library_only,
+    ReadingLog.user_id, ReadingLog.pages_read
+)
+
+_PENDING_KEY = 'user_stats_pending'
+
+
+def period_keys(finish_date) -> tuple:
+    """Return the ('YYYY', 'YYYY-MM') period keys a finish date counts towards"""
+    return (f"{finish_date.year:04d}", f"{finish_date.year:04d}-{finish_date.month:02d}")
+
+
+def previous_value(obj, attribute: str):
+    """Return the value an attribute had in the database before this flush"""
+    history = sa_inspect(obj).attrs[attribute].history
+    if history.added or history.deleted:
+        return history.deleted[0] if history.deleted else None
+    return getattr(obj, attribute)
+
+
+class StatsDelta:
+    """Counter changes for one user accumulated during a flush"""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.periods = defaultdict(int)
+
+    def add_book(self, finish_date, want_to_read, library_only, sign: int) -> None:
+        self.counters['total_books'] += sign
+        if finish_date:
+            self.counters['finished_books'] += sign
+            for key in period_keys(finish_date):
+                self.periods[key] += sign
+        elif not want_to_read and not library_only:
+            self.counters['currently_reading'] += sign
+        if want_to_read:
+            self.counters['want_to_read'] += sign
+        if library_only:
+            self.counters['library_only'] += sign
+
+    def add_log(self, pages_read, sign: int) -> None:
+        self.counters['reading_log_count'] += sign
+        self.counters['total_pages_read'] += sign * (pages_read or 0)
+
+
+def compute_user_stats(connection, user_id: int) -> Dict[str, Any]:
+    """Compute a user's statistics from scratch using aggregate queries"""
+    book = Book.__table__
+    log = ReadingLog.__table__
+
+    not_want_to_read = or_(book.c.want_to_read.is_(None), book.c.want_to_read == False)
+    not_library_only = or_(book.c.library_only.is_(None), book.c.library_only == False)
+
+    counts = connection.execute(
+        select(
+            func.count(book.c.id),
+            func.sum(case((book.c.finish_date.isnot(None), 1), else_=0)),
+            func.sum(case((and_(book.c.finish_date.is_(None), not_want_to_read, not_library_only), 1), else_=0)),
+            func.sum(case((book.c.want_to_read == True, 1), else_=0)),
+            func.sum(case((book.c.library_only == True, 1), else_=0))
+        ).where(book.c.user_id == user_id)
+    ).first()
+
+    log_counts = connection.execute(
+        select(func.count(log.c.id), func.sum(log.c.pages_read)).where(log.c.user_id == user_id)
+    ).first()
+
+    periods = defaultdict(int)
+    finish_dates = connection.execute(
+        select(book.c.finish_date).where(book.c.user_id == user_id, book.c.finish_date.isnot(None))
+    ).scalars()
+    for finish_date in finish_dates:
+        for key in period_keys(finish_date):
+            periods[key] += 1
+
+    return {
+        'total_books': counts[0] or 0,
+        'finished_books': counts[1] or 0,
+        'currently_reading': counts[2] or 0,
+        'want_to_read': counts[3] or 0,
+        'library_only': counts[4] or 0,
+        'reading_log_count': log_counts[0] or 0,
+        'total_pages_read': log_counts[1] or 0,
+        'finished_by_period': dict(periods)
+    }
+
+
+def bump_library_versions(connection, user_ids) -> None:
+    """Mark users' libraries as changed by a write that bypasses the ORM (e.g. a bulk cover update)"""
+    if user_ids:
+        table = UserStats.__table__
+        now = datetime.now(timezone.utc)
+        user_ids = set(user_ids)
+        connection.execute(table.update().where(table.c.user_id.in_(user_ids)).values(
+            library_version=table.c.library_version + 1, updated_at=now))
+        existing = connection.execute(select(table.c.user_id).where(table.c.user_id.in_(user_ids))).scalars()
+        for user_id in user_ids - set(existing):
+            _insert_user_stats(connection, user_id, now)
+
+
+def _insert_user_stats(connection, user_id: int, now: datetime) -> None:
+    """
+    Create a user's statistics row from their current data. Rows are only
+    created by writes; reads of a user without one compute it on the fly
+    at library_version 0, so the first stored version is 1
+    """
+    values = compute_user_stats(connection, user_id)
+    connection.execute(UserStats.__table__.insert().values(
+        user_id=user_id, library_version=1, last_activity_at=now, updated_at=now, **values))
+
+
+def _collect_deltas(session, flush_context, instances):
+    """before_flush: record how pending changes move each user's counters"""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+
+    def delta_for(user_id):
+        if user_id is None:
+            return StatsDelta()  # Orphaned row; nothing to attribute it to
+        return pending.setdefault(user_id, StatsDelta())
+
+    for obj in session.new:
+        if isinstance(obj, Book):
+            delta_for(obj.user_id).add_book(obj.finish_date, obj.want_to_read, obj.library_only, 1)
+        elif isinstance(obj, ReadingLog):
+            delta_for(obj.user_id).add_log(obj.pages_read, 1)
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Book):
+            delta_for(previous_value(obj, 'user_id')).add_book(
+                previous_value(obj, 'finish_date'), previous_value(obj, 'want_to_read'),
+                previous_value(obj, 'library_only'), -1)
+            delta_for(obj.user_id).add_book(obj.finish_date, obj.want_to_read, obj.library_only, 1)
+        elif isinstance(obj, ReadingLog):
+            delta_for(previous_value(obj, 'user_id')).add_log(previous_value(obj, 'pages_read'), -1)
+            delta_for(obj.user_id).add_log(obj.pages_read, 1)
+
+    deleted_users = []
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            delta_for(previous_value(obj, 'user_id')).add_book(
+                previous_value(obj, 'finish_date'), previous_value(obj, 'want_to_read'),
+                previous_value(obj, 'library_only'), -1)
+        elif isinstance(obj, ReadingLog):
+            delta_for(previous_value(obj, 'user_id')).add_log(previous_value(obj, 'pages_read'), -1)
+        elif isinstance(obj, User):
+            deleted_users.append(obj.id)
+
+    if deleted_users:
+        # Remove derived rows before the user row itself goes away
+        table = UserStats.__table__
+        session.connection().execute(table.delete().where(table.c.user_id.in_(deleted_users)))
+        for user_id in deleted_users:
+            pending.pop(user_id, None)
+
+
+def _apply_deltas(session, flush_context):
+    """after_flush: write accumulated deltas to user_stats in the same transaction"""
+    pending = session.info.pop(_PENDING_KEY, None) or {}
+    # New users start with an empty row, so their reads are a primary-key lookup too
+    for obj in session.new:
+        if isinstance(obj, User) and obj.id is not None:
+            pending.setdefault(obj.id, StatsDelta())
+    if not pending:
+        return
+
+    table = UserStats.__table__
+    connection = session.connection()
+    now = datetime.now(timezone.utc)
+
+    for user_id, delta in pending.items():
+        row = connection.execute(
+            select(table.c.finished_by_period).where(table.c.user_id == user_id).with_for_update()
+        ).first()
+
+        if row is None:
+            # First write for this user since the table was introduced: the flush
+            # has already happened, so a full computation includes this change
+            _insert_user_stats(connection, user_id, now)
+            continue
+
+        if not any(delta.counters.values()) and not any(delta.periods.values()):
+            # Touched but unchanged (e.g. a title edit) still counts as activity
+            connection.execute(table.update().where(table.c.user_id == user_id).values(
+                library_version=table.c.library_version + 1, last_activity_at=now, updated_at=now))
+            continue
+
+        periods = dict(row.finished_by_period or {})
+        for key, change in delta.periods.items():
+            count = periods.get(key, 0) + change
+            if count > 0:
+                periods[key] = count
+            else:
+                periods.pop(key, None)
+
+        values = {field: table.c[field] + change for field, change in delta.counters.items() if change}
+        connection.execute(table.update().where(table.c.user_id == user_id).values(
+            finished_by_period=periods, library_version=table.c.library_version + 1,
+            last_activity_at=now, updated_at=now, **values))
+
+
+def _discard_deltas(session, previous_transaction):
+    """Drop deltas collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    """No-op set listener; registering it with active_history loads the old value"""
+    return value
+
+
+def register_listeners() -> None:
+    """Hook statistics maintenance into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_deltas):
+        return
+    for attribute in TRACKED_ATTRIBUTES:
+        event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_deltas)
+    event.listen(Session, 'after_flush', _apply_deltas)
+    event.listen(Session, 'after_soft_rollback', _discard_deltas)
+
+
+class StatsService:
+    """Service class for materialized user statistics"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_user_stats(self, user_id: int) -> UserStats:
+        """
+        Get a user's materialized statistics with a single primary-key read
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            UserStats row. Users without one yet (data from before the table
+            existed) get an unsaved one computed from their data; the row is
+            stored by their next library write
+        """
+        stats = self.db.get(UserStats, user_id, populate_existing=True)
+        if stats is None:
+            stats = UserStats(user_id=user_id, library_version=0,
+                              **compute_user_stats(self.db.connection(), user_id))
+        return stats
+
+    def rebuild_user_stats(self, user_id: int) -> UserStats:
+        """
+        Recompute a user's statistics from their books and reading logs
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            The rebuilt UserStats row (not committed)
+        """
+        values = compute_user_stats(self.db.connection(), user_id)
+        stats = self.db.get(UserStats, user_id)
+        if stats is None:
+            stats = UserStats(user_id=user_id)
+            self.db.add(stats)
+        for field, value in values.items():
+            setattr(stats, field, value)
+        stats.library_version = (stats.library_version or 0) + 1
+        if stats.last_activity_at is None:
+            stats.last_activity_at = datetime.now(timezone.utc)
+        return stats
+
+    def rebuild_all(self) -> int:
+        """
+        Recompute statistics for every user (repairs any drift)
+
+        Returns:
+            Number of users rebuilt
+        """
+        user_ids = [user_id for (user_id,) in self.db.query(User.id).all()]
+        for user_id in user_ids:
+            self.rebuild_user_stats(user_id)
+        self.db.commit()
+        return len(user_ids)
+
+    @staticmethod
+    def finished_in(stats: UserStats, year: int, month: Optional[int] = None) -> int:
+        """Number of books finished in a year, or in one month of that year"""
+        key = f"{year:04d}" if month is None else f"{year:04d}-{month:02d}"
+        return (stats.finished_by_period or {}).get(key, 0)
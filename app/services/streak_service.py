@@ -0,0 +1,253 @@
+"""
+StreakService - Incremental reading-streak engine
+Streak state is persisted per user in reading_streak and advanced in O(1)
+from flush events as reading days become active or inactive
+"""
+
+from typing import Optional, Dict, Any
+from collections import defaultdict
+from datetime import datetime, date, timedelta, timezone
+
+import pytz
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..models import ReadingLog, ReadingStreak, User, db
+from .stats_service import previous_value, _load_previous_value
+
+
+ONE_DAY = timedelta(days=1)
+
+_PENDING_KEY = 'reading_streak_pending'
+
+
+def configured_today() -> date:
+    """Today's date in the configured application timezone"""
+    tz = pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
+    return datetime.now(tz).date()
+
+
+def day_is_active(connection, user_id: int, day: date) -> bool:
+    """Whether the user has at least one reading log on a day (indexed point lookup)"""
+    log = ReadingLog.__table__
+    return connection.execute(
+        select(log.c.id).where(log.c.user_id == user_id, log.c.date == day).limit(1)
+    ).first() is not None
+
+
+def compute_streak_state(connection, user_id: int) -> Dict[str, Any]:
+    """Full recompute of a user's streak state by walking their distinct reading days"""
+    log = ReadingLog.__table__
+    days = connection.execute(
+        select(log.c.date).where(log.c.user_id == user_id, log.c.date.isnot(None))
+        .distinct().order_by(log.c.date)
+    ).scalars()
+
+    previous = None
+    run = longest = 0
+    for day in days:
+        run = run + 1 if previous is not None and day == previous + ONE_DAY else 1
+        longest = max(longest, run)
+        previous = day
+    return {'last_log_date': previous, 'current_run': run, 'longest_run': longest}
+
+
+def advance_streak(state: Dict[str, Any], day: date, active: bool, is_active) -> Optional[Dict[str, Any]]:
+    """
+    Apply one reading day becoming active or inactive to a streak state
+
+    Args:
+        state: Current state (last_log_date, current_run, longest_run)
+        day: The day whose status changed
+        active: True if the day gained its first log, False if it lost its last
+        is_active: Callback answering whether another day is active
+
+    Returns:
+        The new state, or None when the change needs a full recompute
+        (edits deep in history that could merge or split older runs)
+    """
+    last, run, longest = state['last_log_date'], state['current_run'], state['longest_run']
+
+    if active:
+        if last is None:
+            return {'last_log_date': day, 'current_run': 1, 'longest_run': max(longest, 1)}
+        if day > last:
+            run = run + 1 if day == last + ONE_DAY else 1
+            return {'last_log_date': day, 'current_run': run, 'longest_run': max(longest, run)}
+        run_start = last - timedelta(days=run - 1)
+        if day == run_start - ONE_DAY and not is_active(day - ONE_DAY):
+            run += 1
+            return {'last_log_date': last, 'current_run': run, 'longest_run': max(longest, run)}
+        return None
+
+    if last is None or run <= 1 or run == longest:
+        # Either the previous reading day is unknown or the longest run may shrink
+        return None
+    run_start = last - timedelta(days=run - 1)
+    if day == last:
+        return {'last_log_date': last - ONE_DAY, 'current_run': run - 1, 'longest_run': longest}
+    if day == run_start:
+        return {'last_log_date': last, 'current_run': run - 1, 'longest_run': longest}
+    return None
+
+
+def _collect_days(session, flush_context, instances):
+    """before_flush: remember whether each affected reading day was active"""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    connection = session.connection()
+
+    def track(user_id, day):
+        if user_id is None or day is None or (user_id, day) in pending:
+            return
+        pending[(user_id, day)] = day_is_active(connection, user_id, day)
+
+    for obj in session.new:
+        if isinstance(obj, ReadingLog):
+            track(obj.user_id, obj.date)
+
+    for obj in session.dirty:
+        if isinstance(obj, ReadingLog) and session.is_modified(obj, include_collections=False):
+            track(previous_value(obj, 'user_id'), previous_value(obj, 'date'))
+            track(obj.user_id, obj.date)
+
+    deleted_users = []
+    for obj in session.deleted:
+        if isinstance(obj, ReadingLog):
+            track(previous_value(obj, 'user_id'), previous_value(obj, 'date'))
+        elif isinstance(obj, User):
+            deleted_users.append(obj.id)
+
+    if deleted_users:
+        table = ReadingStreak.__table__
+        connection.execute(table.delete().where(table.c.user_id.in_(deleted_users)))
+        for key in [key for key in pending if key[0] in deleted_users]:
+            pending.pop(key)
+
+
+def _apply_days(session, flush_context):
+    """after_flush: advance streak state for days that flipped active/inactive"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    connection = session.connection()
+    transitions = defaultdict(list)
+    for (user_id, day), was_active in pending.items():
+        now_active = day_is_active(connection, user_id, day)
+        if now_active != was_active:
+            transitions[user_id].append((day, now_active))
+
+    table = ReadingStreak.__table__
+    now = datetime.now(timezone.utc)
+    for user_id, changes in transitions.items():
+        row = connection.execute(
+            select(table.c.last_log_date, table.c.current_run, table.c.longest_run)
+            .where(table.c.user_id == user_id).with_for_update()
+        ).mappings().first()
+
+        state = dict(row) if row is not None else None
+        for day, active in sorted(changes):
+            if state is None:
+                break
+            state = advance_streak(state, day, active,
+                                   lambda other: day_is_active(connection, user_id, other))
+        if state is None:
+            state = compute_streak_state(connection, user_id)
+
+        if row is None:
+            connection.execute(table.insert().values(user_id=user_id, updated_at=now, **state))
+        else:
+            connection.execute(table.update().where(table.c.user_id == user_id)
+                               .values(updated_at=now, **state))
+
+
+def _discard_days(session, previous_transaction):
+    """Drop day snapshots collected for a flush that was rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """Hook streak maintenance into every SQLAlchemy session flush"""
+    if event.contains(Session, 'before_flush', _collect_days):
+        return
+    event.listen(ReadingLog.date, 'set', _load_previous_value, active_history=True, retval=True)
+    event.listen(Session, 'before_flush', _collect_days)
+    event.listen(Session, 'after_flush', _apply_days)
+    event.listen(Session, 'after_soft_rollback', _discard_days)
+
+
+class StreakService:
+    """Service class for persisted reading streaks"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_streak_state(self, user_id: int) -> ReadingStreak:
+        """
+        Get a user's persisted streak state with a single primary-key read
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            ReadingStreak row. Users without one yet get an unsaved one computed
+            from their reading days; the row is stored when a reading day changes
+        """
+        streak = self.db.get(ReadingStreak, user_id, populate_existing=True)
+        if streak is None:
+            streak = ReadingStreak(user_id=user_id, **compute_streak_state(self.db.connection(), user_id))
+        return streak
+
+    def get_current_streak(self, user_id: int, streak_offset: int = 0, today: Optional[date] = None) -> int:
+        """
+        Get a user's current reading streak
+
+        A run counts as current while its last reading day is today or
+        yesterday in the configured timezone, allowing for late logging.
+
+        Args:
+            user_id: User ID
+            streak_offset: The user's personal streak offset
+            today: Override for the configured "today"
+
+        Returns:
+            Current streak length including the offset
+        """
+        streak = self.get_streak_state(user_id)
+        today = today or configured_today()
+        if streak.last_log_date is None or (today - streak.last_log_date).days > 1:
+            return streak_offset or 0
+        return streak.current_run + (streak_offset or 0)
+
+    def rebuild_user_streak(self, user_id: int) -> ReadingStreak:
+        """
+        Recompute a user's streak state from all of their reading days
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            The rebuilt ReadingStreak row (not committed)
+        """
+        state = compute_streak_state(self.db.connection(), user_id)
+        streak = self.db.get(ReadingStreak, user_id)
+        if streak is None:
+            streak = ReadingStreak(user_id=user_id)
+            self.db.add(streak)
+        for field, value in state.items():
+            setattr(streak, field, value)
+        return streak
+
+    def rebuild_all(self) -> int:
+        """
+        Recompute streak state for every user (repairs any drift)
+
+        Returns:
+            Number of users rebuilt
+        """
+        user_ids = [user_id for (user_id,) in self.db.query(User.id).all()]
+        for user_id in user_ids:
+            self.rebuild_user_streak(user_id)
+        self.db.commit()
+        return len(user_ids)
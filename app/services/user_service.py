@@ -4,12 +4,21 @@ Extracted from Flask routes to enable API-first architecture
 """
 
 from typing import Optional, Dict, List, Any
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, and_
 
 from ..models import User, Book, ReadingLog, SystemSettings, db
-from ..utils import calculate_reading_streak
+from .stats_service import StatsService
+from .streak_service import StreakService, configured_today
+from .rollup_service import RollupService
+from .activity_service import ActivityService, feed_books, STARTED, FINISHED, LOGGED
+from .community_service import CommunityService, SNAPSHOT_PAGE_SIZE
+from .profile_service import ProfileService
+
+
+LEADERBOARD_WINDOWS = ('week', 'month', 'year')
+MAX_LEADERBOARD_PAGE_SIZE = 100
 
 
 class UserNotFoundError(Exception):
@@ -171,17 +180,13 @@ class UserService:
         if not user:
             raise UserNotFoundError(f"User with ID {user_id} not found")
         
-        # Get all books
-        all_books = Book.query.filter_by(user_id=user_id).all()
-        
-        # Calculate statistics
-        total_books = len(all_books)
-        finished_books = len([b for b in all_books if b.finish_date])
-        currently_reading = len([b for b in all_books if not b.finish_date and not b.want_to_read and not b.library_only])
-        want_to_read = len([b for b in all_books if b.want_to_read])
+        # Get materialized counters
+        stats = StatsService(self.db).get_user_stats(user_id)
         
-        # Get reading streak
-        reading_streak = calculate_reading_streak(user_id, user.reading_streak_offset)
+        # Get persisted reading streak
+        streaks = StreakService(self.db)
+        reading_streak = streaks.get_current_streak(user_id, user.reading_streak_offset)
+        longest_streak = streaks.get_streak_state(user_id).longest_run
         
         # Get recent activity
         recent_logs = ReadingLog.query.filter_by(user_id=user_id)\
@@ -189,161 +194,181 @@ class UserService:
             .limit(10)\
             .all()
         
-        # Get monthly reading data
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_pages = ReadingLog.query.filter_by(user_id=user_id)\
-            .filter(func.extract('month', ReadingLog.date) == current_month)\
-            .filter(func.extract('year', ReadingLog.date) == current_year)\
-            .with_entities(func.sum(ReadingLog.pages_read))\
-            .scalar() or 0
+        # Get monthly reading data from the daily rollup
+        month_start = configured_today().replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        monthly_pages, _ = RollupService(self.db).get_period_totals(user_id, month_start, month_end)
         
         return {
-            'total_books': total_books,
-            'finished_books': finished_books,
-            'currently_reading': currently_reading,
-            'want_to_read': want_to_read,
+            'total_books': stats.total_books,
+            'finished_books': stats.finished_books,
+            'currently_reading': stats.currently_reading,
+            'want_to_read': stats.want_to_read,
+            'library_only': stats.library_only,
+            'total_pages_read': stats.total_pages_read,
             'reading_streak': reading_streak,
+            'longest_reading_streak': longest_streak,
             'monthly_pages': monthly_pages,
             'recent_activity': [log.to_dict() for log in recent_logs]
         }
     
     def get_community_activity(self) -> Dict[str, Any]:
         """
-        Get community-wide activity statistics
+        Get community-wide activity statistics from the shared snapshot
         
         Returns:
             Dictionary with community statistics
         """
-        # Get active readers (users with reading activity in last 30 days)
-        thirty_days_ago = date.today() - timedelta(days=30)
-        active_readers = ReadingLog.query.filter(ReadingLog.date >= thirty_days_ago)\
-            .with_entities(ReadingLog.user_id)\
-            .distinct()\
-            .count()
-        
-        # Get books finished this month
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        books_this_month = Book.query.filter(
-            func.extract('month', Book.finish_date) == current_month,
-            func.extract('year', Book.finish_date) == current_year
-        ).count()
-        
-        # Get currently reading books
-        currently_reading = Book.query.filter(
-            Book.finish_date.is_(None),
-            Book.want_to_read == False,
-            Book.library_only == False
-        ).count()
+        snapshot = CommunityService(self.db).get_snapshot()
+        return {
+            'active_readers': snapshot['active_readers'],
+            'books_this_month': snapshot['books_this_month'],
+            'currently_reading': snapshot['currently_reading'],
+            'recent_activity': snapshot['recent_activity_page']['events']
+        }
+
+    def get_leaderboard(self, window: str = 'month', page: int = 1,
+                        per_page: int = 50) -> Dict[str, Any]:
+        """
+        Rank readers who share their activity with one grouped aggregate query
         
-        # Get recent activity
-        recent_activity = ReadingLog.query\
-            .order_by(desc(ReadingLog.date))\
-            .limit(20)\
+        Args:
+            window: Ranking window - 'week', 'month' or 'year'
+            page: Page number (1-based)
+            per_page: Entries per page
+            
+        Returns:
+            Dictionary with 'entries' (User objects with rank, books finished in
+            the window, this month and ever, currently reading and total books)
+            and pagination info
+        """
+        if window not in LEADERBOARD_WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        page = max(page, 1)
+        per_page = max(1, min(per_page, MAX_LEADERBOARD_PAGE_SIZE))
+        
+        today = configured_today()
+        month_start = today.replace(day=1)
+        window_start = {
+            'week': today - timedelta(days=today.weekday()),
+            'month': month_start,
+            'year': today.replace(month=1, day=1)
+        }[window]
+        
+        def finished_since(start):
+            # Finish dates in the future do not count until they arrive
+            return func.coalesce(func.sum(case((Book.finish_date.between(start, today), 1), else_=0)), 0)
+        
+        books_finished = finished_since(window_start).label('books_finished')
+        books_this_month = finished_since(month_start).label('books_this_month')
+        books_read = func.count(Book.finish_date).label('books_read')
+        currently_reading = func.coalesce(func.sum(case((and_(
+            Book.id.isnot(None),
+            Book.finish_date.is_(None),
+            Book.want_to_read.isnot(True),
+            Book.library_only.isnot(True)
+        ), 1), else_=0)), 0).label('currently_reading')
+        total_books = func.count(Book.id).label('total_books')
+        
+        sharing = and_(User.share_reading_activity == True, User.is_active == True)
+        total = User.query.filter(sharing).count()
+        
+        rows = self.db.query(User, books_finished, books_this_month, books_read, currently_reading, total_books)\
+            .outerjoin(Book, Book.user_id == User.id)\
+            .filter(sharing)\
+            .group_by(User.id)\
+            .order_by(desc(books_finished + currently_reading), User.id)\
+            .offset((page - 1) * per_page)\
+            .limit(per_page)\
             .all()
         
+        entries = [{
+            'rank': (page - 1) * per_page + index + 1,
+            'user': user,
+            'books_finished': finished,
+            'books_this_month': this_month,
+            'books_read': read,
+            'currently_reading': reading,
+            'total_books': books
+        } for index, (user, finished, this_month, read, reading, books) in enumerate(rows)]
+        
         return {
-            'active_readers': active_readers,
-            'books_this_month': books_this_month,
-            'currently_reading': currently_reading,
-            'recent_activity': [log.to_dict() for log in recent_activity]
+            'entries': entries,
+            'window': window,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
         }
 
-    def get_active_readers(self) -> List[Dict[str, Any]]:
+    def get_active_readers(self, window: str = 'month', page: int = 1,
+                           per_page: int = 50) -> List[Dict[str, Any]]:
         """
         Get active readers with their statistics
         
+        Args:
+            window: Ranking window - 'week', 'month' or 'year'
+            page: Page number (1-based)
+            per_page: Entries per page
+        
         Returns:
             List of active readers with stats
         """
-        # Get users who share their reading activity
-        sharing_users = User.query.filter_by(share_reading_activity=True, is_active=True).all()
-        
-        user_stats = []
-        for user in sharing_users:
-            # Get books this month
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            books_this_month = Book.query.filter(
-                Book.user_id == user.id,
-                func.extract('month', Book.finish_date) == current_month,
-                func.extract('year', Book.finish_date) == current_year
-            ).count()
-            
-            # Get total books
-            total_books = Book.query.filter_by(user_id=user.id).count()
-            
-            # Get currently reading
-            currently_reading = Book.query.filter(
-                Book.user_id == user.id,
-                Book.finish_date.is_(None),
-                Book.want_to_read == False,
-                Book.library_only == False
-            ).count()
-            
-            user_stats.append({
-                'user': user.to_dict(),
-                'books_this_month': books_this_month,
-                'total_books': total_books,
-                'currently_reading': currently_reading
-            })
-        
-        # Sort by activity (books this month + currently reading)
-        user_stats.sort(key=lambda x: x['books_this_month'] + x['currently_reading'], reverse=True)
-        
-        return user_stats
+        leaderboard = self.get_leaderboard(window, page, per_page)
+        return [dict(entry, user=entry['user'].to_dict()) for entry in leaderboard['entries']]
 
-    def get_books_this_month(self) -> List[Dict[str, Any]]:
+    def get_books_this_month(self, before: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
         """
         Get books finished this month by community members
         
+        Args:
+            before: Feed cursor from a previous page
+            limit: Page size
+        
         Returns:
-            List of books with user information
+            Dictionary with 'books' (with user information) and 'next_cursor'
         """
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        books = Book.query.join(User).filter(
-            func.extract('month', Book.finish_date) == current_month,
-            func.extract('year', Book.finish_date) == current_year,
-            User.share_reading_activity == True,
-            User.is_active == True
-        ).all()
-        
-        return [book.to_dict() for book in books]
+        if before is None and limit == SNAPSHOT_PAGE_SIZE:
+            return CommunityService(self.db).get_snapshot()['books_this_month_page']
+        page = ActivityService(self.db).get_feed(
+            [FINISHED], before=before, limit=limit, since=configured_today().replace(day=1)
+        )
+        return {'books': feed_books(page['events']), 'next_cursor': page['next_cursor']}
 
-    def get_currently_reading(self) -> List[Dict[str, Any]]:
+    def get_currently_reading(self, before: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
         """
         Get books currently being read by community members
         
+        Args:
+            before: Feed cursor from a previous page
+            limit: Page size
+        
         Returns:
-            List of books with user information
+            Dictionary with 'books' (with user information) and 'next_cursor'
         """
-        books = Book.query.join(User).filter(
-            Book.finish_date.is_(None),
-            Book.want_to_read == False,
-            Book.library_only == False,
-            User.share_reading_activity == True,
-            User.is_active == True
-        ).all()
-        
-        return [book.to_dict() for book in books]
+        if before is None and limit == SNAPSHOT_PAGE_SIZE:
+            return CommunityService(self.db).get_snapshot()['currently_reading_page']
+        page = ActivityService(self.db).get_feed([STARTED], before=before, limit=limit, still_reading=True)
+        return {'books': feed_books(page['events']), 'next_cursor': page['next_cursor']}
 
-    def get_recent_activity(self) -> List[Dict[str, Any]]:
+    def get_recent_activity(self, before: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
         """
         Get recent reading activity from community members
         
+        Args:
+            before: Feed cursor from a previous page
+            limit: Page size
+        
         Returns:
-            List of reading logs with user and book information
+            Dictionary with 'events' (with user and book information) and 'next_cursor'
         """
-        logs = ReadingLog.query.join(User).join(Book).filter(
-            User.share_reading_activity == True,
-            User.is_active == True
-        ).order_by(desc(ReadingLog.date)).limit(20).all()
-        
-        return [log.to_dict() for log in logs]
+        if before is None and limit == SNAPSHOT_PAGE_SIZE:
+            return CommunityService(self.db).get_snapshot()['recent_activity_page']
+        page = ActivityService(self.db).get_feed([LOGGED], before=before, limit=limit)
+        return {
+            'events': [event.to_dict() for event in page['events']],
+            'next_cursor': page['next_cursor']
+        }
 
     def get_user_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -355,40 +380,7 @@ class UserService:
         Returns:
             User profile data or None if not found/sharing
         """
-        user = User.query.filter_by(id=user_id, is_active=True).first()
-        
-        if not user or not user.share_reading_activity:
-            return None
-        
-        # Get user statistics
-        total_books = Book.query.filter_by(user_id=user.id).count()
-        currently_reading = Book.query.filter(
-            Book.user_id == user.id,
-            Book.finish_date.is_(None),
-            Book.want_to_read == False,
-            Book.library_only == False
-        ).count()
-        finished_books = Book.query.filter(
-            Book.user_id == user.id,
-            Book.finish_date.is_not(None)
-        ).count()
-        want_to_read = Book.query.filter_by(user_id=user.id, want_to_read=True).count()
-        
-        # Get reading streak
-        reading_streak = user.get_reading_streak()
-        
-        # Get user's books
-        books = Book.query.filter_by(user_id=user.id).all()
-        
-        return {
-            **user.to_dict(),
-            'total_books': total_books,
-            'currently_reading': currently_reading,
-            'finished_books': finished_books,
-            'want_to_read': want_to_read,
-            'reading_streak': reading_streak,
-            'books': [book.to_dict() for book in books]
-        }
+        return ProfileService(self.db).get_summary(user_id)
     
     def get_user_reading_history(self, user_id: int) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,207 @@
+"""
+WrapupService - Cached month wrap-up and year-in-review images
+A rendered collage page depends only on its finished books (in order), their
+covers, the layout and the artwork, so it is rendered once in the image pool
+and stored on disk under a hash of exactly those inputs. Repeat views and
+shares are a file send, and the hash doubles as the ETag. Finishing another
+book or mirroring a cover changes the hash and replaces the user's cached page.
+"""
+
+from typing import Optional, Tuple, Union, Dict, Any
+from datetime import date
+from io import BytesIO
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import Book
+from ..utils import (
+    collage_job, collage_layout, collage_sources, month_review_title, year_review_title,
+    COLLAGE_TEMPLATE_VERSION, DEFAULT_COVER_FETCH_DEADLINE, MONTH_COVER_WIDTHS, YEAR_COVER_WIDTHS
+)
+from .image_jobs import submit_job, wait_job, job_status, forget_job, JobTimeout
+
+
+class RenderFailed(Exception):
+    """Raised when rendering a collage page fails; the next request renders it again"""
+    pass
+
+
+def wrapup_key(user_id: int, name: str, layout, books) -> str:
+    """Hash of everything a collage page render depends on"""
+    inputs = {
+        'template': COLLAGE_TEMPLATE_VERSION,
+        'user': user_id,
+        'page': name,
+        'layout': list(layout),
+        # A mirrored cover is versioned by its content digest; otherwise by its URL
+        'books': [[book.id, book.cover_digest or book.cover_url] for book in books],
+    }
+    return hashlib.sha256(json.dumps(inputs, separators=(',', ':')).encode()).hexdigest()
+
+
+class CollagePage:
+    """One page of a user's month or year collage and where its render is cached"""
+
+    def __init__(self, user_id: int, name: str, title: str, layout, books):
+        self.name = name
+        self.title = title
+        self.layout = layout
+        self.books = books
+        self.key = wrapup_key(user_id, name, layout, books)
+        self.path = os.path.join(current_app.config['WRAPUP_CACHE_DIR'], str(user_id), f'{name}-{self.key}.jpg')
+
+
+class WrapupService:
+    """Service class for rendering and caching month wrap-up and year-in-review images"""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def finished_books(self, user_id: int, start: date, end: date) -> list:
+        """Books the user finished in [start, end), in finishing order (only the columns a render needs)"""
+        return self.db.execute(
+            select(Book.id, Book.cover_url, Book.cover_digest)
+            .where(Book.user_id == user_id, Book.finish_date >= start, Book.finish_date < end)
+            .order_by(Book.finish_date, Book.id)
+        ).all()
+
+    def month_page(self, user_id: int, year: int, month: int) -> Optional[CollagePage]:
+        """The month wrap-up, or None if no books were finished that month"""
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        books = self.finished_books(user_id, date(year, month, 1), end)
+        if not books:
+            return None
+        layout = collage_layout(len(books), *MONTH_COVER_WIDTHS)
+        # Months with more books than fit at the smallest cover size show the first page
+        return CollagePage(user_id, f'{year}-{month:02d}', month_review_title(month, year), layout,
+                           books[:layout.per_page])
+
+    def year_page(self, user_id: int, year: int, page: int = 1) -> Optional[CollagePage]:
+        """A page of the year in review, or None if there is no such page"""
+        books = self.finished_books(user_id, date(year, 1, 1), date(year + 1, 1, 1))
+        layout = collage_layout(len(books), *YEAR_COVER_WIDTHS)
+        if not books or not 1 <= page <= layout.pages:
+            return None
+        first = (page - 1) * layout.per_page
+        return CollagePage(user_id, f'{year}-p{page}', year_review_title(year, page, layout.pages), layout,
+                           books[first:first + layout.per_page])
+
+    def year_summary(self, user_id: int, year: int) -> Dict[str, Any]:
+        """Number of books finished in the year and pages of its year in review"""
+        books = self.finished_books(user_id, date(year, 1, 1), date(year + 1, 1, 1))
+        return {'books': len(books), 'pages': collage_layout(len(books), *YEAR_COVER_WIDTHS).pages if books else 0}
+
+    def get_month_review(self, user_id: int, year: int, month: int,
+                         timeout: Optional[float] = None) -> Optional[Tuple[Union[str, BytesIO], Optional[str]]]:
+        """
+        Get the user's wrap-up for a month (see get_image)
+
+        Returns:
+            (path or in-memory JPEG, ETag), or None if no books were finished that month
+        """
+        page = self.month_page(user_id, year, month)
+        return self.get_image(page, timeout) if page else None
+
+    def get_year_review(self, user_id: int, year: int, page: int = 1,
+                        timeout: Optional[float] = None) -> Optional[Tuple[Union[str, BytesIO], Optional[str]]]:
+        """
+        Get a page of the user's year in review (see get_image)
+
+        Returns:
+            (path or in-memory JPEG, ETag), or None if there is no such page
+        """
+        collage = self.year_page(user_id, year, page)
+        return self.get_image(collage, timeout) if collage else None
+
+    def get_image(self, page: CollagePage,
+                  timeout: Optional[float] = None) -> Tuple[Union[str, BytesIO], Optional[str]]:
+        """
+        Get a collage page, rendering it in the image pool only if the cached
+        image is missing or out of date
+
+        Returns:
+            (path or in-memory JPEG, ETag). A render with covers that failed to
+            load is not cached and has no ETag, so a later request tries those
+            covers again
+
+        Raises:
+            JobTimeout: If the render takes longer than timeout seconds; it
+                carries on and is cached when done
+            RenderFailed: If the render raised
+        """
+        if os.path.exists(page.path):
+            return page.path, page.key
+
+        job_id = self._start_render(page)
+        try:
+            data, missing = wait_job(job_id, timeout)
+        except JobTimeout:
+            raise
+        except Exception as e:
+            current_app.logger.error(f"Rendering collage {page.name} failed: {e}")
+            raise RenderFailed(str(e)) from e
+        if missing:
+            current_app.logger.info(f"Collage {page.name} rendered with {missing} missing cover(s); not cached")
+            forget_job(job_id)
+            return BytesIO(data), None
+        return BytesIO(data), page.key
+
+    def request_month_review(self, user_id: int, year: int, month: int) -> Optional[Dict[str, Any]]:
+        """
+        Start rendering the user's wrap-up for a month in the background, for
+        clients that poll instead of waiting
+
+        Returns:
+            {'status': 'ready'|'pending'|'failed', 'etag'?}, or None if no books
+            were finished that month
+        """
+        page = self.month_page(user_id, year, month)
+        if page is None:
+            return None
+        if os.path.exists(page.path):
+            return {'status': 'ready', 'etag': page.key}
+        job_id = self._start_render(page)
+        status = job_status(job_id)
+        if status['status'] == 'failed':
+            # Reported once; the next poll renders it again
+            forget_job(job_id)
+        elif status['status'] == 'done':
+            # A render with missing covers is kept by this worker until the image is fetched
+            return {'status': 'ready', 'etag': page.key if os.path.exists(page.path) else None}
+        return {'status': status['status']}
+
+    def _start_render(self, page: CollagePage) -> str:
+        """Submit the render job for a page (once per key in this worker); it caches a complete render"""
+        def store(future):
+            if future.exception() is None:
+                data, missing = future.result()
+                if not missing:
+                    self._store(page, data)
+
+        deadline = current_app.config.get('COVER_FETCH_DEADLINE', DEFAULT_COVER_FETCH_DEADLINE)
+        return submit_job(f'wrapup:{page.key}', collage_job, collage_sources(page.books, page.layout), page.title,
+                          page.layout, deadline, on_done=store)
+
+    @staticmethod
+    def _store(page: CollagePage, data: bytes) -> None:
+        directory = os.path.dirname(page.path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so a concurrent request never sends a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, page.path)
+        # Only the latest render of a page is kept
+        for stale in glob.glob(os.path.join(directory, f'{page.name}-*.jpg')):
+            if stale != page.path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
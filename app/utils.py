@@ -1,14 +1,21 @@
 from datetime import date, timedelta, datetime
 import pytz
-from .models import ReadingLog
+from .models import db
 from sqlalchemy import func
 import calendar
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 import requests
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import NamedTuple
+import logging
 from flask import current_app
 
+logger = logging.getLogger(__name__)
+
 def fetch_book_data(isbn):
     """Fetch book data with timeout and error handling"""
     url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
@@ -109,70 +116,12 @@ def format_date(date):
 
 def calculate_reading_streak(user_id, streak_offset=0):
     """
-    Calculate reading streak for a specific user with foolproof logic
+    Calculate reading streak for a specific user
+    Reads the persisted streak state, which is kept current as logs are
+    written; "today" follows the configured timezone
     """
-    # Get all unique dates with reading logs for this user, sorted descending
-    dates = (
-        ReadingLog.query
-        .filter_by(user_id=user_id)
-        .with_entities(ReadingLog.date)
-        .distinct()
-        .order_by(ReadingLog.date.desc())
-        .all()
-    )
-    
-    if not dates:
-        return streak_offset
-    
-    # Convert to list of date objects
-    log_dates = [d[0] for d in dates if d[0] is not None]
-    
-    if not log_dates:
-        return streak_offset
-    
-    # Sort in descending order (most recent first)
-    log_dates.sort(reverse=True)
-    
-    # Use configured timezone to get "today"
-    from flask import current_app
-    import pytz
-    timezone = pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
-    today = datetime.now(timezone).date()
-    
-    streak = 0
-    
-    # Check if there's a log for today or yesterday
-    # (allow for timezone differences and late logging)
-    most_recent = log_dates[0]
-    days_since_recent = (today - most_recent).days
-    
-    # If the most recent log is more than 1 day old, streak is broken
-    if days_since_recent > 1:
-        return streak_offset
-    
-    # Start counting the streak
-    current_date = most_recent
-    
-    for log_date in log_dates:
-        # If this date continues the streak (same day or previous day)
-        if log_date == current_date:
-            streak += 1
-            current_date = current_date - timedelta(days=1)
-        else:
-            # Check if there's a gap
-            days_gap = (current_date - log_date).days
-            if days_gap == 0:
-                # Same date, skip (already counted)
-                continue
-            elif days_gap == 1:
-                # Previous day, continue streak
-                streak += 1
-                current_date = log_date - timedelta(days=1)
-            else:
-                # Gap found, streak ends
-                break
-    
-    return streak + streak_offset
+    from .services.streak_service import StreakService
+    return StreakService(db.session).get_current_streak(user_id, streak_offset)
 
 def get_reading_streak(timezone=None):
     """
@@ -184,81 +133,288 @@ def get_reading_streak(timezone=None):
         return 0
     return current_user.get_reading_streak()
 
-def generate_month_review_image(books, month, year):
-    import calendar
-    from PIL import Image, ImageDraw, ImageFont
-    from io import BytesIO
-    import requests
-    import os
-
-    img_size = 1080
-    cols = 4
-    cover_w, cover_h = 200, 300
-    padding = 30
-    # Increase title_height to give more space for the text
-    title_height = 220
-    grid_w = cols * cover_w + (cols - 1) * padding
-    rows = ((len(books) - 1) // cols) + 1 if books else 1
-    grid_h = rows * cover_h + (rows - 1) * padding
-    # Move grid lower to avoid overlap
-    grid_top = title_height + 40
-    grid_left = (img_size - grid_w) // 2
-
-    # Try bookshelf background
-    bg_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'bookshelf.png'))
-    print("Looking for bookshelf background at:", bg_path)
-    try:
-        bg = Image.open(bg_path).convert('RGBA').resize((img_size, img_size))
-        print("Bookshelf background loaded!")
-    except Exception as e:
-        print("Failed to load bookshelf background:", e)
-        bg = Image.new('RGBA', (img_size, img_size), (255, 230, 200, 255))
-
-    draw = ImageDraw.Draw(bg)
-
-    # Draw month title in white
-    month_name = f"{calendar.month_name[month].upper()} {year}"
-    max_width = img_size - 80  # 40px margin on each side
-    font_size = 220
-    font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-    if not os.path.exists(font_path):
-        font_path = os.path.join(os.path.dirname(__file__), "static", "Arial.ttf")
-    while font_size > 10:
+COVER_FETCH_WORKERS = 8
+DEFAULT_COVER_FETCH_DEADLINE = 8.0
+
+# Shared by all requests in this process so concurrent wrap-ups cannot open
+# an unbounded number of upstream connections
+_cover_pool = ThreadPoolExecutor(max_workers=COVER_FETCH_WORKERS, thread_name_prefix='cover-fetch')
+
+
+# Local cover sources must be variants in the cover store (see collage_sources)
+_STORED_COVER_PATH = re.compile(r'[\\/][0-9a-f]{2}[\\/][0-9a-f]{64}[\\/](thumb|grid|full)\.jpg$')
+
+
+def _fetch_cover(url, size, timeout):
+    """Download (or read a mirrored file) and resize one cover; runs on the cover pool"""
+    if not url.startswith(('http://', 'https://')):
+        if '..' in url or not _STORED_COVER_PATH.search(url):
+            raise ValueError(f"Not a stored cover: {url}")
+        with Image.open(url) as cover:
+            return cover.convert("RGBA").resize(size)
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    return Image.open(BytesIO(r.content)).convert("RGBA").resize(size)
+
+
+def fetch_covers(urls, size, deadline=None):
+    """
+    Fetch covers concurrently, giving up on any still missing at the deadline
+
+    Args:
+        urls: Cover URLs or local file paths (None entries get a placeholder)
+        size: (width, height) each cover is resized to
+        deadline: Seconds for the whole batch (COVER_FETCH_DEADLINE by default)
+
+    Returns:
+        One image per URL, in order; missing, failed or late covers are None
+    """
+    if deadline is None:
+        deadline = current_app.config.get('COVER_FETCH_DEADLINE', DEFAULT_COVER_FETCH_DEADLINE)
+    futures = {
+        _cover_pool.submit(_fetch_cover, url, size, deadline): index
+        for index, url in enumerate(urls) if url
+    }
+    covers = [None] * len(urls)
+    done, late = wait(futures, timeout=deadline)
+    for future in done:
         try:
-            font = ImageFont.truetype(font_path, font_size)
-        except Exception as e:
-            print("Font load failed:", e)
-            font = ImageFont.load_default()
-        bbox = draw.textbbox((0, 0), month_name, font=font)
-        w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        if w <= max_width:
+            covers[futures[future]] = future.result()
+        except Exception:
+            pass
+    for future in late:
+        # Requests already running finish on their own timeout; queued ones never start
+        future.cancel()
+    return covers
+
+
+# Bump whenever the collage layout or artwork changes so cached renders are replaced
+COLLAGE_TEMPLATE_VERSION = 2
+COLLAGE_JPEG_QUALITY = 90
+COLLAGE_SIZE = 1080
+# Space above the cover grid for the title, and the margin around the grid
+COLLAGE_HEADER = 260
+COLLAGE_MARGIN = 40
+COVER_ASPECT = 1.5
+# Gap between covers, relative to the cover width
+COVER_PADDING = 0.15
+# (largest, smallest) cover width: month wrap-ups keep large covers, year
+# reviews tile down to thumbnails before starting another page
+MONTH_COVER_WIDTHS = (200, 80)
+YEAR_COVER_WIDTHS = (200, 60)
+
+
+class CollageLayout(NamedTuple):
+    """Cover grid of a collage; every page uses the same grid"""
+    cover_w: int
+    cover_h: int
+    padding: int
+    cols: int
+    per_page: int
+    pages: int
+
+
+def collage_layout(count, max_cover_w, min_cover_w):
+    """
+    Tile count covers on the collage canvas: the largest cover width (between
+    min_cover_w and max_cover_w) at which they all fit on one page, or pages of
+    covers at min_cover_w when they do not
+    """
+    width = COLLAGE_SIZE - 2 * COLLAGE_MARGIN
+    height = COLLAGE_SIZE - COLLAGE_HEADER - COLLAGE_MARGIN
+    cover_w = max_cover_w
+    while True:
+        cover_h = round(cover_w * COVER_ASPECT)
+        padding = round(cover_w * COVER_PADDING)
+        cols = (width + padding) // (cover_w + padding)
+        rows = (height + padding) // (cover_h + padding)
+        if cols * rows >= count or cover_w <= min_cover_w:
             break
-        font_size -= 10
-    shadow_offset = 4
-    # Draw shadow for readability
-    draw.text(((img_size - w) // 2 + shadow_offset, 40 + shadow_offset), month_name, fill=(0,0,0,128), font=font)
-    # Draw main text in white
-    draw.text(((img_size - w) // 2, 40), month_name, fill=(255, 255, 255), font=font)
-
-    # Place covers
-    for idx, book in enumerate(books):
-        row = idx // cols
-        col = idx % cols
-        x = grid_left + col * (cover_w + padding)
-        y = grid_top + row * (cover_h + padding)
+        cover_w = max(min_cover_w, cover_w - 2)
+    per_page = cols * rows
+    pages = max(1, -(-count // per_page))
+    return CollageLayout(cover_w, cover_h, padding, cols, per_page, pages)
+
+
+def month_review_title(month, year):
+    return f"{calendar.month_name[month].upper()} {year}"
+
+
+def year_review_title(year, page=1, pages=1):
+    return f"{year} IN BOOKS" + (f" {page}/{pages}" if pages > 1 else "")
+
+
+def collage_sources(books, layout):
+    """
+    Cover source of each book for a collage: the smallest mirrored variant that
+    is at least as large as the layout's covers if stored, else its http(s)
+    URL. Any other cover_url (a local path a user typed in) is never read
+    from disk and gets a placeholder
+    """
+    from .services.cover_service import stored_variant_path, is_remote, VARIANTS
+    variant = 'thumb' if layout.cover_w <= VARIANTS['thumb'][0] else 'grid'
+    sources = []
+    for book in books:
         cover_url = getattr(book, 'cover_url', None)
+        sources.append(stored_variant_path(getattr(book, 'cover_digest', None), variant)
+                       or (cover_url if is_remote(cover_url) else None))
+    return sources
+
+
+def generate_month_review_image(books, month, year):
+    return render_month_review(books, month, year)[0]
+
+
+def render_month_review(books, month, year):
+    """
+    Render the month wrap-up collage (its first page) in this process
+
+    Returns:
+        (image, number of covers that could not be loaded and got a placeholder)
+    """
+    layout = collage_layout(len(books), *MONTH_COVER_WIDTHS)
+    books = books[:layout.per_page]
+    deadline = current_app.config.get('COVER_FETCH_DEADLINE', DEFAULT_COVER_FETCH_DEADLINE)
+    return get_collage_renderer().render(collage_sources(books, layout), month_review_title(month, year), layout, deadline)
+
+
+def collage_job(sources, title, layout, deadline):
+    """
+    Image job: render one collage page from cover sources (see collage_sources)
+
+    Returns:
+        (JPEG bytes, number of covers that got a placeholder)
+    """
+    image, missing = get_collage_renderer().render(sources, title, layout, deadline)
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=COLLAGE_JPEG_QUALITY)
+    return buffer.getvalue(), missing
+
+
+class CollageRenderer:
+    """
+    Cover collage renderer for month wrap-ups and year reviews. Everything that
+    does not depend on the books (the resized background, fonts, title sizes
+    and placeholder tiles) is prepared once, so a render only loads and pastes covers
+    """
+
+    max_font_size = 220
+    min_font_size = 10
+    font_step = 10
+    shadow_offset = 4
+
+    def __init__(self):
+        self.max_title_width = COLLAGE_SIZE - 2 * COLLAGE_MARGIN
+        self.background = self._load_background()
+        self.font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+        if not os.path.exists(self.font_path):
+            self.font_path = os.path.join(os.path.dirname(__file__), "static", "Arial.ttf")
+        self._fonts = {}
+        self._title_sizes = {}
+        self._placeholders = {}
+        # FreeType faces are not safe to use from several threads at once
+        self._lock = Lock()
+        year = date.today().year
+        with self._lock:
+            for title_year in (year - 1, year):
+                self._title_size(year_review_title(title_year))
+                for month in range(1, 13):
+                    self._title_size(month_review_title(month, title_year))
+
+    def _load_background(self):
+        bg_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'bookshelf.png'))
         try:
-            if cover_url:
-                r = requests.get(cover_url, timeout=10)
-                cover = Image.open(BytesIO(r.content)).convert("RGBA")
-                cover = cover.resize((cover_w, cover_h))
-            else:
-                raise Exception("No cover")
-        except Exception:
-            cover = Image.new('RGBA', (cover_w, cover_h), (220, 220, 220, 255))
-        bg.paste(cover, (x, y), cover if cover.mode == 'RGBA' else None)
+            with Image.open(bg_path) as bg:
+                return bg.convert('RGBA').resize((COLLAGE_SIZE, COLLAGE_SIZE))
+        except Exception as e:
+            logger.warning(f"Failed to load collage background {bg_path}: {e}")
+            return Image.new('RGBA', (COLLAGE_SIZE, COLLAGE_SIZE), (255, 230, 200, 255))
+
+    def _font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, size)
+            except Exception as e:
+                logger.warning(f"Font load failed: {e}")
+                font = ImageFont.load_default()
+            self._fonts[size] = font
+        return font
+
+    def _title_size(self, title):
+        """Largest font size (and the resulting text width) that fits the title; memoized per title"""
+        fitted = self._title_sizes.get(title)
+        if fitted is None:
+            font_size = self.max_font_size
+            while True:
+                bbox = self._font(font_size).getbbox(title)
+                width = bbox[2] - bbox[0]
+                if width <= self.max_title_width or font_size - self.font_step <= self.min_font_size:
+                    break
+                font_size -= self.font_step
+            fitted = self._title_sizes[title] = (font_size, width)
+        return fitted
+
+    def _placeholder(self, size):
+        placeholder = self._placeholders.get(size)
+        if placeholder is None:
+            placeholder = self._placeholders[size] = Image.new('RGBA', size, (220, 220, 220, 255))
+        return placeholder
+
+    def render(self, sources, title, layout, deadline):
+        """
+        Render one collage page; needs no app context, so it also runs in image jobs
+
+        Args:
+            sources: Cover URL or local file path per book on the page (None for no cover)
+            layout: CollageLayout from collage_layout()
+            deadline: Seconds allowed for loading all covers
+
+        Returns:
+            (image, number of covers that could not be loaded and got a placeholder)
+        """
+        size = (layout.cover_w, layout.cover_h)
+        # Covers are fetched first, all at once
+        covers = fetch_covers(sources, size, deadline)
+        missing = sum(1 for source, cover in zip(sources, covers) if source and cover is None)
+
+        bg = self.background.copy()
+        draw = ImageDraw.Draw(bg)
+        with self._lock:
+            font_size, w = self._title_size(title)
+            font = self._font(font_size)
+            x = (COLLAGE_SIZE - w) // 2
+            # Draw shadow for readability, then the title in white
+            draw.text((x + self.shadow_offset, 40 + self.shadow_offset), title, fill=(0, 0, 0, 128), font=font)
+            draw.text((x, 40), title, fill=(255, 255, 255), font=font)
+
+        # Late or missing covers get a placeholder
+        grid_w = layout.cols * layout.cover_w + (layout.cols - 1) * layout.padding
+        grid_left = (COLLAGE_SIZE - grid_w) // 2
+        for idx, cover in enumerate(covers):
+            row = idx // layout.cols
+            col = idx % layout.cols
+            x = grid_left + col * (layout.cover_w + layout.padding)
+            y = COLLAGE_HEADER + row * (layout.cover_h + layout.padding)
+            if cover is None:
+                cover = self._placeholder(size)
+            bg.paste(cover, (x, y), cover if cover.mode == 'RGBA' else None)
+
+        return bg.convert('RGB'), missing
+
+
+_renderer = None
+_renderer_lock = Lock()
+
 
-    return bg.convert('RGB')
+def get_collage_renderer():
+    """This worker's collage renderer, created on first use"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = CollageRenderer()
+    return _renderer
 
 def ensure_https_url(url):
     """Convert HTTP URLs to HTTPS for better security and compatibility."""
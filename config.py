@@ -44,6 +44,48 @@ class Config:
     # Application settings
     TIMEZONE = os.environ.get('TIMEZONE') or 'UTC'
     
+    # Maximum age in seconds of the shared community snapshot, and so how long
+    # new activity may take to show up; withdrawn activity invalidates it sooner
+    COMMUNITY_SNAPSHOT_TTL = int(os.environ.get('COMMUNITY_SNAPSHOT_TTL', 300))
+    
+    # Seconds a public profile summary or books page may be served from cache
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 60))
+    
+    # Lazy relationship loads inside list views: 'off', 'warn' (log) or 'raise'
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD', 'warn').lower()
+    
+    # Seconds between background rebuilds of collaborative-filtering
+    # recommendations (0 disables; use admin_tools.py build-recommendations)
+    RECOMMENDATION_BUILD_INTERVAL = int(os.environ.get('RECOMMENDATION_BUILD_INTERVAL', 21600))
+    
+    # Seconds between background runs that add new and edited shared books
+    # to the similar-books index (0 disables; use admin_tools.py index-similar)
+    SIMILAR_BOOKS_INDEX_INTERVAL = int(os.environ.get('SIMILAR_BOOKS_INDEX_INTERVAL', 300))
+    
+    # Overall time budget (seconds) for fetching the covers of a month
+    # wrap-up; covers still missing at the deadline get a placeholder
+    COVER_FETCH_DEADLINE = float(os.environ.get('COVER_FETCH_DEADLINE', 8))
+    
+    # Local mirror of remote book covers: content-addressed storage
+    # directory, and seconds between background mirror runs (0 disables;
+    # use admin_tools.py mirror-covers)
+    COVER_STORE_DIR = os.environ.get('COVER_STORE_DIR') or os.path.join(data_dir, 'covers')
+    COVER_MIRROR_INTERVAL = int(os.environ.get('COVER_MIRROR_INTERVAL', 300))
+    
+    # Uploaded profile pictures, stored by content like mirrored covers
+    AVATAR_STORE_DIR = os.environ.get('AVATAR_STORE_DIR') or os.path.join(data_dir, 'avatars')
+    
+    # Cover sprite sheets for library grids, one per user, page and library version
+    SPRITE_CACHE_DIR = os.environ.get('SPRITE_CACHE_DIR') or os.path.join(data_dir, 'sprites')
+    
+    # Rendered month wrap-up images, one per user and month
+    WRAPUP_CACHE_DIR = os.environ.get('WRAPUP_CACHE_DIR') or os.path.join(data_dir, 'wrapups')
+    
+    # Processes per worker for CPU-heavy image work (0 runs it in the request
+    # thread), and seconds a request waits for an image job before giving up
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_JOB_TIMEOUT = float(os.environ.get('IMAGE_JOB_TIMEOUT', 30))
+    
     # Authentication settings
     REMEMBER_COOKIE_DURATION = 86400 * 30  # 30 days (increased from 7 days)
     
@@ -127,7 +127,7 @@ export const api = {
     getReadingLogs: (uid: string) => api.get<ReadingLog[]>(`/books/${uid}/reading-logs`),
     logReading: (uid: string, data: any) => api.post<ReadingLog>(`/books/${uid}/reading-log`, data),
     lookup: (isbn: string) => api.get<any>(`/books/lookup/${isbn}`),
-    getPublic: (filter?: string) => api.get<Book[]>(`/books/public`, { params: { filter } }),
+    getPublic: (filter?: string, cursor?: string) => api.get<Book[]>(`/books/public`, { params: { filter, cursor } }),
     search: (query: string, page = 1, pageSize = 20) => api.get<any>(`/books/search?q=${encodeURIComponent(query)}&page=${page}&pageSize=${pageSize}`),
     uploadCover: (uid: string, file: File) => {
       const form = new FormData();
@@ -149,15 +149,22 @@ export const api = {
     getStatistics: () => api.get<UserStatistics>('/user/statistics'),
     getReadingHistory: () => api.get<ReadingLog[]>('/user/reading-history'),
     getPublicProfile: (userId: string) => api.get<any>(`/user/${userId}/profile`),
+    getPublicProfileBooks: (userId: string, before?: number) =>
+      apiClient.get(`/user/${userId}/profile/books`, { params: { before } }).then(res => res.data),
   },
   
   // Community endpoints
   community: {
     getActivity: () => api.get<CommunityActivity>('/community/activity'),
-    getActiveReaders: () => api.get<any>('/community/active-readers'),
-    getBooksThisMonth: () => api.get<any>('/community/books-this-month'),
-    getCurrentlyReading: () => api.get<any>('/community/currently-reading'),
-    getRecentActivity: () => api.get<any>('/community/recent-activity'),
+    getActiveReaders: (window?: 'week' | 'month' | 'year', page?: number) =>
+      api.get<any>('/community/active-readers', { window, page }),
+    // Feeds are paged with the next_cursor of the previous page
+    getBooksThisMonth: (before?: number) =>
+      apiClient.get('/community/books-this-month', { params: { before } }).then(res => res.data),
+    getCurrentlyReading: (before?: number) =>
+      apiClient.get('/community/currently-reading', { params: { before } }).then(res => res.data),
+    getRecentActivity: (before?: number) =>
+      apiClient.get('/community/recent-activity', { params: { before } }).then(res => res.data),
   },
   
   // System endpoints (admin only)
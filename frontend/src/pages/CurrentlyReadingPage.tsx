@@ -16,6 +16,8 @@ const CurrentlyReadingPage: React.FC = () => {
   const [books, setBooks] = useState<BookWithUser[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchCurrentlyReading = async () => {
@@ -27,6 +29,7 @@ const CurrentlyReadingPage: React.FC = () => {
         
         if (response.success && response.data) {
           setBooks(response.data);
+          setNextCursor(response.pagination?.next_cursor ?? null);
         } else {
           setError('Failed to load currently reading books');
         }
@@ -41,6 +44,23 @@ const CurrentlyReadingPage: React.FC = () => {
     fetchCurrentlyReading();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setIsLoadingMore(true);
+      const response = await api.community.getCurrentlyReading(nextCursor);
+      if (response.success && response.data) {
+        setBooks([...books, ...response.data]);
+        setNextCursor(response.pagination?.next_cursor ?? null);
+      }
+    } catch (err) {
+      console.error('Currently reading fetch error:', err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   if (isLoading) {
     return (
       <div className="space-y-6">
@@ -168,6 +188,14 @@ const CurrentlyReadingPage: React.FC = () => {
           </div>
         </div>
       )}
+
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button className="btn btn-outline btn-sm" onClick={loadMore} disabled={isLoadingMore}>
+            {isLoadingMore ? 'Loading...' : 'Load more books'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -23,6 +23,8 @@ const RecentActivityPage: React.FC = () => {
   const [recentLogs, setRecentLogs] = useState<ReadingLogWithUser[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchRecentActivity = async () => {
@@ -34,6 +36,7 @@ const RecentActivityPage: React.FC = () => {
         
         if (response.success && response.data) {
           setRecentLogs(response.data);
+          setNextCursor(response.pagination?.next_cursor ?? null);
         } else {
           setError('Failed to load recent activity');
         }
@@ -48,6 +51,23 @@ const RecentActivityPage: React.FC = () => {
     fetchRecentActivity();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setIsLoadingMore(true);
+      const response = await api.community.getRecentActivity(nextCursor);
+      if (response.success && response.data) {
+        setRecentLogs([...recentLogs, ...response.data]);
+        setNextCursor(response.pagination?.next_cursor ?? null);
+      }
+    } catch (err) {
+      console.error('Recent activity fetch error:', err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   if (isLoading) {
     return (
       <div className="space-y-6">
@@ -189,6 +209,14 @@ const RecentActivityPage: React.FC = () => {
           </div>
         </div>
       )}
+
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button className="btn btn-outline btn-sm" onClick={loadMore} disabled={isLoadingMore}>
+            {isLoadingMore ? 'Loading...' : 'Load more activity'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
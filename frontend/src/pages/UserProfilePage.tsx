@@ -19,6 +19,7 @@ interface UserProfile extends User {
   want_to_read: number;
   reading_streak: number;
   books: Book[];
+  books_next_cursor: number | null;
 }
 
 const UserProfilePage: React.FC = () => {
@@ -26,6 +27,7 @@ const UserProfilePage: React.FC = () => {
   const [userProfile, setUserProfile] = useState<UserProfile | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchUserProfile = async () => {
@@ -53,6 +55,26 @@ const UserProfilePage: React.FC = () => {
     fetchUserProfile();
   }, [userId]);
 
+  const loadMoreBooks = async () => {
+    if (!userId || !userProfile?.books_next_cursor) return;
+
+    try {
+      setIsLoadingMore(true);
+      const response = await api.user.getPublicProfileBooks(userId, userProfile.books_next_cursor);
+      if (response.success && response.data) {
+        setUserProfile({
+          ...userProfile,
+          books: [...userProfile.books, ...response.data],
+          books_next_cursor: response.pagination?.next_cursor ?? null,
+        });
+      }
+    } catch (err) {
+      console.error('User profile books fetch error:', err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   if (isLoading) {
     return (
       <div className="space-y-6">
@@ -272,6 +294,14 @@ const UserProfilePage: React.FC = () => {
                   <p className="text-base-content/70">This user hasn't added any books to their library yet.</p>
                 </div>
               )}
+
+              {userProfile.books_next_cursor && (
+                <div className="flex justify-center mt-4">
+                  <button className="btn btn-outline btn-sm" onClick={loadMoreBooks} disabled={isLoadingMore}>
+                    {isLoadingMore ? 'Loading...' : 'Load more books'}
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         </div>
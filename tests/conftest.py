@@ -1,8 +1,22 @@
 import pytest
 import os
+import re
 import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+
+import requests
+from PIL import Image
+from sqlalchemy import event
+
 from app import create_app
 from app.models import db, User, Book, ReadingLog
+from app.services import cover_service
+
+# Tables that grow with the instance; a full scan of any of these is a regression
+HOT_TABLES = {'book', 'reading_log', 'reading_day', 'user_rating', 'shared_book_data', 'activity_event'}
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
 
 @pytest.fixture
 def app():
@@ -83,3 +97,107 @@ def sample_book(app, regular_user):
         db.session.add(book)
         db.session.commit()
         return book
+
+
+def make_user(username, **flags):
+    """Create an active user with a valid password; flags are extra User columns"""
+    user = User(username=username, email=f'{username}@test.com', is_active=True, **flags)
+    user.set_password('Test#Reader2024')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@contextmanager
+def capture_selects():
+    """Record every SELECT sent to the database while the block runs."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_table_scans(statement, parameters):
+    """Return the hot tables that SQLite would read with a full table scan."""
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    for row in plan:
+        match = FULL_SCAN.match(row[-1])
+        if match:
+            # SQLAlchemy aliases joined tables as e.g. book_1
+            table = re.sub(r'_\d+$', '', match.group(1))
+            if table in HOT_TABLES:
+                scans.append(row[-1])
+    return scans
+
+
+def assert_no_full_scans(statements):
+    assert statements, "expected the code under test to issue queries"
+    for statement, parameters in statements:
+        scans = full_table_scans(statement, parameters)
+        assert not scans, f"Full table scan {scans} in query:\n{statement}"
+
+
+def cover_bytes(color, size=(400, 640), image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    """Stand-in for a requests response, streamed or not"""
+    def __init__(self, content, location=None):
+        self.content = content
+        self.is_redirect = location is not None
+        self.headers = {'Location': location} if location else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+@pytest.fixture
+def upstream(app, monkeypatch, tmp_path):
+    """
+    Fake cover server: https://covers.test/<color>.jpg; 'missing' URLs fail and
+    https://covers.test/moved/<url> redirects to <url>. intranet.test resolves
+    to a private address. Records fetched URLs.
+    """
+    app.config['COVER_STORE_DIR'] = str(tmp_path / 'covers')
+    fetched = []
+    resolve = cover_service.socket.getaddrinfo
+
+    def fake_getaddrinfo(host, port, *args):
+        if host.endswith('.test'):
+            address = '10.0.0.7' if host == 'intranet.test' else '93.184.216.34'
+            return [(cover_service.socket.AF_INET, cover_service.socket.SOCK_STREAM, 6, '', (address, port))]
+        return resolve(host, port, *args)
+
+    def fake_get(url, timeout=None, stream=False, allow_redirects=True):
+        fetched.append(url)
+        if '/moved/' in url:
+            return FakeResponse(b'', location=url.split('/moved/', 1)[1])
+        name = url.rsplit('/', 1)[-1].split('.')[0]
+        if name == 'missing':
+            raise requests.ConnectionError('unreachable')
+        return FakeResponse(cover_bytes(name.split('-')[0]))
+    monkeypatch.setattr(cover_service.socket, 'getaddrinfo', fake_getaddrinfo)
+    monkeypatch.setattr(cover_service.requests, 'get', fake_get)
+    return fetched
@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import routes
+from app.models import db, User, Book, ReadingLog, UserRating, ActivityEvent
+from app.services.activity_service import ActivityService, STARTED, FINISHED, LOGGED, RATED
+from app.services.book_service import BookService
+from app.services.user_service import UserService
+from tests.conftest import capture_selects, assert_no_full_scans, make_user
+
+
+def event_types(user_id):
+    return sorted(event.event_type for event in ActivityEvent.query.filter_by(user_id=user_id))
+
+
+@pytest.fixture
+def sharer(app):
+    with app.app_context():
+        user = make_user('sharer', share_reading_activity=True, share_current_reading=True)
+        reading = Book(title='Reading', author='A', user_id=user.id, start_date=date.today())
+        done = Book(title='Done', author='B', user_id=user.id, finish_date=date.today())
+        db.session.add_all([reading, done])
+        db.session.commit()
+        db.session.add(ReadingLog(user_id=user.id, book_id=reading.id, date=date.today(), pages_read=12))
+        db.session.add(UserRating(user_id=user.id, book_id=done.id, rating=4))
+        db.session.commit()
+        return user.id
+
+
+class TestActivityFeed:
+    """Events are written at write time and read with a keyset cursor."""
+
+    def test_events_written_for_sharing_users_only(self, app, sharer):
+        with app.app_context():
+            assert event_types(sharer) == sorted([STARTED, FINISHED, LOGGED, RATED])
+
+            private = make_user('private', share_reading_activity=False, share_current_reading=False)
+            db.session.add(Book(title='Hidden', author='C', user_id=private.id, finish_date=date.today()))
+            db.session.commit()
+            assert event_types(private.id) == []
+
+    def test_opting_out_withdraws_events(self, app, sharer):
+        with app.app_context():
+            user = db.session.get(User, sharer)
+            user.share_reading_activity = False
+            db.session.commit()
+            assert event_types(sharer) == [STARTED]
+
+            # Finishing withdraws the started event but writes nothing new
+            book = Book.query.filter_by(user_id=sharer, title='Reading').first()
+            book.finish_date = date.today()
+            db.session.commit()
+            assert event_types(sharer) == []
+
+    def test_finishing_and_deleting_update_the_feed(self, app, sharer):
+        with app.app_context():
+            book = Book.query.filter_by(user_id=sharer, title='Reading').first()
+            book.finish_date = date.today()
+            db.session.commit()
+            feed = ActivityService(db.session)
+            assert [event.book.title for event in feed.get_feed([FINISHED])['events']] == ['Reading', 'Done']
+            assert feed.get_feed([STARTED], still_reading=True)['events'] == []
+
+            book.finish_date = None
+            db.session.commit()
+            assert [event.book.title for event in feed.get_feed([FINISHED])['events']] == ['Done']
+
+            BookService(db.session).delete_book(book.uid, sharer)
+            assert event_types(sharer) == sorted([FINISHED, RATED])
+
+    def test_shelving_or_moving_a_book_updates_currently_reading(self, app, sharer):
+        with app.app_context():
+            service = UserService(db.session)
+            book = Book.query.filter_by(user_id=sharer, title='Reading').first()
+            for flag in ('want_to_read', 'library_only'):
+                setattr(book, flag, True)
+                db.session.commit()
+                assert service.get_currently_reading()['books'] == []
+                setattr(book, flag, False)
+                db.session.commit()
+                assert [item['title'] for item in service.get_currently_reading()['books']] == ['Reading']
+
+            other = make_user('other', share_current_reading=True)
+            book.user_id = other.id
+            db.session.commit()
+            started, = ActivityEvent.query.filter_by(event_type=STARTED).all()
+            assert started.user_id == other.id
+
+    def test_edits_update_events_in_place(self, app, sharer):
+        with app.app_context():
+            log = ReadingLog.query.filter_by(user_id=sharer).first()
+            log.pages_read = 30
+            db.session.commit()
+            logged, = ActivityEvent.query.filter_by(user_id=sharer, event_type=LOGGED).all()
+            assert logged.pages_read == 30 and logged.event_date == date.today()
+
+            rating = UserRating.query.filter_by(user_id=sharer).first()
+            rating.rating = 2
+            db.session.commit()
+            rated, = ActivityEvent.query.filter_by(user_id=sharer, event_type=RATED).all()
+            assert rated.rating == 2
+
+    def test_cursor_pagination(self, app, sharer):
+        with app.app_context():
+            book = Book.query.filter_by(user_id=sharer, title='Reading').first()
+            for days_ago in range(1, 6):
+                db.session.add(ReadingLog(user_id=sharer, book_id=book.id,
+                                          date=date.today() - timedelta(days=days_ago), pages_read=days_ago))
+            db.session.commit()
+
+            feed = ActivityService(db.session)
+            seen, cursor = [], None
+            while True:
+                page = feed.get_feed([LOGGED], before=cursor, limit=2)
+                seen.extend(event.id for event in page['events'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            assert len(seen) == 6
+            assert seen == sorted(seen, reverse=True)
+
+    def test_feed_pages_are_index_range_scans(self, app, sharer):
+        with app.app_context():
+            feed = ActivityService(db.session)
+            with capture_selects() as statements:
+                first = feed.get_feed([LOGGED, RATED], limit=1)
+                feed.get_feed([LOGGED, RATED], before=first['next_cursor'], limit=1)
+                feed.get_feed([STARTED], still_reading=True)
+                feed.count_events(FINISHED, date.today().replace(day=1))
+            assert_no_full_scans(statements)
+
+    def test_api_and_pages_return_next_cursor(self, app, client, sharer, monkeypatch):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(sharer)
+            session['_fresh'] = True
+        body = client.get('/api/community/currently-reading?limit=1').get_json()
+        assert body['data'][0]['title'] == 'Reading'
+        assert body['data'][0]['user']['username'] == 'sharer'
+        assert body['pagination']['next_cursor'] is None
+        assert client.get('/community_activity/recent_activity').status_code == 200
+
+        db.session.add(Book(title='Second', author='C', user_id=sharer, start_date=date.today()))
+        db.session.commit()
+        first = client.get('/api/community/currently-reading?limit=1').get_json()
+        cursor = first['pagination']['next_cursor']
+        assert [book['title'] for book in first['data']] == ['Second'] and cursor
+        rest = client.get(f'/api/community/currently-reading?limit=1&before={cursor}').get_json()
+        assert [book['title'] for book in rest['data']] == ['Reading']
+
+        # The server-rendered feeds link to the next page with the same cursor
+        monkeypatch.setattr(routes, 'MAX_FEED_PAGE_SIZE', 1)
+        page = client.get('/community_activity/currently_reading').get_data(as_text=True)
+        assert f'/community_activity/currently_reading?before={cursor}' in page and 'Newest' not in page
+        older = client.get(f'/community_activity/currently_reading?before={cursor}').get_data(as_text=True)
+        assert 'Reading' in older and 'Newest' in older and 'Older books' not in older
+
+    def test_rebuild_matches_incremental_writes(self, app, sharer):
+        with app.app_context():
+            before = event_types(sharer)
+            assert ActivityService(db.session).rebuild() == len(before)
+            assert event_types(sharer) == before
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+
+from app.models import db, User, Book, ReadingLog
+from app.services import analytics_service
+from app.services.analytics_service import AnalyticsService
+from app.services.stats_service import StatsService
+
+
+@pytest.fixture
+def reader(app):
+    with app.app_context():
+        user = User(username='analyticsreader', email='analyticsreader@test.com', is_active=True)
+        user.set_password('Analytics#Reader24')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add_all([
+            Book(title='One', author='Le Guin', user_id=user.id, categories='sci-fi, Fantasy',
+                 start_date=date(2023, 1, 1), finish_date=date(2023, 1, 11)),
+            Book(title='Two', author='Le Guin', user_id=user.id, categories='Fantasy',
+                 start_date=date(2023, 2, 1), finish_date=date(2023, 2, 5)),
+            Book(title='Three', author='Pratchett', user_id=user.id,
+                 finish_date=date(2023, 3, 7)),
+            Book(title='Older', author='Pratchett', user_id=user.id, finish_date=date(2022, 6, 1)),
+        ])
+        db.session.commit()
+        book_id = Book.query.filter_by(user_id=user.id, title='One').first().id
+        # Monday 2 Jan, Wednesday 4 Jan and Monday 9 Jan 2023
+        for day, pages in ((date(2023, 1, 2), 10), (date(2023, 1, 4), 20), (date(2023, 1, 9), 50)):
+            db.session.add(ReadingLog(user_id=user.id, book_id=book_id, date=day, pages_read=pages))
+        db.session.commit()
+        return user.id
+
+
+class TestAnalytics:
+    """Year analytics are computed from the rollup and finished books."""
+
+    def test_year_analytics(self, app, reader):
+        with app.app_context():
+            analytics = AnalyticsService(db.session).get_analytics(reader, 2023)
+
+            pages = analytics['pages']
+            assert (pages['total'], pages['reading_days']) == (80, 3)
+            assert pages['by_week'] == [{'week_start': '2023-01-02', 'pages': 30},
+                                        {'week_start': '2023-01-09', 'pages': 50}]
+            assert pages['by_month'] == [{'month': '2023-01', 'pages': 80}]
+            assert pages['weekly_trend'] == 20.0
+            assert pages['rolling_pace'][-1]['date'] == '2023-12-31'
+
+            assert analytics['books_finished'] == 3
+            assert analytics['books_per_year'] == {'2022': 1, '2023': 3}
+            assert analytics['finish_time'] == {
+                'books_with_dates': 2, 'average_days': 7.0, 'median_days': 7.0,
+                'average_days_between_finishes': 27.5}
+            assert analytics['authors'][0] == {'author': 'Le Guin', 'count': 2}
+            assert {'genre': 'Fantasy', 'count': 2} in analytics['genres']
+            assert {'genre': 'Science Fiction', 'count': 1} in analytics['genres']
+
+    def test_cache_follows_library_version(self, app, reader, monkeypatch):
+        with app.app_context():
+            service = AnalyticsService(db.session)
+            first = service.get_analytics(reader, 2023)
+
+            calls = []
+            original = AnalyticsService._compute
+            monkeypatch.setattr(AnalyticsService, '_compute',
+                                lambda self, *args: calls.append(args) or original(self, *args))
+            assert service.get_analytics(reader, 2023) is first
+            assert calls == []
+
+            book_id = Book.query.filter_by(user_id=reader, title='Two').first().id
+            db.session.add(ReadingLog(user_id=reader, book_id=book_id, date=date(2023, 2, 2), pages_read=5))
+            db.session.commit()
+            refreshed = service.get_analytics(reader, 2023)
+            assert len(calls) == 1
+            assert refreshed['pages']['total'] == 85
+            assert refreshed['library_version'] == StatsService(db.session).get_user_stats(reader).library_version
+
+    def test_endpoint(self, app, client, reader):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(reader)
+            session['_fresh'] = True
+        response = client.get('/api/user/analytics?year=2023')
+        assert response.status_code == 200
+        assert response.get_json()['data']['pages']['total'] == 80
+        assert client.get('/api/user/analytics?year=0').status_code == 400
@@ -0,0 +1,112 @@
+from datetime import date
+
+import pytest
+
+from app.models import db, User, Book, CommunitySnapshot
+from app.services.cache import acquire_lease, release_lease
+from app.services.community_service import CommunityService, REBUILD_LEASE
+from app.services.user_service import UserService
+from tests.conftest import capture_selects
+
+
+@pytest.fixture
+def community(app):
+    with app.app_context():
+        user = User(username='snapshotter', email='snapshotter@test.com', is_active=True,
+                    share_reading_activity=True, share_current_reading=True)
+        user.set_password('Snapshot#Reader24')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([
+            Book(title='Reading', author='A', user_id=user.id, start_date=date.today()),
+            Book(title='Done', author='B', user_id=user.id, finish_date=date.today())
+        ])
+        db.session.commit()
+        return user.id
+
+
+class TestCommunitySnapshot:
+    """Community aggregates are computed once and shared until invalidated."""
+
+    def test_snapshot_is_reused_until_it_expires(self, app, community):
+        with app.app_context():
+            service = CommunityService(db.session)
+            first = service.get_snapshot()
+            assert (first['books_this_month'], first['currently_reading'], first['sharing_readers']) == (1, 1, 1)
+
+            with capture_selects() as statements:
+                assert service.get_snapshot() == first
+            assert len(statements) == 1
+
+            # New activity waits for the next rebuild instead of invalidating on every write
+            db.session.add(Book(title='Also done', author='C', user_id=community, finish_date=date.today()))
+            db.session.commit()
+            assert service.get_snapshot() == first
+            app.config['COMMUNITY_SNAPSHOT_TTL'] = 0
+            refreshed = service.get_snapshot()
+            assert refreshed['books_this_month'] == 2
+            assert [book['title'] for book in refreshed['books_this_month_page']['books']] == ['Also done', 'Done']
+
+    def test_withdrawn_activity_invalidates(self, app, community):
+        with app.app_context():
+            service = CommunityService(db.session)
+            assert service.get_snapshot()['books_this_month'] == 1
+            db.session.delete(Book.query.filter_by(title='Done').first())
+            db.session.commit()
+            assert service.get_snapshot()['books_this_month'] == 0
+
+    def test_one_rebuild_at_a_time(self, app, community):
+        with app.app_context():
+            service = CommunityService(db.session)
+            first = service.get_snapshot()
+            app.config['COMMUNITY_SNAPSHOT_TTL'] = 0
+            db.session.add(Book(title='Also done', author='C', user_id=community, finish_date=date.today()))
+            db.session.commit()
+
+            # While another worker holds the rebuild lease the previous snapshot is served
+            assert acquire_lease(db.session, REBUILD_LEASE, 60)
+            assert not acquire_lease(db.session, REBUILD_LEASE, 60)
+            assert service.get_snapshot() == first
+            release_lease(db.session, REBUILD_LEASE)
+            assert service.get_snapshot()['books_this_month'] == 2
+            assert acquire_lease(db.session, REBUILD_LEASE, 60)
+
+    def test_private_writes_do_not_invalidate(self, app, community):
+        with app.app_context():
+            service = CommunityService(db.session)
+            service.get_snapshot()
+            version = CommunitySnapshot.query.get('community').version
+
+            private = User(username='quiet', email='quiet@test.com', is_active=True,
+                           share_reading_activity=False, share_current_reading=False)
+            private.set_password('Snapshot#Reader24')
+            db.session.add(private)
+            db.session.commit()
+            db.session.add(Book(title='Hidden', author='D', user_id=private.id, finish_date=date.today()))
+            db.session.commit()
+
+            with capture_selects() as statements:
+                service.get_snapshot()
+            assert len(statements) == 1
+            assert CommunitySnapshot.query.get('community').version == version
+
+    def test_ttl_bounds_staleness(self, app, community):
+        with app.app_context():
+            app.config['COMMUNITY_SNAPSHOT_TTL'] = 0
+            service = CommunityService(db.session)
+            service.get_snapshot()
+            with capture_selects() as statements:
+                service.get_snapshot()
+            assert len(statements) > 1
+
+    def test_api_first_pages_come_from_the_snapshot(self, app, client, community):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(community)
+            session['_fresh'] = True
+        summary = client.get('/api/community/activity').get_json()['data']
+        assert (summary['books_this_month'], summary['currently_reading']) == (1, 1)
+        body = client.get('/api/community/books-this-month').get_json()
+        assert [book['title'] for book in body['data']] == ['Done']
+        assert client.get('/community_activity').status_code == 200
+        with app.app_context():
+            assert UserService(db.session).get_currently_reading()['books'][0]['title'] == 'Reading'
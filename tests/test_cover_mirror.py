@@ -0,0 +1,149 @@
+import os
+
+import pytest
+from PIL import Image
+
+from app.models import db, User, Book, CoverImage, CoverSource
+from app.services import cover_service
+from app.services.cover_service import CoverService, MAX_FAILURES
+from app.services.image_service import derivative_path
+
+
+@pytest.fixture
+def reader(app):
+    with app.app_context():
+        user = User(username='coverfan', email='coverfan@test.com', is_active=True)
+        user.set_password('Cover#Mirror24')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def add_book(user_id, title, cover_url):
+    book = Book(title=title, author='Author', user_id=user_id, cover_url=cover_url)
+    db.session.add(book)
+    db.session.commit()
+    return book
+
+
+class TestCoverMirror:
+    """Remote covers are downloaded once and served from content-addressed local storage."""
+
+    def test_each_url_is_downloaded_once(self, app, upstream, reader):
+        with app.app_context():
+            other = User(username='second', email='second@test.com', is_active=True)
+            other.set_password('Cover#Mirror24')
+            db.session.add(other)
+            db.session.commit()
+            add_book(reader, 'Dune', 'http://covers.test/red.jpg')
+            add_book(other.id, 'Dune', 'http://covers.test/red.jpg')
+            add_book(reader, 'Local', '/static/uploads/covers/cover_1.png')
+
+            result = CoverService(db.session).mirror()
+            assert result == {'mirrored': 1, 'failed': 0, 'books': 2}
+            assert upstream == ['https://covers.test/red.jpg']
+
+            digests = {book.cover_digest for book in Book.query.filter_by(title='Dune')}
+            assert len(digests) == 1
+            digest = digests.pop()
+            book = Book.query.filter_by(title='Dune').first()
+            assert book.secure_cover_url == f'/covers/{digest}/grid'
+            assert Book.query.filter_by(title='Local').first().cover_digest is None
+
+            for variant, size in cover_service.VARIANTS.items():
+                for ext, image_format in (('jpg', 'JPEG'), ('webp', 'WEBP')):
+                    path = derivative_path(app.config['COVER_STORE_DIR'], digest, variant, ext)
+                    with Image.open(path) as image:
+                        assert image.format == image_format
+                        assert image.size[0] <= size[0] and image.size[1] <= size[1]
+            assert CoverService(db.session).mirror() == {'mirrored': 0, 'failed': 0, 'books': 0}
+
+    def test_identical_images_are_stored_once(self, app, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Emma', 'https://covers.test/blue-1.jpg')
+            add_book(reader, 'Emma again', 'https://covers.test/blue-2.jpg')
+            CoverService(db.session).mirror()
+            assert CoverSource.query.count() == 2
+            assert CoverImage.query.count() == 1
+            assert len(os.listdir(app.config['COVER_STORE_DIR'])) == 1
+
+    def test_new_books_reuse_mirrored_covers(self, app, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Dune', 'https://covers.test/red.jpg')
+            CoverService(db.session).mirror()
+            book = add_book(reader, 'Dune 2', 'https://covers.test/red.jpg')
+            assert book.cover_digest is not None
+
+            book.cover_url = 'https://covers.test/green.jpg'
+            db.session.commit()
+            assert book.cover_digest is None
+            assert book.secure_cover_url == 'https://covers.test/green.jpg'
+
+    def test_failing_urls_are_given_up_on(self, app, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Lost', 'https://covers.test/missing.jpg')
+            for _ in range(MAX_FAILURES):
+                assert CoverService(db.session).mirror()['failed'] == 1
+            assert CoverService(db.session).mirror() == {'mirrored': 0, 'failed': 0, 'books': 0}
+            assert len(upstream) == MAX_FAILURES
+
+    def test_private_hosts_are_never_fetched(self, app, upstream, reader):
+        with app.app_context():
+            for n, url in enumerate(('http://127.0.0.1/cover.jpg', 'https://localhost/cover.jpg',
+                                     'https://intranet.test/cover.jpg', 'https://[::1]/cover.jpg',
+                                     'https://covers.test/moved/http://169.254.169.254/latest.jpg')):
+                add_book(reader, f'Internal {n}', url)
+            assert CoverService(db.session).mirror() == {'mirrored': 0, 'failed': 5, 'books': 0}
+            # Only the public redirecting URL was requested; its private target was refused
+            assert upstream == ['https://covers.test/moved/http://169.254.169.254/latest.jpg']
+
+            add_book(reader, 'Moved', 'https://covers.test/moved/https://covers.test/red.jpg')
+            assert CoverService(db.session).mirror()['mirrored'] == 1
+
+    def test_served_with_immutable_cache_headers(self, app, client, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Dune', 'https://covers.test/red.jpg')
+            CoverService(db.session).mirror()
+            digest = Book.query.first().cover_digest
+        response = client.get(f'/covers/{digest}/thumb.jpg')
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+        assert client.get(f'/covers/{digest}/huge.jpg').status_code == 404
+        assert client.get('/covers/not-a-digest/thumb.jpg').status_code == 404
+
+
+class TestCoverPlaceholders:
+    """Stored covers carry a tiny inline placeholder and dominant colour for list views."""
+
+    def test_placeholders_in_list_projections(self, app, client, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Dune', 'https://covers.test/red.jpg')
+            add_book(reader, 'No cover', None)
+            CoverService(db.session).mirror()
+            image = CoverImage.query.one()
+            assert image.placeholder.startswith('data:image/webp;base64,') and len(image.placeholder) < 1024
+            assert image.color[:3] in ('#fe', '#ff')
+            expected = {'Dune': (image.placeholder, image.color), 'No cover': (None, None)}
+        with client.session_transaction() as session:
+            session['_user_id'] = str(reader)
+            session['_fresh'] = True
+
+        books = client.get('/api/books').get_json()['data']
+        assert {book['title']: (book['cover_placeholder'], book['cover_color']) for book in books} == expected
+        with app.app_context():
+            from app.services.profile_service import ProfileService
+            page = ProfileService(db.session)._books_page(reader, None, 10)
+        assert {book['title']: (book['cover_placeholder'], book['cover_color']) for book in page['books']} == expected
+        assert expected['Dune'][0] in client.get('/library').get_data(as_text=True)
+
+    def test_existing_covers_are_backfilled(self, app, upstream, reader):
+        with app.app_context():
+            add_book(reader, 'Dune', 'https://covers.test/blue.jpg')
+            CoverService(db.session).mirror()
+            CoverImage.query.update({'placeholder': None, 'color': None})
+            db.session.commit()
+            assert CoverService(db.session).fill_placeholders() == 1
+            assert CoverService(db.session).fill_placeholders() == 0
+            assert Book.query.one().cover_placeholder.startswith('data:image/webp')
@@ -0,0 +1,103 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.models import db, User, Book
+from app.services import sprite_service
+from app.services.cover_service import CoverService
+
+
+@pytest.fixture
+def sheets(app, monkeypatch, tmp_path):
+    """Count sprite sheet builds; images are built in the test process"""
+    app.config['SPRITE_CACHE_DIR'] = str(tmp_path / 'sprites')
+    app.config['IMAGE_WORKERS'] = 0
+    monkeypatch.setattr(sprite_service, '_sheet_cache', sprite_service.VersionedCache())
+    builds = []
+    build = sprite_service.sprite_job
+
+    def counting_build(paths, tile, columns, ext):
+        builds.append(ext)
+        return build(paths, tile, columns, ext)
+
+    monkeypatch.setattr(sprite_service, 'sprite_job', counting_build)
+    return builds
+
+
+@pytest.fixture
+def big_library(app, client, upstream):
+    """120 books: covers alternate red and blue; every tenth book has no cover"""
+    with app.app_context():
+        user = User(username='shelves', email='shelves@test.com', is_active=True)
+        user.set_password('Sprite#Sheets24')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([
+            Book(title=f'Book {n}', author='Author', user_id=user.id,
+                 cover_url=None if n % 10 == 9 else f"https://covers.test/{('red', 'blue')[n % 2]}.jpg")
+            for n in range(120)
+        ])
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return user_id
+
+
+def get_sheet(client, page):
+    return client.get(f'/api/books/sprites/{page}').get_json()['data']
+
+
+class TestCoverSprites:
+    """A page of thumbnails is one cached image plus an offsets map."""
+
+    def test_page_of_covers_in_one_image(self, app, client, sheets, big_library):
+        before = get_sheet(client, 1)
+        assert before['pages'] == 2 and before['offsets'] == {} and before['url'] is None
+
+        # Mirroring changes the library's covers, so the sheets get a new version
+        CoverService(db.session).mirror()
+        sheet = get_sheet(client, 1)
+        assert sheet['version'] != before['version']
+        assert len(sheet['offsets']) == 90 and sheet['tile'] == {'width': 100, 'height': 150}
+        assert sheet['url'] == f"/library/sprites/1-{sheet['version']}"
+
+        response = client.get(sheet['url'], headers={'Accept': 'image/webp,*/*'})
+        assert response.mimetype == 'image/webp' and 'immutable' in response.headers['Cache-Control']
+        with Image.open(BytesIO(response.data)) as image:
+            assert image.size == (1000, 1350)
+            books = {book.uid: book for book in Book.query.filter_by(user_id=big_library)}
+            for uid, offset in list(sheet['offsets'].items())[:4]:
+                red, _, blue = image.convert('RGB').getpixel((offset['x'] + 50, offset['y'] + 75))
+                assert (red > blue) == books[uid].cover_url.endswith('red.jpg')
+
+        assert client.get(sheet['url'], headers={'Accept': 'image/webp'}).data == response.data
+        assert client.get(sheet['url'], headers={'Accept': '*/*'}).mimetype == 'image/jpeg'
+        assert sheets == ['webp', 'jpg']
+        assert client.get('/api/books/sprites/3').status_code == 404
+
+    def test_library_changes_replace_the_sheet(self, app, client, sheets, big_library):
+        CoverService(db.session).mirror()
+        old = get_sheet(client, 2)
+        assert client.get(old['url']).status_code == 200
+        # Requests share the fixture's app context, so write through its session
+        db.session.add(Book(title='New', author='Author', user_id=big_library,
+                            cover_url='https://covers.test/red.jpg'))
+        db.session.commit()
+        new = get_sheet(client, 2)
+        assert new['version'] != old['version'] and len(new['offsets']) == len(old['offsets']) + 1
+        assert client.get(old['url']).status_code == 404
+        assert client.get(new['url']).status_code == 200
+        assert len(sheets) == 2
+
+    def test_image_uses_the_tiles_of_the_cached_layout(self, app, client, sheets, big_library, monkeypatch):
+        CoverService(db.session).mirror()
+        sheet = get_sheet(client, 1)
+        # Whatever the store looks like now, the image matches the offsets already handed out
+        monkeypatch.setattr(sprite_service, 'stored_variant_path', lambda digest, variant: None)
+        response = client.get(sheet['url'])
+        assert response.status_code == 200
+        with Image.open(BytesIO(response.data)) as image:
+            assert image.size == (1000, 1350)
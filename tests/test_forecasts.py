@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import db, User, Book, ReadingLog
+from app.services import forecast_service
+from app.services.forecast_service import ForecastService
+
+TODAY = date(2024, 7, 1)
+
+
+@pytest.fixture
+def reader(app, monkeypatch):
+    monkeypatch.setattr(forecast_service, 'configured_today', lambda: TODAY)
+    with app.app_context():
+        user = User(username='forecastreader', email='forecastreader@test.com', is_active=True)
+        user.set_password('Forecast#Reader24')
+        db.session.add(user)
+        db.session.commit()
+
+        fast = Book(title='Fast', author='A', user_id=user.id, page_count=400)
+        slow = Book(title='Slow', author='B', user_id=user.id, page_count=300)
+        unknown = Book(title='No pages', author='C', user_id=user.id)
+        done = Book(title='Done', author='D', user_id=user.id, finish_date=date(2024, 2, 1))
+        db.session.add_all([fast, slow, unknown, done])
+        db.session.commit()
+
+        # 30 pages a day for the last 60 days, split 3:1 between two books
+        for age in range(60):
+            day = TODAY - timedelta(days=age)
+            db.session.add(ReadingLog(user_id=user.id, book_id=fast.id, date=day, pages_read=3 if age < 30 else 0))
+            db.session.add(ReadingLog(user_id=user.id, book_id=slow.id, date=day, pages_read=1 if age < 30 else 0))
+        db.session.commit()
+        return user.id
+
+
+class TestForecasts:
+    """Pace and finish forecasts for currently reading books."""
+
+    def test_forecasts(self, app, reader):
+        with app.app_context():
+            forecasts = ForecastService(db.session).get_forecasts(reader, goal=4)
+            books = {entry['title']: entry for entry in forecasts['books']}
+            assert set(books) == {'Fast', 'Slow', 'No pages'}
+
+            fast, slow = books['Fast'], books['Slow']
+            assert (fast['pages_read'], fast['remaining_pages'], fast['percent_complete']) == (90, 310, 22.5)
+            assert fast['pages_per_day'] == pytest.approx(3 * slow['pages_per_day'], rel=0.01)
+            expected_days = -(-310 // fast['pages_per_day'])
+            assert fast['days_remaining'] == pytest.approx(expected_days, abs=1)
+            assert fast['forecast_finish_date'] == (TODAY + timedelta(days=fast['days_remaining'])).isoformat()
+
+            assert books['No pages']['forecast_finish_date'] is None
+            assert forecasts['pace']['pages_per_day_30d'] == 4.0
+
+            year = forecasts['year']
+            assert (year['finished'], year['goal'], year['books_needed']) == (1, 4, 3)
+            assert year['on_track'] is False
+
+    def test_forecasts_are_cached_until_a_new_log(self, app, reader):
+        with app.app_context():
+            service = ForecastService(db.session)
+            first = service.get_forecasts(reader)
+            assert service.get_forecasts(reader) is first
+
+            book_id = Book.query.filter_by(user_id=reader, title='No pages').first().id
+            db.session.add(ReadingLog(user_id=reader, book_id=book_id, date=TODAY, pages_read=10))
+            db.session.commit()
+            refreshed = service.get_forecasts(reader)
+            assert refreshed is not first
+            assert {entry['title']: entry for entry in refreshed['books']}['No pages']['pages_read'] == 10
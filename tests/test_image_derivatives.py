@@ -0,0 +1,104 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.models import db, User, Book
+from app.services import image_service
+from app.services.image_service import AVATAR_PROFILE, ImageTooLarge, InvalidImage, render_derivatives
+
+
+def image_bytes(size, color='red', image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def uploader(app, client, tmp_path):
+    """A logged-in pro user; images are processed in the test process and stored under tmp_path"""
+    app.config['COVER_STORE_DIR'] = str(tmp_path / 'covers')
+    app.config['AVATAR_STORE_DIR'] = str(tmp_path / 'avatars')
+    app.config['IMAGE_WORKERS'] = 0
+    with app.app_context():
+        user = User(username='uploader', email='uploader@test.com', is_active=True, is_pro=True)
+        user.set_password('Upload#Images24')
+        db.session.add(user)
+        db.session.commit()
+        book = Book(title='Dune', author='Frank Herbert', user_id=user.id)
+        db.session.add(book)
+        db.session.commit()
+        ids = user.id, book.uid
+    with client.session_transaction() as session:
+        session['_user_id'] = str(ids[0])
+        session['_fresh'] = True
+    return ids
+
+
+class TestDerivativePipeline:
+    """Images are decoded once, downscaled while decoding and stored as WebP and JPEG."""
+
+    def test_every_variant_in_every_format(self):
+        derivatives, size, _, _ = render_derivatives(image_bytes((3000, 1800), image_format='JPEG'), AVATAR_PROFILE)
+        assert size == (3000, 1800)
+        assert set(derivatives) == {(name, ext) for name in AVATAR_PROFILE.variants for ext in ('webp', 'jpg')}
+        for (name, ext), data in derivatives.items():
+            with Image.open(BytesIO(data)) as image:
+                assert image.format == {'webp': 'WEBP', 'jpg': 'JPEG'}[ext]
+                assert image.size == AVATAR_PROFILE.variants[name]
+
+    def test_large_jpegs_are_decoded_at_reduced_scale(self):
+        image, size = image_service.open_image(image_bytes((4000, 6000), image_format='JPEG'), (600, 900))
+        assert size == (4000, 6000)
+        assert 600 <= image.width <= 1000 and image.height >= 900 and image.mode == 'RGB'
+
+    def test_decompression_bombs_and_garbage_are_rejected(self, monkeypatch):
+        monkeypatch.setattr(image_service, 'MAX_IMAGE_PIXELS', 1000)
+        with pytest.raises(ImageTooLarge):
+            render_derivatives(image_bytes((40, 40)), AVATAR_PROFILE)
+        with pytest.raises(InvalidImage):
+            render_derivatives(b'not an image', AVATAR_PROFILE)
+
+
+class TestImageUploads:
+    """Uploads go through the pipeline and are served in the best format and size."""
+
+    def test_cover_upload_is_served_by_accept_and_width(self, app, client, uploader):
+        _, uid = uploader
+        response = client.post(f'/api/books/{uid}/cover',
+                               data={'cover_image': (BytesIO(image_bytes((800, 1200))), 'cover.png')})
+        assert response.status_code == 200
+        url = response.get_json()['data']['cover_image_url']
+        book = Book.query.filter_by(uid=uid).first()
+        assert book.cover_digest and url == f'/covers/{book.cover_digest}/grid'
+
+        webp = client.get(url, headers={'Accept': 'image/avif,image/webp,*/*'})
+        assert webp.mimetype == 'image/webp' and 'Accept' in webp.headers['Vary']
+        assert 'immutable' in webp.headers['Cache-Control']
+        jpeg = client.get(url, headers={'Accept': '*/*'})
+        assert jpeg.mimetype == 'image/jpeg' and len(webp.data) < len(jpeg.data)
+        with Image.open(BytesIO(client.get(f'{url}?w=90').data)) as image:
+            assert image.size == (100, 150)
+        explicit = client.get(f'/covers/{book.cover_digest}/full.webp', headers={'Accept': '*/*'})
+        assert explicit.mimetype == 'image/webp' and 'Accept' not in explicit.headers.get('Vary', '')
+        assert client.get(f'/covers/{book.cover_digest}/full.png').status_code == 404
+
+        rejected = client.post(f'/api/books/{uid}/cover', data={'cover_image': (BytesIO(b'junk'), 'cover.png')})
+        assert rejected.status_code == 400
+
+    def test_profile_picture_upload_and_delete(self, app, client, uploader):
+        response = client.post('/api/user/profile-picture',
+                               data={'profile_picture': (BytesIO(image_bytes((900, 600), 'blue')), 'me.gif')})
+        assert response.status_code == 200
+        url = response.get_json()['data']['profile_picture']
+        assert url.startswith('/avatars/') and url.endswith('/medium')
+        with Image.open(BytesIO(client.get(url, headers={'Accept': 'image/webp'}).data)) as image:
+            assert image.format == 'WEBP' and image.size == (160, 160)
+
+        stored = os.path.dirname(image_service.derivative_path(app.config['AVATAR_STORE_DIR'],
+                                                               image_service.avatar_digest(url), 'medium'))
+        assert os.path.isdir(stored)
+        assert client.delete('/api/user/profile-picture').status_code == 200
+        assert not os.path.exists(stored)
+        assert client.get(url).status_code == 404
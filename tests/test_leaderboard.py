@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import db, User, Book
+from app.services import user_service
+from app.services.user_service import UserService
+from tests.conftest import capture_selects
+
+
+def make_reader(name, finished_days_ago=(), reading=0, sharing=True):
+    user = User(username=name, email=f'{name}@test.com', is_active=True, share_reading_activity=sharing)
+    user.set_password('Leaderboard#2024')
+    db.session.add(user)
+    db.session.commit()
+    for index, days_ago in enumerate(finished_days_ago):
+        db.session.add(Book(title=f'{name} done {index}', author='A', user_id=user.id,
+                            finish_date=date.today() - timedelta(days=days_ago)))
+    for index in range(reading):
+        db.session.add(Book(title=f'{name} reading {index}', author='A', user_id=user.id))
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def readers(app):
+    with app.app_context():
+        return {
+            'steady': make_reader('steady', finished_days_ago=(400, 500), reading=1),
+            'recent': make_reader('recent', finished_days_ago=(0, 0, 0)),
+            'private': make_reader('private', finished_days_ago=(0,) * 5, sharing=False),
+        }
+
+
+class TestLeaderboard:
+    """The active-readers leaderboard is a constant number of queries."""
+
+    def test_ranking_and_counts(self, app, readers):
+        with app.app_context():
+            board = UserService(db.session).get_leaderboard('year')
+            ranked = [(entry['rank'], entry['user'].id) for entry in board['entries']]
+            assert ranked == [(1, readers['recent']), (2, readers['steady'])]
+            steady = board['entries'][1]
+            assert (steady['books_finished'], steady['currently_reading'], steady['total_books']) == (0, 1, 3)
+            assert steady['books_read'] == 2
+            assert board['total'] == 2
+
+            second_page = UserService(db.session).get_leaderboard('year', page=2, per_page=1)
+            assert [entry['rank'] for entry in second_page['entries']] == [2]
+            assert second_page['pages'] == 2
+
+            with pytest.raises(ValueError):
+                UserService(db.session).get_leaderboard('decade')
+
+    def test_query_count_is_constant(self, app, readers):
+        with app.app_context():
+            with capture_selects() as before:
+                UserService(db.session).get_leaderboard()
+            for index in range(5):
+                make_reader(f'extra{index}', finished_days_ago=(1,), reading=1)
+            with capture_selects() as after:
+                UserService(db.session).get_leaderboard()
+            assert len(after) == len(before) == 2
+
+    def test_api_pagination(self, app, client, readers):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(readers['steady'])
+            session['_fresh'] = True
+        response = client.get('/api/community/active-readers?window=week&per_page=1')
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body['data'][0]['user']['id'] == readers['recent']
+        assert body['pagination']['total'] == 2
+        assert client.get('/api/community/active-readers?window=decade').status_code == 400
+
+    def test_future_finishes_do_not_count(self, app, readers):
+        with app.app_context():
+            db.session.add(Book(title='Planned', author='A', user_id=readers['steady'],
+                                finish_date=date.today() + timedelta(days=1)))
+            db.session.commit()
+            steady, = [entry for entry in UserService(db.session).get_leaderboard('year')['entries']
+                       if entry['user'].id == readers['steady']]
+            assert (steady['books_finished'], steady['books_this_month']) == (0, 0)
+
+    def test_windows_follow_the_configured_day(self, app, readers, monkeypatch):
+        # Where the configured time zone is still on yesterday, today's finishes have not happened yet
+        monkeypatch.setattr(user_service, 'configured_today', lambda: date.today() - timedelta(days=1))
+        with app.app_context():
+            recent, = [entry for entry in UserService(db.session).get_leaderboard('year')['entries']
+                       if entry['user'].id == readers['recent']]
+            assert (recent['books_finished'], recent['books_read']) == (0, 3)
+
+    def test_page_has_ranks_windows_and_pages(self, app, client, readers):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(readers['steady'])
+            session['_fresh'] = True
+        with app.app_context():
+            for index in range(50):
+                make_reader(f'extra{index}', finished_days_ago=(1,))
+        page = client.get('/community_activity/active_readers?window=year').get_data(as_text=True)
+        assert 'Finished This Year' in page and '<td>50</td>' in page
+        assert '/community_activity/active_readers?window=week' in page
+        assert '/community_activity/active_readers?window=year&amp;page=2' in page
+        last = client.get('/community_activity/active_readers?window=year&page=2').get_data(as_text=True)
+        assert '<td>52</td>' in last and 'page=1' in last and 'page=3' not in last
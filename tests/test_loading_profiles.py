@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+import pytest
+from flask import g
+
+from app.models import db, Book, ReadingLog, UserRating
+from app.services.loading import lazy_load_guard, LazyLoadError
+from tests.conftest import capture_selects, make_user
+
+
+# Readers share their activity, so their logs appear in the community feeds
+SHARING = {'share_reading_activity': True, 'share_current_reading': True}
+
+
+@pytest.fixture
+def busy_book(app):
+    """One book rated by several readers, and fifty shared reading logs."""
+    with app.app_context():
+        owner = make_user('owner', **SHARING)
+        book = Book(title='Popular', author='A', user_id=owner.id, start_date=date.today())
+        db.session.add(book)
+        db.session.commit()
+        for index in range(5):
+            rater = make_user(f'rater{index}', **SHARING)
+            db.session.add(UserRating(user_id=rater.id, book_id=book.id, rating=index + 1))
+        for days_ago in range(50):
+            db.session.add(ReadingLog(user_id=owner.id, book_id=book.id,
+                                      date=date.today() - timedelta(days=days_ago), pages_read=5))
+        db.session.commit()
+        return {'owner': owner.id, 'book': book.id}
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+class TestLoadingProfiles:
+    """List views load their relationships up front instead of per row."""
+
+    def test_book_ratings_do_not_query_per_rater(self, app, client, busy_book):
+        app.config['LAZY_LOAD_GUARD'] = 'raise'
+        with app.app_context(), capture_selects() as statements:
+            body = client.get(f"/api/books/{busy_book['book']}/ratings").get_json()
+        assert sorted(rating['user']['username'] for rating in body['data']['ratings']) == \
+            [f'rater{index}' for index in range(5)]
+        # Setup check, the book, then ratings joined with their users
+        assert len(statements) == 3
+        assert not any('WHERE user.id = ?' in statement for statement, _ in statements)
+
+    def test_activity_list_costs_a_constant_number_of_queries(self, app, client, busy_book):
+        app.config['LAZY_LOAD_GUARD'] = 'raise'
+        log_in(client, busy_book['owner'])
+        with app.app_context(), capture_selects() as statements:
+            response = client.get('/community_activity/recent_activity')
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count('read "Popular"') == 8  # last 7 days, inclusive
+        assert len(statements) <= 4
+
+        with app.app_context(), capture_selects() as statements:
+            assert client.get('/auth/my_activity').status_code == 200
+        assert not any('FROM book \nWHERE book.id = ?' in statement for statement, _ in statements)
+
+    def test_guard_flags_lazy_loads(self, app, busy_book):
+        @lazy_load_guard
+        def list_view():
+            return [log.book.title for log in ReadingLog.query.limit(2)]
+
+        with app.test_request_context('/list'):
+            app.config['LAZY_LOAD_GUARD'] = 'warn'
+            assert list_view() == ['Popular', 'Popular']
+            assert len(g.lazy_loads) == 1
+
+            db.session.expunge_all()
+            app.config['LAZY_LOAD_GUARD'] = 'raise'
+            with pytest.raises(LazyLoadError):
+                list_view()
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from PIL import Image
+
+from app import utils
+from tests.conftest import cover_bytes, FakeResponse
+
+
+def cover_url(delay, color):
+    return f'https://covers.test/{delay}/{color}'
+
+
+@pytest.fixture
+def slow_covers(monkeypatch):
+    """Each URL ends in '<delay>/<color>'; the fake download sleeps for delay seconds."""
+    def fake_get(url, timeout=None):
+        delay, color = url.split('/')[-2:]
+        time.sleep(float(delay))
+        return FakeResponse(cover_bytes(color, (40, 60), 'PNG'))
+    monkeypatch.setattr(utils.requests, 'get', fake_get)
+
+
+class TestCoverFetching:
+    """Wrap-up covers are fetched concurrently under one overall deadline."""
+
+    def test_covers_download_in_parallel(self, app, slow_covers):
+        with app.app_context():
+            started = time.monotonic()
+            covers = utils.fetch_covers([cover_url(0.3, 'red')] * 8, (20, 30), deadline=5)
+            elapsed = time.monotonic() - started
+        assert elapsed < 1.5
+        assert all(cover.size == (20, 30) for cover in covers)
+        assert covers[0].getpixel((0, 0))[:3] == (255, 0, 0)
+
+    def test_late_and_missing_covers_are_skipped(self, app, slow_covers):
+        with app.app_context():
+            started = time.monotonic()
+            covers = utils.fetch_covers([cover_url(0, 'blue'), cover_url(3, 'green'), None], (20, 30), deadline=0.5)
+            elapsed = time.monotonic() - started
+        assert elapsed < 1.5
+        assert covers[0] is not None
+        assert covers[1] is None and covers[2] is None
+
+    def test_image_uses_placeholders(self, app, slow_covers):
+        class Entry:
+            def __init__(self, cover_url):
+                self.cover_url = cover_url
+
+        app.config['COVER_FETCH_DEADLINE'] = 0.5
+        with app.app_context():
+            image = utils.generate_month_review_image([Entry(cover_url(0, 'blue')), Entry(cover_url(3, 'green'))], 5, 2024)
+        assert image.size == (1080, 1080)
+
+
+class TestCollageSources:
+    """Only stored cover variants are read from disk; other local paths get a placeholder."""
+
+    def test_local_cover_urls_are_not_read(self, app, tmp_path):
+        class Entry:
+            def __init__(self, cover_url, cover_digest=None):
+                self.cover_url = cover_url
+                self.cover_digest = cover_digest
+
+        secret = tmp_path / 'avatar.png'
+        Image.new('RGB', (40, 60), 'red').save(secret)
+        layout = utils.collage_layout(3, *utils.MONTH_COVER_WIDTHS)
+        with app.app_context():
+            sources = utils.collage_sources(
+                [Entry(str(secret)), Entry('/static/uploads/profiles/me.png'), Entry(cover_url(0, 'red'))], layout)
+            assert sources == [None, None, cover_url(0, 'red')]
+            # The renderer refuses paths outside the store layout even if handed one directly
+            assert utils.fetch_covers([str(secret)], (20, 30), deadline=1) == [None]
+
+
+class TestCollageRenderer:
+    """The renderer prepares its artwork once and only does per-collage work on render."""
+
+    def test_assets_are_loaded_once(self, app, slow_covers, monkeypatch):
+        with app.app_context():
+            renderer = utils.CollageRenderer()
+            font_loads, opened = [], []
+            monkeypatch.setattr(utils.ImageFont, 'truetype', lambda *args: font_loads.append(args))
+            monkeypatch.setattr(utils.Image, 'open', lambda *args: opened.append(args))
+            year = time.localtime().tm_year
+            for month in (1, 5, 9):
+                title = utils.month_review_title(month, year)
+                image, missing = renderer.render([], title, utils.collage_layout(0, 200, 80), 1)
+                assert image.size == (1080, 1080) and missing == 0
+        assert font_loads == [] and opened == []
+
+    def test_titles_fit_the_canvas(self, app):
+        with app.app_context():
+            renderer = utils.CollageRenderer()
+            for month in range(1, 13):
+                size, width = renderer._title_size(utils.month_review_title(month, 2024))
+                assert width <= renderer.max_title_width and size <= renderer.max_font_size
+            assert utils.get_collage_renderer() is utils.get_collage_renderer()
+
+
+class TestCollageLayout:
+    """Covers are tiled as large as the canvas allows, then paginated."""
+
+    def test_small_months_keep_the_classic_grid(self):
+        layout = utils.collage_layout(5, *utils.MONTH_COVER_WIDTHS)
+        assert (layout.cover_w, layout.cover_h, layout.cols, layout.pages) == (200, 300, 4, 1)
+
+    def test_busy_months_shrink_to_fit(self):
+        layout = utils.collage_layout(20, *utils.MONTH_COVER_WIDTHS)
+        assert layout.pages == 1 and layout.per_page >= 20 and layout.cover_w < 200
+        rows = -(-20 // layout.cols)
+        grid_h = rows * layout.cover_h + (rows - 1) * layout.padding
+        grid_w = layout.cols * layout.cover_w + (layout.cols - 1) * layout.padding
+        assert utils.COLLAGE_HEADER + grid_h <= utils.COLLAGE_SIZE - utils.COLLAGE_MARGIN
+        assert grid_w <= utils.COLLAGE_SIZE - 2 * utils.COLLAGE_MARGIN
+
+    def test_large_years_paginate(self):
+        layout = utils.collage_layout(450, *utils.YEAR_COVER_WIDTHS)
+        assert layout.cover_w == utils.YEAR_COVER_WIDTHS[1]
+        assert layout.pages == -(-450 // layout.per_page) and layout.pages > 1
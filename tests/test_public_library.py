@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import db, User, Book
+from app.services.cover_service import CoverService
+from app.services.public_library_service import PublicLibraryService
+from tests.conftest import capture_selects, assert_no_full_scans, make_user
+
+
+@pytest.fixture
+def libraries(app):
+    with app.app_context():
+        sharer = make_user('sharer', share_library=True).id
+        private = make_user('private', share_library=False).id
+        today = date.today()
+        db.session.add_all([
+            Book(title='Finished old', author='A', user_id=sharer, finish_date=today - timedelta(days=9)),
+            Book(title='Finished new', author='A', user_id=sharer, finish_date=today),
+            Book(title='Reading', author='A', user_id=sharer, start_date=today),
+            Book(title='Wishlist', author='A', user_id=sharer, want_to_read=True),
+            Book(title='Shelf only', author='A', user_id=sharer, library_only=True),
+            Book(title='Secret', author='B', user_id=private, finish_date=today),
+        ])
+        db.session.commit()
+        return {'sharer': sharer, 'private': private}
+
+
+def titles(page):
+    return [book['title'] for book in page['books']]
+
+
+class TestPublicLibrary:
+    """Public library pages are keyset-paginated, projected and cached."""
+
+    def test_walks_every_page_in_order(self, app, libraries):
+        with app.app_context():
+            service = PublicLibraryService(db.session)
+            seen, cursor = [], None
+            while True:
+                page = service.get_page('all', cursor, limit=1)
+                seen += titles(page)
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            assert seen == ['Finished new', 'Finished old', 'Wishlist', 'Reading']
+            assert 'description' not in page['books'][0]
+
+            assert titles(service.get_page('currently_reading')) == ['Reading']
+            assert titles(service.get_page('want_to_read')) == ['Wishlist']
+            with pytest.raises(ValueError):
+                service.get_page('everything')
+            with pytest.raises(ValueError):
+                service.get_page('all', 'garbage')
+
+    def test_pages_are_cached_per_public_library_version(self, app, libraries):
+        with app.app_context():
+            service = PublicLibraryService(db.session)
+            first = service.get_page('all')
+            with capture_selects() as statements:
+                assert service.get_page('all') is first
+            assert len(statements) == 1
+
+            db.session.add(Book(title='Hidden too', author='B', user_id=libraries['private']))
+            db.session.commit()
+            assert service.get_page('all') is first
+
+            db.session.add(Book(title='Another', author='A', user_id=libraries['sharer']))
+            db.session.commit()
+            assert 'Another' in titles(service.get_page('all'))
+
+            db.session.get(User, libraries['private']).share_library = True
+            db.session.commit()
+            assert 'Secret' in titles(service.get_page('all'))
+
+    def test_mirrored_covers_replace_cached_pages(self, app, libraries, upstream):
+        with app.app_context():
+            book = Book.query.filter_by(title='Reading').first()
+            book.cover_url = 'https://covers.test/red.jpg'
+            db.session.commit()
+            service = PublicLibraryService(db.session)
+            before, = service.get_page('currently_reading')['books']
+            assert before['cover_url'] == 'https://covers.test/red.jpg' and before['cover_placeholder'] is None
+
+            CoverService(db.session).mirror()
+            after, = service.get_page('currently_reading')['books']
+            assert after['cover_url'].startswith('/covers/') and after['cover_placeholder']
+
+    def test_pages_do_not_scan_the_book_table(self, app, libraries):
+        with app.app_context():
+            service = PublicLibraryService(db.session)
+            with capture_selects() as statements:
+                for filter_status in ('all', 'currently_reading', 'want_to_read'):
+                    service.get_page(filter_status, limit=1)
+                service.get_page('all', 'n:3', limit=1)
+            assert_no_full_scans([s for s in statements if 'FROM book' in s[0]])
+
+    def test_api_and_page(self, app, client, libraries):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(libraries['sharer'])
+            session['_fresh'] = True
+        body = client.get('/api/books/public?limit=2').get_json()
+        assert [book['title'] for book in body['data']] == ['Finished new', 'Finished old']
+        assert body['pagination']['next_cursor']
+        assert client.get('/api/books/public?filter=bogus').status_code == 400
+
+        html = client.get('/public-library').get_data(as_text=True)
+        assert 'Finished new' in html and 'Secret' not in html
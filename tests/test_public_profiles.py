@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+
+from app.models import db, User, Book
+from app.services.profile_service import ProfileService
+from tests.conftest import capture_selects, assert_no_full_scans
+
+
+@pytest.fixture
+def profile_user(app):
+    with app.app_context():
+        user = User(username='famous', email='famous@test.com', is_active=True, share_reading_activity=True)
+        user.set_password('Profile#Reader24')
+        db.session.add(user)
+        db.session.commit()
+        for index in range(5):
+            db.session.add(Book(title=f'Book {index}', author='A', user_id=user.id,
+                                description='Long text ' * 50,
+                                finish_date=date.today() if index < 2 else None))
+        db.session.commit()
+        return user.id
+
+
+class TestPublicProfiles:
+    """Profile summaries come from materialized stats and are cached per user."""
+
+    def test_summary_and_cache(self, app, profile_user):
+        with app.app_context():
+            service = ProfileService(db.session)
+            summary = service.get_summary(profile_user)
+            assert (summary['total_books'], summary['finished_books']) == (5, 2)
+            assert [book['title'] for book in summary['books']] == [f'Book {index}' for index in range(4, -1, -1)]
+            assert 'description' not in summary['books'][0]
+
+            with capture_selects() as statements:
+                assert service.get_summary(profile_user) is summary
+            assert len(statements) == 1
+
+            db.session.add(Book(title='Newest', author='A', user_id=profile_user))
+            db.session.commit()
+            refreshed = service.get_summary(profile_user)
+            assert refreshed['total_books'] == 6
+            assert refreshed['books'][0]['title'] == 'Newest'
+
+            app.config['PROFILE_CACHE_TTL'] = 0
+            assert service.get_summary(profile_user) is not refreshed
+
+    def test_books_are_paginated(self, app, profile_user):
+        with app.app_context():
+            service = ProfileService(db.session)
+            titles, cursor = [], None
+            with capture_selects() as statements:
+                while True:
+                    page = service.get_books(profile_user, before=cursor, limit=2)
+                    titles += [book['title'] for book in page['books']]
+                    cursor = page['next_cursor']
+                    if cursor is None:
+                        break
+            assert titles == [f'Book {index}' for index in range(4, -1, -1)]
+            assert_no_full_scans(statements)
+
+    def test_private_profiles_are_hidden(self, app, client, profile_user):
+        with app.app_context():
+            user = db.session.get(User, profile_user)
+            user.share_reading_activity = False
+            db.session.commit()
+            assert ProfileService(db.session).get_summary(profile_user) is None
+
+        with client.session_transaction() as session:
+            session['_user_id'] = str(profile_user)
+            session['_fresh'] = True
+        assert client.get(f'/api/user/{profile_user}/profile').status_code == 404
+        assert client.get(f'/api/user/{profile_user}/profile/books').status_code == 404
+
+    def test_api_and_page(self, app, client, profile_user):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(profile_user)
+            session['_fresh'] = True
+        body = client.get(f'/api/user/{profile_user}/profile/books?limit=3').get_json()
+        assert len(body['data']) == 3 and body['pagination']['next_cursor']
+        assert client.get(f'/api/user/{profile_user}/profile').get_json()['data']['finished_books'] == 2
+        assert client.get(f'/user/{profile_user}/profile').status_code == 200
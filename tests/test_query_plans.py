@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import db, User, Book, ReadingLog, UserRating, SharedBookData
+from app.services.book_service import BookService
+from app.services.user_service import UserService
+from app.services.analytics_service import AnalyticsService
+from tests.conftest import capture_selects, assert_no_full_scans
+
+
+@pytest.fixture
+def reader(app):
+    """A sharing user with a small library, a rating and a reading log."""
+    with app.app_context():
+        user = User(username='planreader', email='planreader@test.com', is_active=True,
+                    share_reading_activity=True, share_current_reading=True, share_library=True)
+        user.set_password('PlanReader#2024x')
+        db.session.add(user)
+        db.session.commit()
+
+        shared = SharedBookData(title='Indexed', author='Planner', isbn='9780000000001', created_by=user.id)
+        db.session.add(shared)
+        db.session.commit()
+
+        finished = Book(title='Indexed', author='Planner', user_id=user.id, isbn='9780000000001',
+                        shared_book_id=shared.id, start_date=date.today() - timedelta(days=3),
+                        finish_date=date.today())
+        reading = Book(title='Scanning', author='Planner', user_id=user.id, isbn='9780000000002',
+                       start_date=date.today())
+        db.session.add_all([finished, reading])
+        db.session.commit()
+
+        db.session.add(ReadingLog(book_id=reading.id, user_id=user.id, date=date.today(), pages_read=12))
+        db.session.add(UserRating(user_id=user.id, book_id=finished.id, rating=4))
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def logged_in_client(client, reader):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(reader)
+        session['_fresh'] = True
+    return client
+
+
+class TestServiceQueryPlans:
+    """Key service queries must be served by an index."""
+
+    def test_book_service_queries(self, app, reader):
+        with app.app_context():
+            service = BookService(db.session)
+            uid = Book.query.filter_by(user_id=reader, isbn='9780000000002').first().uid
+            with capture_selects() as statements:
+                service._get_existing_book('9780000000001')
+                SharedBookData.find_by_isbn('9780000000001')
+                for status in ('currently_reading', 'finished', 'want_to_read', 'library_only'):
+                    service.get_user_books(reader, {'status': status})
+                service.log_reading(uid, reader, 20)
+            assert_no_full_scans(statements)
+
+    def test_user_service_queries(self, app, reader):
+        with app.app_context():
+            service = UserService(db.session)
+            with capture_selects() as statements:
+                service.get_user_statistics(reader)
+                service.get_user_profile(reader)
+                service.get_user_reading_history(reader)
+                service.get_active_readers()
+                service.get_books_this_month()
+                service.get_currently_reading()
+                service.get_recent_activity()
+            assert_no_full_scans(statements)
+
+    def test_analytics_queries(self, app, reader):
+        with app.app_context():
+            with capture_selects() as statements:
+                AnalyticsService(db.session).get_analytics(reader)
+            assert_no_full_scans(statements)
+
+    def test_rating_queries(self, app, reader):
+        with app.app_context():
+            book = Book.query.filter_by(user_id=reader, isbn='9780000000001').first()
+            with capture_selects() as statements:
+                book.update_average_rating()
+                book.get_user_rating(reader)
+            assert_no_full_scans(statements)
+
+
+class TestRouteQueryPlans:
+    """Dashboard and community pages must not regress to full table scans."""
+
+    @pytest.mark.parametrize('path', [
+        '/',
+        '/community_activity',
+        '/community_activity/active_readers',
+        '/community_activity/books_this_month',
+        '/community_activity/currently_reading',
+        '/community_activity/recent_activity',
+    ])
+    def test_page_queries(self, app, logged_in_client, reader, path):
+        with capture_selects() as statements:
+            response = logged_in_client.get(path)
+        assert response.status_code == 200
+        assert_no_full_scans(statements)
+
+    def test_user_profile_queries(self, app, logged_in_client, reader):
+        with capture_selects() as statements:
+            response = logged_in_client.get(f'/user/{reader}/profile')
+        assert response.status_code == 200
+        assert_no_full_scans(statements)
+
+
+class TestIndexMigration:
+    """The migration system creates declared indexes on existing databases."""
+
+    def test_missing_index_is_created(self, app):
+        from sqlalchemy import inspect
+        from app import run_index_migration
+
+        with app.app_context():
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql("DROP INDEX ix_reading_log_user_date")
+            run_index_migration(db.engine)
+            names = {index['name'] for index in inspect(db.engine).get_indexes('reading_log')}
+            assert 'ix_reading_log_user_date' in names
@@ -0,0 +1,222 @@
+import pytest
+
+from app.models import db, User, Book, BookRatingStats, SharedBookData, UserRating
+from app.services.catalog_service import CatalogService
+from app.services.rating_service import RatingService
+from tests.conftest import capture_selects
+
+
+@pytest.fixture
+def rated_book(app):
+    """A book with ratings from four readers: 5, 4, 4, 2."""
+    with app.app_context():
+        users = []
+        for index in range(5):
+            user = User(username=f'rater{index}', email=f'rater{index}@test.com', is_active=True)
+            user.set_password('Rating#Reader24')
+            db.session.add(user)
+            users.append(user)
+        db.session.commit()
+        book = Book(title='Rated', author='A', user_id=users[0].id)
+        db.session.add(book)
+        db.session.commit()
+        for user, stars in zip(users, (5, 4, 4, 2)):
+            db.session.add(UserRating(user_id=user.id, book_id=book.id, rating=stars))
+        db.session.commit()
+        return book.id, [user.id for user in users]
+
+
+def summary(book_id):
+    return RatingService(db.session).get_rating_summary(book_id)
+
+
+class TestRatingAggregates:
+    """Rating aggregates move with each rating write instead of being recomputed."""
+
+    def test_add_update_delete(self, app, rated_book):
+        book_id, user_ids = rated_book
+        with app.app_context():
+            assert summary(book_id) == {'average_rating': 3.8, 'rating_count': 4,
+                                        'histogram': {1: 0, 2: 1, 3: 0, 4: 2, 5: 1}}
+            book = db.session.get(Book, book_id)
+            assert (book.average_rating, book.rating_count) == (3.8, 4)
+
+            rating = UserRating.query.filter_by(user_id=user_ids[3], book_id=book_id).first()
+            rating.rating = 5
+            db.session.commit()
+            assert summary(book_id)['histogram'] == {1: 0, 2: 0, 3: 0, 4: 2, 5: 2}
+            assert db.session.get(Book, book_id).average_rating == 4.5
+
+            rating.review = 'Changed my mind about the review only'
+            db.session.commit()
+            assert summary(book_id)['rating_count'] == 4
+
+            for rating in UserRating.query.filter_by(book_id=book_id).all():
+                db.session.delete(rating)
+            db.session.commit()
+            assert summary(book_id)['rating_count'] == 0
+            book = db.session.get(Book, book_id)
+            assert (book.average_rating, book.rating_count) == (None, 0)
+
+    def test_loaded_book_sees_new_aggregates(self, app, rated_book):
+        book_id, user_ids = rated_book
+        with app.app_context():
+            book = db.session.get(Book, book_id)
+            assert book.rating_count == 4
+            db.session.add(UserRating(user_id=user_ids[4], book_id=book_id, rating=1))
+            db.session.flush()
+            assert (book.average_rating, book.rating_count) == (3.2, 5)
+
+    def test_rollback_discards_deltas(self, app, rated_book):
+        book_id, user_ids = rated_book
+        with app.app_context():
+            db.session.add(UserRating(user_id=user_ids[4], book_id=book_id, rating=1))
+            db.session.flush()
+            db.session.rollback()
+            assert summary(book_id)['rating_count'] == 4
+
+    def test_write_does_not_read_all_ratings(self, app, rated_book):
+        book_id, user_ids = rated_book
+        with app.app_context():
+            with capture_selects() as statements:
+                db.session.add(UserRating(user_id=user_ids[4], book_id=book_id, rating=1))
+                db.session.commit()
+            assert not [statement for statement, _ in statements
+                        if 'FROM user_rating' in statement]
+            assert summary(book_id)['histogram'][1] == 1
+
+    def test_rebuild_repairs_drift(self, app, rated_book):
+        book_id, _ = rated_book
+        with app.app_context():
+            stats = db.session.get(BookRatingStats, book_id)
+            stats.rating_count, stats.stars_5 = 40, 9
+            db.session.commit()
+
+            assert RatingService(db.session).rebuild_all() == 1
+            assert summary(book_id)['histogram'] == {1: 0, 2: 1, 3: 0, 4: 2, 5: 1}
+            db.session.get(Book, book_id).update_average_rating()
+            assert db.session.get(Book, book_id).rating_count == 4
+
+    def test_rebuild_resets_books_without_ratings(self, app, rated_book):
+        book_id, user_ids = rated_book
+        with app.app_context():
+            unrated = Book(title='Unrated', author='B', user_id=user_ids[0], average_rating=4.5, rating_count=3)
+            db.session.add(unrated)
+            db.session.commit()
+
+            RatingService(db.session).rebuild_all()
+            assert (unrated.average_rating, unrated.rating_count) == (None, 0)
+            assert db.session.get(Book, book_id).rating_count == 4
+
+    def test_api_reports_histogram(self, app, client, rated_book):
+        book_id, user_ids = rated_book
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_ids[0])
+            session['_fresh'] = True
+        body = client.post(f'/api/books/{book_id}/rate', json={'rating': 1}).get_json()
+        assert body['data']['rating_count'] == 4
+        assert body['data']['histogram'] == {'1': 1, '2': 1, '3': 0, '4': 2, '5': 0}
+        body = client.get(f'/api/books/{book_id}/ratings').get_json()
+        assert body['data']['average_rating'] == 2.8
+
+
+@pytest.fixture
+def catalog(app):
+    """Three readers with their own copies of one title, two of them linked to a shared record."""
+    with app.app_context():
+        users = []
+        for index in range(3):
+            user = User(username=f'copy{index}', email=f'copy{index}@test.com', is_active=True)
+            user.set_password('Catalog#Reader24')
+            db.session.add(user)
+            users.append(user)
+        db.session.commit()
+        shared = SharedBookData(title='Dune', author='Frank Herbert', isbn='9780441013593', created_by=users[0].id)
+        db.session.add(shared)
+        db.session.commit()
+        books = [Book(title='Dune', author='Frank Herbert', isbn='9780441013593', user_id=user.id,
+                      shared_book_id=shared.id if index < 2 else None)
+                 for index, user in enumerate(users)]
+        db.session.add_all(books)
+        db.session.commit()
+        for user, book, stars in zip(users, books, (5, 3, 4)):
+            db.session.add(UserRating(user_id=user.id, book_id=book.id, rating=stars))
+        db.session.commit()
+        return shared.id, [book.id for book in books]
+
+
+def catalog_summary(shared_id):
+    return RatingService(db.session).get_shared_rating_summary(shared_id)
+
+
+class TestCatalogRatingAggregates:
+    """Ratings on every user's copy roll up to the shared catalog record."""
+
+    def test_ratings_roll_up(self, app, catalog):
+        shared_id, book_ids = catalog
+        with app.app_context():
+            assert catalog_summary(shared_id) == {'average_rating': 4.0, 'rating_count': 2,
+                                                  'histogram': {1: 0, 2: 0, 3: 1, 4: 0, 5: 1}}
+
+            rating = UserRating.query.filter_by(book_id=book_ids[1]).first()
+            rating.rating = 1
+            db.session.commit()
+            assert catalog_summary(shared_id)['histogram'] == {1: 1, 2: 0, 3: 0, 4: 0, 5: 1}
+
+            with capture_selects() as statements:
+                assert catalog_summary(shared_id)['rating_count'] == 2
+            assert len(statements) == 1 and 'FROM shared_book_rating_stats' in statements[0][0]
+
+    def test_relinking_moves_ratings(self, app, catalog):
+        shared_id, book_ids = catalog
+        with app.app_context():
+            db.session.get(Book, book_ids[2]).shared_book_id = shared_id
+            db.session.commit()
+            assert catalog_summary(shared_id)['rating_count'] == 3
+
+            db.session.get(Book, book_ids[0]).shared_book_id = None
+            db.session.commit()
+            assert catalog_summary(shared_id) == {'average_rating': 3.5, 'rating_count': 2,
+                                                  'histogram': {1: 0, 2: 0, 3: 1, 4: 1, 5: 0}}
+
+    def test_link_books_backfill(self, app, catalog):
+        shared_id, book_ids = catalog
+        with app.app_context():
+            owner = db.session.get(Book, book_ids[0]).user_id
+            db.session.add(Book(title='No ISBN', author='Someone', user_id=owner))
+            db.session.add(Book(title='no isbn', author='SOMEONE', user_id=owner))
+            db.session.commit()
+
+            result = CatalogService(db.session).link_books(batch_size=2)
+            assert (result['linked'], result['created']) == (3, 1)
+            assert db.session.get(Book, book_ids[2]).shared_book_id == shared_id
+            assert catalog_summary(shared_id)['rating_count'] == 3
+            manual = {book.shared_book_id for book in Book.query.filter_by(author='Someone').all()} | \
+                     {book.shared_book_id for book in Book.query.filter_by(author='SOMEONE').all()}
+            assert len(manual) == 1 and None not in manual
+
+    def test_titles_match_beyond_ascii(self, app, catalog):
+        _, book_ids = catalog
+        with app.app_context():
+            owner = db.session.get(Book, book_ids[0]).user_id
+            db.session.add(Book(title='Éléments', author='Ödön', user_id=owner))
+            db.session.add(Book(title='ÉLÉMENTS', author='ÖDÖN', user_id=owner))
+            db.session.commit()
+
+            # The second copy is in its own batch, so it is matched against the stored record
+            result = CatalogService(db.session).link_books(batch_size=2)
+            assert (result['linked'], result['created']) == (3, 1)
+            shared = SharedBookData.find_by_title_author('éléments', 'ödön')
+            linked = {book.shared_book_id for book in Book.query.filter(Book.title.in_(['Éléments', 'ÉLÉMENTS']))}
+            assert shared is not None and linked == {shared.id}
+
+    def test_api_reports_catalog_rating(self, app, client, catalog):
+        shared_id, book_ids = catalog
+        with app.app_context():
+            owner = db.session.get(Book, book_ids[0]).user_id
+        with client.session_transaction() as session:
+            session['_user_id'] = str(owner)
+            session['_fresh'] = True
+        body = client.get(f'/api/books/{book_ids[0]}/rate').get_json()
+        assert body['data']['rating_count'] == 1
+        assert body['data']['catalog']['rating_count'] == 2
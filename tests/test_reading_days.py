@@ -0,0 +1,108 @@
+from base64 import b64decode
+from datetime import date
+
+import pytest
+
+from app.models import db, Book, ReadingLog, ReadingDay
+from app.services.rollup_service import RollupService, backfill_reading_days
+from tests.conftest import make_user
+
+
+def rollup(user_id):
+    return {day.date: (day.pages, day.books)
+            for day in ReadingDay.query.filter_by(user_id=user_id).all()}
+
+
+def recomputed(user_id):
+    """What a full rebuild from reading_log would produce for this user."""
+    with db.engine.connect() as conn:
+        with conn.begin() as transaction:
+            backfill_reading_days(conn)
+            rows = conn.execute(
+                ReadingDay.__table__.select().where(ReadingDay.user_id == user_id)).fetchall()
+            transaction.rollback()
+    return {row.date: (row.pages, row.books) for row in rows}
+
+
+@pytest.fixture
+def reader(app):
+    with app.app_context():
+        user = make_user('rollupreader')
+        books = [Book(title=f'Book {n}', author='A', user_id=user.id) for n in range(2)]
+        db.session.add_all(books)
+        db.session.commit()
+        return user.id, [book.id for book in books]
+
+
+class TestReadingDayRollup:
+    """The daily rollup follows log writes exactly."""
+
+    def test_rollup_follows_log_changes(self, app, reader):
+        user_id, (first, second) = reader
+        with app.app_context():
+            db.session.add_all([
+                ReadingLog(user_id=user_id, book_id=first, date=date(2024, 1, 1), pages_read=10),
+                ReadingLog(user_id=user_id, book_id=second, date=date(2024, 1, 1), pages_read=5),
+                ReadingLog(user_id=user_id, book_id=first, date=date(2024, 1, 3), pages_read=7),
+            ])
+            db.session.commit()
+            assert rollup(user_id) == {date(2024, 1, 1): (15, 2), date(2024, 1, 3): (7, 1)}
+
+            entry = ReadingLog.query.filter_by(book_id=second).first()
+            db.session.commit()
+            entry.pages_read = 20
+            entry.date = date(2024, 1, 2)
+            db.session.commit()
+            assert rollup(user_id) == recomputed(user_id) == {
+                date(2024, 1, 1): (10, 1), date(2024, 1, 2): (20, 1), date(2024, 1, 3): (7, 1)}
+
+            db.session.delete(ReadingLog.query.filter_by(date=date(2024, 1, 3)).first())
+            db.session.commit()
+            assert date(2024, 1, 3) not in rollup(user_id)
+            assert RollupService(db.session).get_period_totals(
+                user_id, date(2024, 1, 1), date(2024, 1, 31)) == (30, 2)
+
+    def test_untracked_legacy_day_is_rebuilt_on_touch(self, app, reader):
+        user_id, (first, second) = reader
+        with app.app_context():
+            db.session.add(ReadingLog(user_id=user_id, book_id=first, date=date(2024, 2, 1), pages_read=12))
+            db.session.commit()
+            ReadingDay.query.delete()
+            db.session.commit()
+
+            db.session.add(ReadingLog(user_id=user_id, book_id=second, date=date(2024, 2, 1), pages_read=3))
+            db.session.commit()
+            assert rollup(user_id) == {date(2024, 2, 1): (15, 2)}
+
+
+class TestReadingHeatmap:
+    """The heatmap endpoint returns a presence bitmap plus packed pages."""
+
+    def test_heatmap_encoding(self, app, client, reader):
+        user_id, (first, second) = reader
+        with app.app_context():
+            db.session.add_all([
+                ReadingLog(user_id=user_id, book_id=first, date=date(2024, 1, 1), pages_read=10),
+                ReadingLog(user_id=user_id, book_id=first, date=date(2024, 12, 31), pages_read=70000),
+                ReadingLog(user_id=user_id, book_id=first, date=date(2023, 6, 1), pages_read=4),
+            ])
+            db.session.commit()
+
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        response = client.get('/api/user/reading-heatmap?start_year=2023&end_year=2024')
+        assert response.status_code == 200
+        years = {entry['year']: entry for entry in response.get_json()['data']['years']}
+
+        leap = years[2024]
+        bitmap = b64decode(leap['bitmap'])
+        assert len(bitmap) == 46
+        set_days = [i for i in range(366) if bitmap[i >> 3] & (0x80 >> (i & 7))]
+        assert set_days == [0, 365]
+        pages = b64decode(leap['pages'])
+        assert [int.from_bytes(pages[i:i + 2], 'little') for i in (0, 2)] == [10, 0xFFFF]
+        assert (leap['active_days'], leap['total_pages']) == (2, 70010)
+        assert years[2023]['active_days'] == 1
+
+        assert client.get('/api/user/reading-heatmap?start_year=2024&end_year=2020').status_code == 400
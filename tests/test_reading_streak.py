@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import db, User, Book, ReadingLog, ReadingStreak
+from app.services.book_service import BookService
+from app.services.streak_service import StreakService, compute_streak_state
+from tests.conftest import make_user
+
+
+DAY = timedelta(days=1)
+START = date(2024, 6, 1)
+
+
+def assert_matches_recompute(user_id):
+    """Incrementally maintained streak state must equal a full walk of the logs."""
+    streak = StreakService(db.session).get_streak_state(user_id)
+    expected = compute_streak_state(db.session.connection(), user_id)
+    for field, value in expected.items():
+        assert getattr(streak, field) == value, field
+    return streak
+
+
+@pytest.fixture
+def reader(app):
+    with app.app_context():
+        user = make_user('streakreader')
+        book = Book(title='Daily', author='A', user_id=user.id)
+        db.session.add(book)
+        db.session.commit()
+        return user.id, book.id
+
+
+def log(user_id, book_id, day, pages=10):
+    db.session.add(ReadingLog(user_id=user_id, book_id=book_id, date=day, pages_read=pages))
+    db.session.commit()
+
+
+def unlog(user_id, day):
+    for entry in ReadingLog.query.filter_by(user_id=user_id, date=day).all():
+        db.session.delete(entry)
+    db.session.commit()
+
+
+class TestReadingStreak:
+    """Persisted streak state follows log writes and deletes exactly."""
+
+    def test_appending_days_extends_the_run(self, app, reader):
+        user_id, book_id = reader
+        with app.app_context():
+            for offset in (0, 1, 2):
+                log(user_id, book_id, START + offset * DAY)
+            streak = assert_matches_recompute(user_id)
+            assert (streak.current_run, streak.longest_run, streak.last_log_date) == (3, 3, START + 2 * DAY)
+
+            log(user_id, book_id, START + 5 * DAY)
+            streak = assert_matches_recompute(user_id)
+            assert (streak.current_run, streak.longest_run) == (1, 3)
+
+            service = StreakService(db.session)
+            assert service.get_current_streak(user_id, today=START + 6 * DAY) == 1
+            assert service.get_current_streak(user_id, 4, today=START + 6 * DAY) == 5
+            assert service.get_current_streak(user_id, today=START + 7 * DAY) == 0
+
+    def test_out_of_order_and_deleted_days(self, app, reader):
+        user_id, book_id = reader
+        with app.app_context():
+            for offset in (0, 1, 3, 4, 5):
+                log(user_id, book_id, START + offset * DAY)
+            assert_matches_recompute(user_id)
+
+            # Filling the gap merges two runs
+            log(user_id, book_id, START + 2 * DAY)
+            assert assert_matches_recompute(user_id).current_run == 6
+
+            # A second log on an already-active day changes nothing
+            other = Book(title='Second', author='B', user_id=user_id)
+            db.session.add(other)
+            db.session.commit()
+            log(user_id, other.id, START + 5 * DAY)
+            assert assert_matches_recompute(user_id).current_run == 6
+
+            for offset in (5, 0, 3, 2, 4, 1):
+                unlog(user_id, START + offset * DAY)
+                assert_matches_recompute(user_id)
+            assert StreakService(db.session).get_streak_state(user_id).last_log_date is None
+
+    def test_moving_a_log_to_another_day(self, app, reader):
+        user_id, book_id = reader
+        with app.app_context():
+            log(user_id, book_id, START)
+            log(user_id, book_id, START + 2 * DAY)
+            entry = ReadingLog.query.filter_by(user_id=user_id, date=START + 2 * DAY).first()
+            db.session.commit()
+            entry.date = START + DAY
+            db.session.commit()
+            assert assert_matches_recompute(user_id).current_run == 2
+
+    def test_rows_are_created_by_writes_not_reads(self, app, reader):
+        user_id, book_id = reader
+        with app.app_context():
+            log(user_id, book_id, START)
+            ReadingStreak.query.filter_by(user_id=user_id).delete()
+            db.session.commit()
+
+            assert assert_matches_recompute(user_id).current_run == 1
+            db.session.rollback()
+            assert ReadingStreak.query.get(user_id) is None
+            log(user_id, book_id, START + DAY)
+            assert ReadingStreak.query.get(user_id).current_run == 2
+
+            # Library data goes first, as in the account deletion endpoint
+            assert BookService(db.session).delete_book(Book.query.get(book_id).uid, user_id)
+            db.session.delete(User.query.get(user_id))
+            db.session.commit()
+            assert ReadingStreak.query.get(user_id) is None
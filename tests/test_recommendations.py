@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from app.models import db, User, Book, SharedBookData, UserRating, JobRun, CommunitySnapshot
+from app.services.background import run_leased, last_run
+from app.services.cache import acquire_lease, release_lease
+from app.services.recommendation_service import (
+    RecommendationService, item_neighbors, interaction_weight, BUILD_SNAPSHOT_NAME
+)
+from tests.conftest import capture_selects, assert_no_full_scans
+
+
+LIBRARIES = {
+    'alice': ['Dune', 'Hyperion', 'Foundation'],
+    'bob': ['Dune', 'Hyperion', 'Neuromancer'],
+    'carol': ['Dune', 'Emma'],
+    # Not sharing: gets recommendations but does not contribute to them
+    'dave': ['Dune', 'Hyperion'],
+}
+
+
+@pytest.fixture
+def libraries(app):
+    with app.app_context():
+        owner = None
+        users = {}
+        for name, titles in LIBRARIES.items():
+            user = User(username=name, email=f'{name}@test.com', is_active=True, share_library=name != 'dave')
+            user.set_password('Similar#Reader24')
+            db.session.add(user)
+            db.session.commit()
+            users[name] = user.id
+            owner = owner or user.id
+        shared = {}
+        for title in sorted({title for titles in LIBRARIES.values() for title in titles}):
+            record = SharedBookData(title=title, author='Author', created_by=owner)
+            db.session.add(record)
+            db.session.commit()
+            shared[title] = record.id
+        books = {}
+        for name, titles in LIBRARIES.items():
+            for title in titles:
+                book = Book(title=title, author='Author', user_id=users[name], shared_book_id=shared[title])
+                db.session.add(book)
+                db.session.commit()
+                books[(name, title)] = book.uid
+        # Bob rated Neuromancer two stars
+        book_id = Book.query.filter_by(uid=books[('bob', 'Neuromancer')]).first().id
+        db.session.add(UserRating(user_id=users['bob'], book_id=book_id, rating=2))
+        db.session.commit()
+        return users, shared, books
+
+
+class TestItemNeighbors:
+    """The sparse build matches a dense cosine similarity computation."""
+
+    def test_matches_dense_cosine(self):
+        rng = np.random.default_rng(7)
+        dense = (rng.random((30, 12)) < 0.3) * rng.integers(1, 3, (30, 12)).astype(float)
+        users, items = np.nonzero(dense)
+        source, neighbour, scores, ranks = item_neighbors(users, items, dense[users, items], 12, k=3)
+
+        norms = np.linalg.norm(dense, axis=0)
+        expected = (dense.T @ dense) / np.outer(norms, norms)
+        np.fill_diagonal(expected, 0)
+        for item in range(12):
+            mine = source == item
+            assert list(ranks[mine]) == list(range(mine.sum()))
+            assert np.allclose(scores[mine], np.sort(expected[item][expected[item] > 0])[::-1][:3])
+
+
+    def test_interaction_weights_are_positive_and_ordered(self):
+        weights = [interaction_weight(rating) for rating in (None, 1, 2, 3, 4, 5)]
+        assert all(weight > 0 for weight in weights)
+        assert weights == sorted(weights) and weights[1] == weights[0] and weights[-1] == 2.0
+
+
+class TestRecommendations:
+    """Recommendations are built periodically and served from precomputed tables."""
+
+    def test_build_and_serve(self, app, libraries):
+        users, shared, books = libraries
+        with app.app_context():
+            result = RecommendationService(db.session).build()
+            assert result['books'] == 5
+
+            service = RecommendationService(db.session)
+            with capture_selects() as statements:
+                titles = [item['title'] for item in service.get_for_user(users['dave'])]
+            assert len(statements) == 1
+            assert_no_full_scans(statements)
+            assert titles[0] == 'Foundation'
+            assert set(titles) == {'Foundation', 'Neuromancer', 'Emma'}
+
+            with capture_selects() as statements:
+                neighbours = [item['title'] for item in service.get_for_book(books[('alice', 'Foundation')])]
+            assert len(statements) == 1
+            assert_no_full_scans(statements)
+            assert set(neighbours) == {'Dune', 'Hyperion'}
+
+    def test_background_builds_run_under_a_lease(self, app, libraries):
+        with app.app_context():
+            builds = []
+
+            def build(session):
+                builds.append(RecommendationService(session).build())
+
+            # Another worker is building: this one skips the job
+            assert acquire_lease(db.session, f'job:{BUILD_SNAPSHOT_NAME}', 60)
+            assert not run_leased(db.session, BUILD_SNAPSHOT_NAME, build)
+            assert builds == [] and last_run(db.session, BUILD_SNAPSHOT_NAME) is None
+
+            release_lease(db.session, f'job:{BUILD_SNAPSHOT_NAME}')
+            assert run_leased(db.session, BUILD_SNAPSHOT_NAME, build)
+            assert len(builds) == 1 and last_run(db.session, BUILD_SNAPSHOT_NAME) is not None
+            assert set(db.session.get(JobRun, BUILD_SNAPSHOT_NAME).summary) == {'neighbors', 'recommendations'}
+            assert db.session.get(CommunitySnapshot, BUILD_SNAPSHOT_NAME) is None
+            # The lease is given back when the job ends
+            assert run_leased(db.session, BUILD_SNAPSHOT_NAME, build)
+
+    def test_one_star_books_still_link_readers(self, app, libraries):
+        users, shared, books = libraries
+        with app.app_context():
+            UserRating.query.filter_by(user_id=users['bob']).update({'rating': 1})
+            db.session.commit()
+            RecommendationService(db.session).build()
+            titles = [item['title'] for item in RecommendationService(db.session).get_for_user(users['dave'])]
+            assert 'Neuromancer' in titles
+
+    def test_books_added_after_build_are_skipped(self, app, libraries):
+        users, shared, books = libraries
+        with app.app_context():
+            RecommendationService(db.session).build()
+            db.session.add(Book(title='Foundation', author='Author', user_id=users['dave'],
+                                shared_book_id=shared['Foundation']))
+            db.session.commit()
+            titles = [item['title'] for item in RecommendationService(db.session).get_for_user(users['dave'])]
+            assert 'Foundation' not in titles
+
+    def test_deleting_a_shared_book_drops_its_rows(self, app, libraries):
+        users, shared, books = libraries
+        with app.app_context():
+            RecommendationService(db.session).build()
+            for book in Book.query.filter_by(shared_book_id=shared['Foundation']).all():
+                db.session.delete(book)
+            db.session.delete(db.session.get(SharedBookData, shared['Foundation']))
+            db.session.commit()
+            titles = [item['title'] for item in RecommendationService(db.session).get_for_user(users['dave'])]
+            assert 'Foundation' not in titles
+
+    def test_api(self, app, client, libraries):
+        users, shared, books = libraries
+        with app.app_context():
+            RecommendationService(db.session).build()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(users['dave'])
+            session['_fresh'] = True
+        body = client.get('/api/recommendations?limit=1').get_json()
+        assert [item['title'] for item in body['data']] == ['Foundation']
+        body = client.get(f"/api/recommendations?book={books[('carol', 'Emma')]}").get_json()
+        assert [item['title'] for item in body['data']] == ['Dune']
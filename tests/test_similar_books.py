@@ -0,0 +1,118 @@
+import pytest
+
+from app.models import db, User, Book, SharedBookData, SimilarBook
+from app.services import similar_books_service
+from app.services.similar_books_service import SimilarBooksService, document_terms
+from tests.conftest import capture_selects, assert_no_full_scans
+
+
+CATALOG = [
+    ('Dune', 'Frank Herbert', 'Science Fiction', 'Desert planet spice empire intrigue and giant sandworms.'),
+    ('Dune Messiah', 'Frank Herbert', 'Science Fiction', 'The emperor of the desert planet faces spice politics.'),
+    ('Hyperion', 'Dan Simmons', 'Science Fiction', 'Pilgrims travel to the time tombs on a distant planet.'),
+    ('Salt Fat Acid Heat', 'Samin Nosrat', 'Cooking', 'Master the elements of good cooking with salt and heat.'),
+    ('The Food Lab', 'J. Kenji Lopez-Alt', 'Cooking', 'Better home cooking through science, heat and salt.'),
+]
+
+
+def add_shared(title, author, categories, description, owner):
+    record = SharedBookData(title=title, author=author, categories=categories, description=description,
+                            publisher='Ace', created_by=owner)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        user = User(username='indexer', email='indexer@test.com', is_active=True)
+        user.set_password('Similar#Books24')
+        db.session.add(user)
+        db.session.commit()
+        uids = {}
+        for entry in CATALOG:
+            record = add_shared(*entry, owner=user.id)
+            book = Book(title=record.title, author=record.author, user_id=user.id, shared_book_id=record.id)
+            db.session.add(book)
+            db.session.commit()
+            uids[record.title] = book.uid
+        return user.id, uids
+
+
+def similar_titles(uid):
+    return [item['title'] for item in SimilarBooksService(db.session).get_for_book(uid)]
+
+
+class TestSimilarBooks:
+    """Similar books come from a persisted TF-IDF index that is updated incrementally."""
+
+    def test_document_terms(self):
+        terms = document_terms('<p>The spice must flow, spice!</p>', 'Fiction / Science Fiction / General',
+                               'Frank Herbert & Brian Herbert', 'Ace  Books')
+        assert terms['w:spice'] == 2 and 'w:the' not in terms
+        assert {'c:fiction', 'c:science fiction', 'a:frank herbert', 'a:brian herbert', 'p:ace books'} <= set(terms)
+
+    def test_rebuild_and_serve(self, app, catalog):
+        user_id, uids = catalog
+        with app.app_context():
+            result = SimilarBooksService(db.session).rebuild()
+            assert result['indexed'] == 5
+
+            with capture_selects() as statements:
+                titles = similar_titles(uids['Dune'])
+            assert len(statements) == 1
+            assert_no_full_scans(statements)
+            assert titles[0] == 'Dune Messiah'
+            assert similar_titles(uids['Salt Fat Acid Heat'])[0] == 'The Food Lab'
+
+    def test_rebuild_pairs_a_bounded_number_of_books_per_term(self, app, catalog, monkeypatch):
+        with app.app_context():
+            assert SimilarBooksService(db.session).rebuild()['lists'] == 5
+            # With one posting per term no two books are ever paired
+            monkeypatch.setattr(similar_books_service, 'MAX_POSTINGS_PER_TERM', 1)
+            assert SimilarBooksService(db.session).rebuild()['lists'] == 0
+
+    def test_new_books_are_indexed_incrementally(self, app, catalog):
+        user_id, uids = catalog
+        with app.app_context():
+            service = SimilarBooksService(db.session)
+            service.rebuild()
+            assert service.update() == {'indexed': 0, 'lists': 0}
+
+            record = add_shared('Children of Dune', 'Frank Herbert', 'Science Fiction',
+                                'Spice, sandworms and the desert planet empire.', user_id)
+            result = service.update()
+            assert result['indexed'] == 1
+            assert 'Children of Dune' in similar_titles(uids['Dune'])[:2]
+
+            book = Book(title=record.title, author=record.author, user_id=user_id, shared_book_id=record.id)
+            db.session.add(book)
+            db.session.commit()
+            assert similar_titles(book.uid)[0] in {'Dune', 'Dune Messiah'}
+
+            incremental = {(row.shared_book_id, row.similar_id) for row in SimilarBook.query.all()}
+            service.rebuild()
+            assert incremental == {(row.shared_book_id, row.similar_id) for row in SimilarBook.query.all()}
+
+    def test_deleted_shared_books_leave_the_index(self, app, catalog):
+        user_id, uids = catalog
+        with app.app_context():
+            SimilarBooksService(db.session).rebuild()
+            record = SharedBookData.query.filter_by(title='Dune Messiah').first()
+            for book in Book.query.filter_by(shared_book_id=record.id).all():
+                db.session.delete(book)
+            db.session.delete(record)
+            db.session.commit()
+            assert 'Dune Messiah' not in similar_titles(uids['Dune'])
+
+    def test_api(self, app, client, catalog):
+        user_id, uids = catalog
+        with app.app_context():
+            SimilarBooksService(db.session).rebuild()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        body = client.get(f"/api/books/{uids['Hyperion']}/similar?limit=2").get_json()
+        assert body['success'] and len(body['data']) <= 2
+        assert {item['title'] for item in body['data']} <= {'Dune', 'Dune Messiah'}
@@ -0,0 +1,127 @@
+from datetime import date
+
+import pytest
+
+from app.models import db, User, Book, ReadingLog, UserStats, UserRating, ActivityEvent
+from app.services.book_service import BookService
+from app.services.stats_service import StatsService, compute_user_stats
+from tests.conftest import make_user
+
+
+def assert_matches_recompute(user_id):
+    """Incrementally maintained counters must equal a from-scratch computation."""
+    stats = StatsService(db.session).get_user_stats(user_id)
+    expected = compute_user_stats(db.session.connection(), user_id)
+    for field, value in expected.items():
+        assert getattr(stats, field) == value, field
+    return stats
+
+
+@pytest.fixture
+def reader(app):
+    with app.app_context():
+        return make_user('statsreader').id
+
+
+class TestUserStats:
+    """Materialized counters stay exact across write paths."""
+
+    def test_counters_follow_book_writes(self, app, reader):
+        with app.app_context():
+            db.session.add_all([
+                Book(title='Done', author='A', user_id=reader, finish_date=date(2024, 3, 5)),
+                Book(title='Reading', author='B', user_id=reader),
+                Book(title='Later', author='C', user_id=reader, want_to_read=True),
+                Book(title='Shelf', author='D', user_id=reader, library_only=True),
+            ])
+            db.session.commit()
+            stats = assert_matches_recompute(reader)
+            assert (stats.total_books, stats.finished_books, stats.currently_reading,
+                    stats.want_to_read, stats.library_only) == (4, 1, 1, 1, 1)
+            assert StatsService.finished_in(stats, 2024, 3) == 1
+
+            # Status change on an expired instance (old values must still be seen)
+            book = Book.query.filter_by(user_id=reader, title='Reading').first()
+            db.session.commit()
+            book.finish_date = date(2024, 4, 1)
+            db.session.commit()
+            stats = assert_matches_recompute(reader)
+            assert StatsService.finished_in(stats, 2024) == 2
+
+            BookService(db.session).update_book_status(book.uid, reader, 'want_to_read')
+            assert_matches_recompute(reader)
+
+    def test_counters_follow_reading_logs_and_deletes(self, app, reader):
+        with app.app_context():
+            service = BookService(db.session)
+            book = Book(title='Logged', author='A', user_id=reader)
+            db.session.add(book)
+            db.session.commit()
+
+            service.log_reading(book.uid, reader, 30, date(2024, 5, 1))
+            service.log_reading(book.uid, reader, 45, date(2024, 5, 2))
+            service.log_reading(book.uid, reader, 50, date(2024, 5, 2))
+            stats = assert_matches_recompute(reader)
+            assert (stats.reading_log_count, stats.total_pages_read) == (2, 80)
+
+            assert service.delete_book(book.uid, reader)
+            stats = assert_matches_recompute(reader)
+            assert (stats.total_books, stats.reading_log_count, stats.total_pages_read) == (0, 0, 0)
+
+    def test_reassigning_a_book_moves_counts(self, app, reader):
+        with app.app_context():
+            other = make_user('otherreader').id
+            book = Book(title='Moved', author='A', user_id=reader, finish_date=date(2024, 1, 2))
+            db.session.add(book)
+            db.session.commit()
+            book.user_id = other
+            db.session.commit()
+            assert assert_matches_recompute(reader).finished_books == 0
+            assert assert_matches_recompute(other).finished_books == 1
+
+    def test_rows_are_created_by_writes_not_reads(self, app, reader):
+        with app.app_context():
+            assert UserStats.query.get(reader) is not None
+            db.session.add(Book(title='Legacy', author='A', user_id=reader))
+            db.session.commit()
+            UserStats.query.filter_by(user_id=reader).delete()
+            db.session.commit()
+
+            # Data from before the table existed is computed on read without writing
+            stats = assert_matches_recompute(reader)
+            assert stats.total_books == 1 and stats.library_version == 0
+            db.session.rollback()
+            assert UserStats.query.get(reader) is None
+
+            # The next library write stores the row at a new version
+            db.session.add(Book(title='New', author='B', user_id=reader))
+            db.session.commit()
+            stats = assert_matches_recompute(reader)
+            assert stats.total_books == 2 and stats.library_version == 1
+
+            db.session.delete(User.query.get(reader))
+            db.session.commit()
+            assert UserStats.query.get(reader) is None
+
+    def test_admin_deleting_a_user_goes_through_the_session(self, app, client, reader):
+        with app.app_context():
+            admin = make_user('statsadmin')
+            admin.is_admin = True
+            other = make_user('statsother')
+            user = db.session.get(User, reader)
+            user.share_reading_activity = True
+            book = Book(title='Shared', author='A', user_id=reader, finish_date=date(2024, 3, 5))
+            db.session.add(book)
+            db.session.commit()
+            db.session.add_all([ReadingLog(user_id=reader, book_id=book.id, date=date(2024, 3, 1), pages_read=5),
+                                UserRating(user_id=other.id, book_id=book.id, rating=4)])
+            db.session.commit()
+            admin_id, other_id = admin.id, other.id
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+        assert client.post(f'/api/admin/users/{reader}/delete').status_code == 200
+        assert UserStats.query.get(reader) is None
+        assert ActivityEvent.query.filter_by(user_id=reader).count() == 0
+        assert UserRating.query.filter_by(user_id=other_id).count() == 0
+        assert Book.query.filter_by(user_id=reader).count() == 0
@@ -0,0 +1,181 @@
+import os
+from datetime import date
+
+import pytest
+import requests
+
+from app.models import db, User, Book
+from app.services import wrapup_service, image_jobs
+
+
+@pytest.fixture
+def renders(app, monkeypatch, tmp_path):
+    """Count wrap-up renders; covers on covers.test are unreachable"""
+    app.config['WRAPUP_CACHE_DIR'] = str(tmp_path / 'wrapups')
+    app.config['COVER_FETCH_DEADLINE'] = 1
+    # Render in the test process so the patches below apply
+    app.config['IMAGE_WORKERS'] = 0
+    monkeypatch.setattr(image_jobs, '_jobs', {})
+    calls = []
+    render = wrapup_service.collage_job
+
+    def counting_render(sources, title, layout, deadline):
+        calls.append(sources)
+        return render(sources, title, layout, deadline)
+
+    def unreachable(url, timeout=None):
+        raise requests.ConnectionError('unreachable')
+
+    monkeypatch.setattr(wrapup_service, 'collage_job', counting_render)
+    monkeypatch.setattr('app.utils.requests.get', unreachable)
+    return calls
+
+
+@pytest.fixture
+def finisher(app, client):
+    with app.app_context():
+        user = User(username='finisher', email='finisher@test.com', is_active=True)
+        user.set_password('Wrap#Up#Month2024')
+        db.session.add(user)
+        db.session.commit()
+        for day in (3, 9):
+            db.session.add(Book(title=f'Book {day}', author='Author', user_id=user.id,
+                                finish_date=date(2024, 5, day)))
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return user_id
+
+
+def cached_files(app):
+    return sorted(
+        name for _, _, names in os.walk(app.config['WRAPUP_CACHE_DIR']) for name in names
+    )
+
+
+class TestWrapupCache:
+    """Rendered wrap-ups are cached on disk per set of inputs and served with ETags."""
+
+    def test_repeat_views_are_served_from_disk(self, app, client, renders, finisher):
+        first = client.get('/month_review/2024/5.jpg')
+        assert first.status_code == 200 and first.mimetype == 'image/jpeg'
+        etag = first.headers['ETag']
+        second = client.get('/month_review/2024/5.jpg')
+        assert second.headers['ETag'] == etag and second.data == first.data
+        assert len(renders) == 1
+
+        revalidated = client.get('/month_review/2024/5.jpg', headers={'If-None-Match': etag})
+        assert revalidated.status_code == 304
+        assert len(renders) == 1
+
+    def test_finishing_a_book_replaces_the_render(self, app, client, renders, finisher):
+        etag = client.get('/month_review/2024/5.jpg').headers['ETag']
+        # Requests share the fixture's app context, so write through its session
+        db.session.add(Book(title='Book 20', author='Author', user_id=finisher, finish_date=date(2024, 5, 20)))
+        db.session.commit()
+        response = client.get('/month_review/2024/5.jpg', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert len(renders) == 2 and len(renders[1]) == 3
+        assert len(cached_files(app)) == 1
+
+    def test_renders_with_missing_covers_are_not_cached(self, app, client, renders, finisher):
+        with app.app_context():
+            db.session.add(Book(title='Remote', author='Author', user_id=finisher, finish_date=date(2024, 5, 25),
+                                cover_url='https://covers.test/remote.jpg'))
+            db.session.commit()
+        response = client.get('/month_review/2024/5.jpg')
+        assert response.status_code == 200 and 'ETag' not in response.headers
+        client.get('/month_review/2024/5.jpg')
+        assert len(renders) == 2
+        assert cached_files(app) == []
+
+    def test_failed_renders_are_retried(self, app, client, renders, finisher, monkeypatch):
+        render = wrapup_service.collage_job
+        failures = [OSError('disk full')]
+
+        def flaky_render(*args):
+            if failures:
+                raise failures.pop()
+            return render(*args)
+
+        monkeypatch.setattr(wrapup_service, 'collage_job', flaky_render)
+        assert client.get('/month_review/2024/5.jpg').status_code == 503
+        assert client.get('/month_review/2024/5.jpg').status_code == 200
+
+        failures.append(OSError('disk full'))
+        db.session.add(Book(title='Book 20', author='Author', user_id=finisher, finish_date=date(2024, 5, 20)))
+        db.session.commit()
+        assert client.get('/api/reports/month-wrapup/2024/5/image').status_code == 500
+        assert client.get('/api/reports/month-wrapup/2024/5/image').get_json()['data']['status'] == 'ready'
+
+    def test_no_books(self, client, renders, finisher):
+        assert client.get('/month_review/2024/6.jpg').status_code == 404
+
+    def test_async_render_with_polling(self, app, client, renders, finisher):
+        body = client.get('/api/reports/month-wrapup/2024/5/image').get_json()
+        # Jobs run inline here, so the first poll already finds the render done
+        assert body['data']['status'] == 'ready' and body['data']['url'] == '/month_review/2024/5.jpg'
+        image = client.get(body['data']['url'])
+        assert image.headers['ETag'].strip('"') == body['data']['etag']
+        assert len(renders) == 1
+        assert client.get('/api/reports/month-wrapup/2024/6/image').status_code == 404
+
+
+class TestImagePool:
+    """Image jobs run in a separate process, synchronously or with polling."""
+
+    def test_jobs_run_in_the_pool(self, app, tmp_path):
+        from io import BytesIO
+        from PIL import Image
+        from app.utils import collage_job, collage_layout
+        from app.services.image_service import AVATAR_PROFILE, derivative_path, store_image
+
+        app.config['IMAGE_WORKERS'] = 1
+        upload = BytesIO()
+        Image.new('RGB', (2400, 1200), 'red').save(upload, format='PNG')
+        with app.app_context():
+            stored = image_jobs.run_job(store_image, str(tmp_path), upload.getvalue(), AVATAR_PROFILE, timeout=60)
+            assert stored.size == (2400, 1200)
+            assert os.path.exists(derivative_path(str(tmp_path), stored.digest, 'large', 'webp'))
+
+            job_id = image_jobs.submit_job('collage', collage_job, [None, None], 'MAY 2024', collage_layout(2, 200, 80), 1)
+            data, missing = image_jobs.wait_job(job_id, timeout=60)
+            assert image_jobs.job_status(job_id) == {'id': job_id, 'status': 'done'}
+            assert data[:2] == b'\xff\xd8' and missing == 0
+            assert image_jobs.job_status('unknown') is None
+
+
+class TestYearReview:
+    """Year reviews tile hundreds of locally mirrored thumbnails over a few pages."""
+
+    def test_150_book_year(self, app, client, renders, finisher, tmp_path):
+        import time
+        from io import BytesIO
+        from PIL import Image
+        from app.services.cover_service import store_cover
+
+        app.config['COVER_STORE_DIR'] = str(tmp_path / 'covers')
+        buffer = BytesIO()
+        Image.new('RGB', (800, 1200), 'navy').save(buffer, format='JPEG')
+        digest = store_cover(app.config['COVER_STORE_DIR'], buffer.getvalue()).digest
+        db.session.add_all([
+            Book(title=f'Year {n}', author='Author', user_id=finisher, finish_date=date(2024, 1 + n % 12, 1 + n % 28),
+                 cover_url='https://covers.test/navy.jpg')
+            for n in range(148)
+        ])
+        db.session.commit()
+        # As the cover mirror would after downloading the cover
+        db.session.execute(Book.__table__.update().where(Book.cover_url.isnot(None)).values(cover_digest=digest))
+        db.session.commit()
+
+        summary = client.get('/api/reports/year-review/2024').get_json()['data']
+        assert summary['books'] == 150 and summary['pages'] == 2
+        started = time.monotonic()
+        pages = [client.get(url) for url in summary['urls']]
+        assert time.monotonic() - started < 10
+        assert all(page.status_code == 200 and 'ETag' in page.headers for page in pages)
+        # Mirrored books are read from the thumbnail cache, never upstream
+        assert all(source is None or source.endswith('thumb.jpg') for call in renders for source in call)
+        assert client.get('/year_review/2024/3.jpg').status_code == 404